@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Compare the compact state RPDFile instances are pickled with to pickling their
+attribute dictionary, which is how they were pickled before.
+
+Reports bytes per file and encode / decode time, both for single files (as sent by
+most worker processes) and for batches of files (as sent by the scan process).
+
+Run from the root of the source tree:
+
+    PYTHONPATH=. python3 benchmarks/rpdfile_pickle.py
+"""
+
+import argparse
+import pickle
+import timeit
+
+from raphodo.rpdfile import RPDFile, SamplePhoto, SampleVideo
+
+
+def dict_dumps(rpd_files: list[RPDFile]) -> bytes:
+    return pickle.dumps(
+        [(rpd_file.__class__, rpd_file.__dict__) for rpd_file in rpd_files],
+        pickle.HIGHEST_PROTOCOL,
+    )
+
+
+def dict_loads(data: bytes) -> list[RPDFile]:
+    rpd_files = []
+    for cls, state in pickle.loads(data):
+        rpd_file = cls.__new__(cls)
+        rpd_file.__dict__.update(state)
+        rpd_files.append(rpd_file)
+    return rpd_files
+
+
+def compact_dumps(rpd_files: list[RPDFile]) -> bytes:
+    return pickle.dumps(rpd_files, pickle.HIGHEST_PROTOCOL)
+
+
+def make_rpd_files(no_files: int) -> list[RPDFile]:
+    rpd_files = []
+    for i in range(no_files):
+        if i % 10:
+            rpd_file = SamplePhoto(sample_name=f"IMG_{i:04}.CR2")
+        else:
+            rpd_file = SampleVideo(sample_name=f"MVI_{i:04}.MOV")
+        # Sample files have metadata that cannot be pickled
+        rpd_file.metadata = None
+        rpd_files.append(rpd_file)
+    return rpd_files
+
+
+def benchmark(name: str, rpd_files: list[RPDFile], batch_size: int, dumps, loads):
+    batches = [
+        rpd_files[i : i + batch_size] for i in range(0, len(rpd_files), batch_size)
+    ]
+    data = [dumps(batch) for batch in batches]
+    size = sum(len(d) for d in data) / len(rpd_files)
+    encode = timeit.timeit(lambda: [dumps(batch) for batch in batches], number=3)
+    decode = timeit.timeit(lambda: [loads(d) for d in data], number=3)
+    per_file = 1_000_000 / (3 * len(rpd_files))
+    print(
+        f"{name:<8} batch {batch_size:>4}: {size:>7.0f} bytes per file, encode "
+        f"{encode * per_file:>6.1f}µs, decode {decode * per_file:>6.1f}µs"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--files", type=int, default=10000, help="Number of files to pickle"
+    )
+    args = parser.parse_args()
+
+    rpd_files = make_rpd_files(args.files)
+
+    for original, rpd_file in zip(rpd_files, pickle.loads(compact_dumps(rpd_files))):
+        assert rpd_file.__class__ is original.__class__
+        assert rpd_file.__dict__ == original.__dict__
+
+    for batch_size in (1, 500):
+        benchmark("pickle", rpd_files, batch_size, dict_dumps, dict_loads)
+        benchmark("compact", rpd_files, batch_size, compact_dumps, pickle.loads)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,9 @@ import logging
 import os
 import pickle
 import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from typing import BinaryIO
 
 with contextlib.suppress(locale.Error):
     # Use the default locale as defined by the LANG variable
@@ -18,8 +20,9 @@ with contextlib.suppress(locale.Error):
 
 from raphodo.cache import FdoCacheLarge, FdoCacheNormal
 from raphodo.constants import BackupStatus, DownloadStatus
-from raphodo.copyfiles import FileCopy, copy_file_metadata
+from raphodo.copyfiles import FileCopy, copy_file_metadata, md5_of_file
 from raphodo.interprocess import (
+    BackupArguments,
     BackupFileData,
     BackupResults,
     WorkerInPublishPullPipeline,
@@ -29,36 +32,82 @@ from raphodo.problemnotification import (
     BackupAlreadyExistsProblem,
     BackupOverwrittenProblem,
     BackupSubfolderCreationProblem,
+    FileVerificationProblem,
     FileWriteProblem,
     make_href,
 )
+from raphodo.rpdfile import RPDFile
 from raphodo.storage.storage import get_uri
 
 
+class BackupDestination:
+    """
+    A backup device, and the progress and problems backing up to it
+    """
+
+    def __init__(self, device_id: int, path: str, device_name: str) -> None:
+        self.device_id = device_id
+        self.path = path
+        self.device_name = device_name
+        self.uri = get_uri(path=path)
+        self.problems = BackingUpProblems(name=device_name, uri=self.uri)
+        self.total_downloaded = 0
+        self.bytes_downloaded = 0
+        self.amount_downloaded = 0
+
+    def reset_problems(self) -> None:
+        self.problems = BackingUpProblems(name=self.device_name, uri=self.uri)
+
+    def init_copy_progress(self) -> None:
+        self.bytes_downloaded = 0
+        self.amount_downloaded = 0
+
+
 class BackupFilesWorker(WorkerInPublishPullPipeline, FileCopy):
+    """
+    Backs up files to one backup device or, in fan-out mode, to several devices.
+
+    In fan-out mode each file is read once, with each chunk written to every
+    device it is being backed up to.
+    """
+
+    sink_batch_size = 50
+
     def __init__(self):
-        self.problems = BackingUpProblems()
+        # device id: backup device
+        self.destinations: dict[int, BackupDestination] = {}
+        # The device currently being backed up to
+        self.destination: BackupDestination | None = None
+        # How many times a backup is checked, and copied again should it not match
+        # the file that was backed up
+        self.verification_attempts = 2
         super().__init__("BackupFiles")
 
-    def update_progress(self, amount_downloaded, total):
-        self.amount_downloaded = amount_downloaded
-        chunk_downloaded = amount_downloaded - self.bytes_downloaded
+    @property
+    def problems(self) -> BackingUpProblems:
+        return self.destination.problems
+
+    def update_progress(self, amount_downloaded: int, total: int) -> None:
+        self.destination_progress(self.destination, amount_downloaded, total)
+
+    def destination_progress(
+        self, destination: BackupDestination, amount_downloaded: int, total: int
+    ) -> None:
+        destination.amount_downloaded = amount_downloaded
+        chunk_downloaded = amount_downloaded - destination.bytes_downloaded
         if (chunk_downloaded > self.batch_size_bytes) or (amount_downloaded == total):
-            self.bytes_downloaded = amount_downloaded
+            destination.bytes_downloaded = amount_downloaded
             self.content = pickle.dumps(
                 BackupResults(
                     scan_id=self.scan_id,
-                    device_id=self.device_id,
-                    total_downloaded=self.total_downloaded + amount_downloaded,
+                    device_id=destination.device_id,
+                    total_downloaded=destination.total_downloaded + amount_downloaded,
                     chunk_downloaded=chunk_downloaded,
                 ),
                 pickle.HIGHEST_PROTOCOL,
             )
             self.send_message_to_sink()
 
-            # if amount_downloaded == total:
-            #     self.bytes_downloaded = 0
-
     def backup_associate_file(self, dest_dir: str, full_file_name: str) -> None:
         """
         Backs up small files like XMP or THM files
@@ -80,234 +129,501 @@ class BackupFilesWorker(WorkerInPublishPullPipeline, FileCopy):
             # ignore any metadata copying errors
             copy_file_metadata(full_file_name, full_dest_name)
 
-    def do_backup(self, data: BackupFileData) -> None:
-        rpd_file = data.rpd_file
-        backup_succeeded = False
-        self.scan_id = rpd_file.scan_id
-        self.verify_file = data.verify_file
+    def verify_backup(
+        self,
+        source: str,
+        destination: str,
+        rpd_file: RPDFile,
+        hashing: Future[str] | None = None,
+    ) -> bool:
+        """
+        Check the backup matches the file that was backed up, by comparing the
+        backup's MD5 hash, read from the backup device, with that calculated when
+        the file was copied. If they do not match, copy the file again.
+
+        :param source: the file that was backed up
+        :param destination: the backup
+        :param rpd_file: the file that was backed up, with its MD5 hash
+        :param hashing: the backup's MD5 hash, if it is already being calculated
+        :return: True if the backup is intact, else False
+        """
+
+        for attempt in range(1, self.verification_attempts + 1):
+            try:
+                if attempt == 1 and hashing is not None:
+                    md5 = hashing.result()
+                else:
+                    md5 = md5_of_file(destination, self.io_buffer, bypass_cache=True)
+            except OSError as e:
+                logging.error(
+                    "Could not read backup %s to verify it: %s", destination, e
+                )
+                uri = get_uri(full_file_name=destination)
+                self.problems.append(
+                    FileVerificationProblem(
+                        name=os.path.basename(destination), uri=uri, exception=e
+                    )
+                )
+                return False
+
+            if md5 == rpd_file.md5:
+                return True
+
+            if attempt < self.verification_attempts:
+                logging.warning(
+                    "Backup %s does not match %s. Backing it up again.",
+                    destination,
+                    source,
+                )
+                if not self.copy_from_filesystem(source, destination, rpd_file):
+                    return False
+
+        logging.error("Backup %s does not match %s", destination, source)
+        uri = get_uri(full_file_name=destination)
+        self.problems.append(
+            FileVerificationProblem(name=os.path.basename(destination), uri=uri)
+        )
+        return False
+
+    def prepare_backup(self, data: BackupFileData) -> tuple[str, str, bool]:
+        """
+        Prepare to back up a file to the current backup device, creating the
+        subfolder it will be backed up to and checking if it has already been
+        backed up.
 
-        mdata_exceptions = None
+        :param data: the file to back up
+        :return: the backup's full file name (empty if it will not be backed up),
+         the directory it will be backed up to, and whether it should be copied
+        """
 
+        rpd_file = data.rpd_file
         if not (data.move_succeeded and data.do_backup):
-            backup_full_file_name = ""
-        else:
-            self.total_reached = False
+            return "", "", False
 
-            if data.path_suffix is None:
-                dest_base_dir = self.path
-            else:
-                dest_base_dir = os.path.join(self.path, data.path_suffix)
+        if data.path_suffix is None:
+            dest_base_dir = self.destination.path
+        else:
+            dest_base_dir = os.path.join(self.destination.path, data.path_suffix)
 
-            dest_dir = os.path.join(dest_base_dir, rpd_file.download_subfolder)
-            backup_full_file_name = os.path.join(dest_dir, rpd_file.download_name)
+        dest_dir = os.path.join(dest_base_dir, rpd_file.download_subfolder)
+        backup_full_file_name = os.path.join(dest_dir, rpd_file.download_name)
 
-            if not os.path.isdir(dest_dir):
-                # create the subfolders on the backup path
-                try:
-                    logging.debug(
-                        "Creating subfolder %s on backup device %s...",
-                        dest_dir,
-                        self.device_name,
+        if not os.path.isdir(dest_dir):
+            # create the subfolders on the backup path
+            try:
+                logging.debug(
+                    "Creating subfolder %s on backup device %s...",
+                    dest_dir,
+                    self.destination.device_name,
+                )
+                os.makedirs(dest_dir)
+                logging.debug("...backup subfolder created")
+            except (OSError, PermissionError, FileNotFoundError) as inst:
+                # There is a minuscule chance directory may have been
+                # created by another process between the time it
+                # takes to query and the time it takes to create a
+                # new directory. Ignore that error.
+                if inst.errno != errno.EEXIST:
+                    logging.error(
+                        "Failed to create backup subfolder: %s",
+                        rpd_file.download_path,
                     )
-                    os.makedirs(dest_dir)
-                    logging.debug("...backup subfolder created")
-                except (OSError, PermissionError, FileNotFoundError) as inst:
-                    # There is a minuscule chance directory may have been
-                    # created by another process between the time it
-                    # takes to query and the time it takes to create a
-                    # new directory. Ignore that error.
-                    if inst.errno != errno.EEXIST:
-                        logging.error(
-                            "Failed to create backup subfolder: %s",
-                            rpd_file.download_path,
-                        )
-                        logging.error(inst)
-
-                        self.problems.append(
-                            BackupSubfolderCreationProblem(
-                                folder=make_href(
-                                    name=rpd_file.download_subfolder,
-                                    uri=get_uri(path=dest_dir),
-                                ),
-                                exception=inst,
-                            )
+                    logging.error(inst)
+
+                    self.problems.append(
+                        BackupSubfolderCreationProblem(
+                            folder=make_href(
+                                name=rpd_file.download_subfolder,
+                                uri=get_uri(path=dest_dir),
+                            ),
+                            exception=inst,
                         )
+                    )
 
-            backup_already_exists = os.path.exists(backup_full_file_name)
+        backup_already_exists = os.path.exists(backup_full_file_name)
+
+        if backup_already_exists:
+            try:
+                modification_time = os.path.getmtime(backup_full_file_name)
+                dt = datetime.fromtimestamp(modification_time)
+                date = dt.strftime("%x")
+                time = dt.strftime("%X")
+            except Exception:
+                logging.error(
+                    "Could not determine the file modification time of %s",
+                    backup_full_file_name,
+                )
+                date = time = ""
 
-            if backup_already_exists:
-                try:
-                    modification_time = os.path.getmtime(backup_full_file_name)
-                    dt = datetime.fromtimestamp(modification_time)
-                    date = dt.strftime("%x")
-                    time = dt.strftime("%X")
-                except Exception:
-                    logging.error(
-                        "Could not determine the file modification time of %s",
-                        backup_full_file_name,
-                    )
-                    date = time = ""
+            source = rpd_file.get_souce_href()
+            device = make_href(
+                name=rpd_file.device_display_name, uri=rpd_file.device_uri
+            )
 
-                source = rpd_file.get_souce_href()
-                device = make_href(
-                    name=rpd_file.device_display_name, uri=rpd_file.device_uri
+            if data.backup_duplicate_overwrite:
+                self.problems.append(
+                    BackupOverwrittenProblem(
+                        file_type_capitalized=rpd_file.title_capitalized,
+                        file_type=rpd_file.title,
+                        name=rpd_file.download_name,
+                        uri=get_uri(full_file_name=backup_full_file_name),
+                        source=source,
+                        device=device,
+                        date=date,
+                        time=time,
+                    )
+                )
+                msg = "Overwriting backup file %s" % backup_full_file_name
+            else:
+                self.problems.append(
+                    BackupAlreadyExistsProblem(
+                        file_type_capitalized=rpd_file.title_capitalized,
+                        file_type=rpd_file.title,
+                        name=rpd_file.download_name,
+                        uri=get_uri(full_file_name=backup_full_file_name),
+                        source=source,
+                        device=device,
+                        date=date,
+                        time=time,
+                    )
+                )
+                msg = (
+                    "Skipping backup of file %s because it already exists"
+                    % backup_full_file_name
                 )
+            logging.warning(msg)
 
-                if data.backup_duplicate_overwrite:
-                    self.problems.append(
-                        BackupOverwrittenProblem(
-                            file_type_capitalized=rpd_file.title_capitalized,
-                            file_type=rpd_file.title,
-                            name=rpd_file.download_name,
-                            uri=get_uri(full_file_name=backup_full_file_name),
-                            source=source,
-                            device=device,
-                            date=date,
-                            time=time,
+        copy = not backup_already_exists or data.backup_duplicate_overwrite
+        return backup_full_file_name, dest_dir, copy
+
+    def copy_to_destinations(
+        self,
+        source: str,
+        backups: list[tuple[BackupDestination, BackupFileData, str]],
+    ) -> list[bool]:
+        """
+        Back up a file to one or more backup devices.
+
+        When backing up to more than one device, the file is read once, with each
+        chunk written to every device. Should writing to one device fail, the
+        others are unaffected.
+
+        :param source: the file to back up
+        :param backups: the backup devices, the file data sent for each, and the
+         backup's full file name on each
+        :return: for each backup device, whether the file was copied
+        """
+
+        if len(backups) == 1:
+            destination, data, backup_full_file_name = backups[0]
+            self.destination = destination
+            return [
+                self.copy_from_filesystem(source, backup_full_file_name, data.rpd_file)
+            ]
+
+        succeeded = [False] * len(backups)
+        # Every file opened is closed however the copy ends, including when the
+        # process is stopped
+        with contextlib.ExitStack() as stack:
+            dest_files: list[BinaryIO | None] = []
+            for destination, data, backup_full_file_name in backups:
+                try:
+                    dest_files.append(
+                        stack.enter_context(
+                            open(backup_full_file_name, "wb", self.io_buffer)
                         )
                     )
-                    msg = "Overwriting backup file %s" % backup_full_file_name
+                except OSError as e:
+                    self.destination = destination
+                    self.copy_problem(source, backup_full_file_name, e)
+                    dest_files.append(None)
+
+            total = backups[0][1].rpd_file.size
+            md5 = hashlib.md5() if self.verify_file else None
+            buffer = bytearray(self.io_buffer)
+            view = memoryview(buffer)
+            amount_downloaded = 0
+
+            try:
+                with open(source, "rb", self.io_buffer) as self.src:
+                    while any(dest_files):
+                        # first check if process is being stopped or paused
+                        self.check_for_controller_directive()
+
+                        size = self.src.readinto(buffer)
+                        if not size:
+                            break
+                        chunk = view[:size]
+                        amount_downloaded += size
+                        for index, dest_file in enumerate(dest_files):
+                            if dest_file is None:
+                                continue
+                            destination, data, backup_full_file_name = backups[index]
+                            try:
+                                dest_file.write(chunk)
+                            except OSError as e:
+                                self.destination = destination
+                                self.copy_problem(source, backup_full_file_name, e)
+                                with contextlib.suppress(OSError):
+                                    dest_file.close()
+                                dest_files[index] = None
+                            else:
+                                self.destination_progress(
+                                    destination, amount_downloaded, total
+                                )
+                        if md5 is not None:
+                            md5.update(chunk)
+            except OSError as e:
+                # The file being backed up could not be read
+                for index, dest_file in enumerate(dest_files):
+                    if dest_file is not None:
+                        with contextlib.suppress(OSError):
+                            dest_file.close()
+                        self.destination = backups[index][0]
+                        self.copy_problem(source, backups[index][2], e)
+                return succeeded
+
+            for index, dest_file in enumerate(dest_files):
+                if dest_file is None:
+                    continue
+                destination, data, backup_full_file_name = backups[index]
+                try:
+                    dest_file.close()
+                except OSError as e:
+                    self.destination = destination
+                    self.copy_problem(source, backup_full_file_name, e)
                 else:
-                    self.problems.append(
-                        BackupAlreadyExistsProblem(
-                            file_type_capitalized=rpd_file.title_capitalized,
-                            file_type=rpd_file.title,
-                            name=rpd_file.download_name,
-                            uri=get_uri(full_file_name=backup_full_file_name),
-                            source=source,
-                            device=device,
-                            date=date,
-                            time=time,
-                        )
-                    )
-                    msg = (
-                        "Skipping backup of file %s because it already exists"
-                        % backup_full_file_name
-                    )
-                logging.warning(msg)
+                    succeeded[index] = True
+                    if md5 is not None:
+                        data.rpd_file.md5 = md5.hexdigest()
+        return succeeded
+
+    def do_backup(self, items: list[tuple[BackupDestination, BackupFileData]]) -> None:
+        """
+        Back up a file to one or more backup devices
 
-            if not backup_already_exists or data.backup_duplicate_overwrite:
+        :param items: each backup device, and the file data sent for it
+        """
+
+        backups: list[tuple[BackupDestination, BackupFileData, str]] = []
+        to_copy: list[tuple[BackupDestination, BackupFileData, str]] = []
+        dest_dirs: dict[int, str] = {}
+        for destination, data in items:
+            self.destination = destination
+            self.scan_id = data.rpd_file.scan_id
+            self.verify_file = data.verify_file
+            destination.init_copy_progress()
+            self.init_copy_progress()
+            backup_full_file_name, dest_dir, copy = self.prepare_backup(data)
+            backups.append((destination, data, backup_full_file_name))
+            dest_dirs[destination.device_id] = dest_dir
+            if copy:
                 logging.debug(
                     "Backing up file %s on device %s...",
                     data.download_count,
-                    self.device_name,
+                    destination.device_name,
                 )
+                to_copy.append((destination, data, backup_full_file_name))
+
+        copied: dict[int, bool] = {}
+        if to_copy:
+            source = to_copy[0][1].rpd_file.download_full_file_name
+            for (destination, _data, _name), succeeded in zip(
+                to_copy, self.copy_to_destinations(source, to_copy)
+            ):
+                copied[destination.device_id] = succeeded
+
+        # Read the backups on each device back at the same time, because they are
+        # separate devices. Backing up again any that do not match is done one
+        # device at a time.
+        hashing: dict[int, Future[str]] = {}
+        to_verify = [
+            (destination.device_id, backup_full_file_name)
+            for destination, data, backup_full_file_name in to_copy
+            if self.verify_file and copied[destination.device_id]
+        ]
+        if len(to_verify) > 1:
+            with ThreadPoolExecutor(max_workers=len(to_verify)) as executor:
+                for device_id, backup_full_file_name in to_verify:
+                    hashing[device_id] = executor.submit(
+                        md5_of_file,
+                        backup_full_file_name,
+                        self.io_buffer,
+                        bypass_cache=True,
+                    )
+                self.check_backups(backups, copied, dest_dirs, hashing)
+        else:
+            self.check_backups(backups, copied, dest_dirs, hashing)
+
+    def check_backups(
+        self,
+        backups: list[tuple[BackupDestination, BackupFileData, str]],
+        copied: dict[int, bool],
+        dest_dirs: dict[int, str],
+        hashing: dict[int, Future[str]],
+    ) -> None:
+        """
+        Verify each backup, back up the files associated with it, and send the
+        results to the main process
+
+        :param backups: the backup devices, the file data sent for each, and the
+         backup's full file name on each
+        :param copied: for each backup device the file was copied to, whether the
+         copy succeeded
+        :param dest_dirs: the backup folder on each device
+        :param hashing: the MD5 hash of each backup being calculated
+        """
+
+        for destination, data, backup_full_file_name in backups:
+            self.destination = destination
+            rpd_file = data.rpd_file
+            backup_succeeded = copied.get(destination.device_id, False)
+            mdata_exceptions = None
+
+            if destination.device_id in copied:
                 source = rpd_file.download_full_file_name
-                destination = backup_full_file_name
-                backup_succeeded = self.copy_from_filesystem(
-                    source, destination, rpd_file
-                )
                 if backup_succeeded and self.verify_file:
-                    with open(backup_full_file_name, "rb") as f:
-                        md5 = hashlib.md5(f.read()).hexdigest()
-                        if md5 != rpd_file.md5:
-                            pass
+                    backup_succeeded = self.verify_backup(
+                        source,
+                        backup_full_file_name,
+                        rpd_file,
+                        hashing.get(destination.device_id),
+                    )
                 if backup_succeeded:
                     logging.debug(
                         "...backing up file %s on device %s succeeded",
                         data.download_count,
-                        self.device_name,
-                    )
-
-                if backup_succeeded:
-                    mdata_exceptions = copy_file_metadata(
-                        rpd_file.download_full_file_name, backup_full_file_name
+                        destination.device_name,
                     )
-            if not backup_succeeded:
-                if rpd_file.status == DownloadStatus.download_failed:
-                    rpd_file.status = DownloadStatus.download_and_backup_failed
+                    mdata_exceptions = copy_file_metadata(source, backup_full_file_name)
+
+            if data.move_succeeded and data.do_backup:
+                if not backup_succeeded:
+                    if rpd_file.status == DownloadStatus.download_failed:
+                        rpd_file.status = DownloadStatus.download_and_backup_failed
+                    else:
+                        rpd_file.status = DownloadStatus.backup_problem
                 else:
-                    rpd_file.status = DownloadStatus.backup_problem
-            else:
-                # backup any THM, audio or XMP files
-                if rpd_file.download_thm_full_name:
-                    self.backup_associate_file(
-                        dest_dir, rpd_file.download_thm_full_name
-                    )
-                if rpd_file.download_audio_full_name:
-                    self.backup_associate_file(
-                        dest_dir, rpd_file.download_audio_full_name
-                    )
-                if rpd_file.download_xmp_full_name:
-                    self.backup_associate_file(
-                        dest_dir, rpd_file.download_xmp_full_name
-                    )
-                if rpd_file.download_log_full_name:
-                    self.backup_associate_file(
-                        dest_dir, rpd_file.download_log_full_name
-                    )
+                    # backup any THM, audio or XMP files
+                    dest_dir = dest_dirs[destination.device_id]
+                    for full_file_name in (
+                        rpd_file.download_thm_full_name,
+                        rpd_file.download_audio_full_name,
+                        rpd_file.download_xmp_full_name,
+                        rpd_file.download_log_full_name,
+                    ):
+                        if full_file_name:
+                            self.backup_associate_file(dest_dir, full_file_name)
+
+            destination.total_downloaded += rpd_file.size
+            bytes_not_downloaded = rpd_file.size - destination.amount_downloaded
+            if bytes_not_downloaded and data.do_backup:
+                self.content = pickle.dumps(
+                    BackupResults(
+                        scan_id=self.scan_id,
+                        device_id=destination.device_id,
+                        total_downloaded=destination.total_downloaded,
+                        chunk_downloaded=bytes_not_downloaded,
+                    ),
+                    pickle.HIGHEST_PROTOCOL,
+                )
+                self.send_message_to_sink()
 
-        self.total_downloaded += rpd_file.size
-        bytes_not_downloaded = rpd_file.size - self.amount_downloaded
-        if bytes_not_downloaded and data.do_backup:
             self.content = pickle.dumps(
                 BackupResults(
                     scan_id=self.scan_id,
-                    device_id=self.device_id,
-                    total_downloaded=self.total_downloaded,
-                    chunk_downloaded=bytes_not_downloaded,
+                    device_id=destination.device_id,
+                    backup_succeeded=backup_succeeded,
+                    do_backup=data.do_backup,
+                    rpd_file=rpd_file,
+                    backup_full_file_name=backup_full_file_name,
+                    mdata_exceptions=mdata_exceptions,
                 ),
                 pickle.HIGHEST_PROTOCOL,
             )
             self.send_message_to_sink()
 
-        self.content = pickle.dumps(
-            BackupResults(
-                scan_id=self.scan_id,
-                device_id=self.device_id,
-                backup_succeeded=backup_succeeded,
-                do_backup=data.do_backup,
-                rpd_file=rpd_file,
-                backup_full_file_name=backup_full_file_name,
-                mdata_exceptions=mdata_exceptions,
-            ),
-            pickle.HIGHEST_PROTOCOL,
-        )
-        self.send_message_to_sink()
-
-    def reset_problems(self) -> None:
-        self.problems = BackingUpProblems(name=self.device_name, uri=self.uri)
-
-    def send_problems(self) -> None:
-        if self.problems:
+    def send_problems(self, destination: BackupDestination) -> None:
+        if destination.problems:
             self.content = pickle.dumps(
                 BackupResults(
                     scan_id=self.scan_id,
-                    device_id=self.device_id,
-                    problems=self.problems,
+                    device_id=destination.device_id,
+                    problems=destination.problems,
                 ),
                 pickle.HIGHEST_PROTOCOL,
             )
             self.send_message_to_sink()
-            self.reset_problems()
+            destination.reset_problems()
 
     def cleanup_pre_stop(self):
-        self.send_problems()
+        for destination in self.destinations.values():
+            self.send_problems(destination)
+
+    def process_data(self, destination: BackupDestination, data: BackupFileData):
+        """
+        Handle the start or completion of backups to a device
+        """
+
+        if data.message == BackupStatus.backup_started:
+            destination.reset_problems()
+        elif data.message == BackupStatus.backup_completed:
+            self.send_problems(destination)
 
     def do_work(self):
-        backup_arguments = pickle.loads(self.content)
-        self.path = backup_arguments.path
-        self.device_name = backup_arguments.device_name
-        self.uri = get_uri(path=self.path)
+        arguments: BackupArguments | list = pickle.loads(self.content)
         self.fdo_cache_normal = FdoCacheNormal()
         self.fdo_cache_large = FdoCacheLarge()
-
-        while True:
-            worker_id, directive, content = self.receiver.recv_multipart()
-            self.device_id = int(worker_id)
-
-            self.check_for_command(directive, content)
-
-            data: BackupFileData = pickle.loads(content)
-            if data.message == BackupStatus.backup_started:
-                self.reset_problems()
-            elif data.message == BackupStatus.backup_completed:
-                self.send_problems()
-            else:
-                self.amount_downloaded = 0
-                self.init_copy_progress()
-
-                self.do_backup(data=data)
+        self.scan_id = None
+
+        if isinstance(arguments, BackupArguments):
+            device_id = int(self.worker_id)
+            self.destinations[device_id] = BackupDestination(
+                device_id=device_id,
+                path=arguments.path,
+                device_name=arguments.device_name,
+            )
+            self.destination = self.destinations[device_id]
+            while True:
+                self.flush_sink_messages()
+                worker_id, directive, content = self.receiver.recv_multipart()
+                self.check_for_command(directive, content)
+                data: BackupFileData = pickle.loads(content)
+                if data.message is not None:
+                    self.process_data(self.destination, data)
+                else:
+                    self.do_backup([(self.destination, data)])
+        else:
+            # Fan-out mode. Each message is a list of device ids and the data
+            # for that device: BackupArguments to add the device, None to remove
+            # it, or BackupFileData
+            items = arguments
+            while True:
+                files = []
+                for device_id, data in items:
+                    if isinstance(data, BackupArguments):
+                        logging.debug(
+                            "Backing up to %s in fan-out mode", data.device_name
+                        )
+                        self.destinations[device_id] = BackupDestination(
+                            device_id=device_id,
+                            path=data.path,
+                            device_name=data.device_name,
+                        )
+                    elif data is None:
+                        destination = self.destinations.pop(device_id)
+                        self.send_problems(destination)
+                    elif data.message is not None:
+                        self.process_data(self.destinations[device_id], data)
+                    else:
+                        files.append((self.destinations[device_id], data))
+                if files:
+                    self.do_backup(files)
+
+                self.flush_sink_messages()
+                worker_id, directive, content = self.receiver.recv_multipart()
+                self.check_for_command(directive, content)
+                items = pickle.loads(content)
 
 
 if __name__ == "__main__":
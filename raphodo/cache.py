@@ -37,6 +37,7 @@ import sqlite3
 import sys
 import time
 from collections import namedtuple
+from collections.abc import Sequence
 from urllib.request import pathname2url
 
 from PyQt5.QtCore import QSize
@@ -379,6 +380,10 @@ class FdoCacheLarge(Cache):
 class ThumbnailCacheSql:
     not_found = GetThumbnailPath(ThumbnailCacheDiskStatus.not_found, None, None, None)
 
+    # When checking more than this many thumbnails exist on the file system, read
+    # the entire cache directory once instead of checking each file individually
+    scandir_threshold = 500
+
     def __init__(self, create_table_if_not_exists: bool) -> None:
         self.cache_dir = get_program_cache_directory(create_if_not_exist=True)
         self.valid = self.cache_dir is not None
@@ -536,6 +541,85 @@ class ThumbnailCacheSql:
             in_cache.orientation_unknown,
         )
 
+    def get_thumbnail_paths(
+        self,
+        files: Sequence[tuple[str, int, float]],
+        camera_model: str | None = None,
+    ) -> list[GetThumbnailPath]:
+        """
+        Bulk equivalent of get_thumbnail_path(), using one database query, and
+        checking in one operation that the thumbnails exist on the file system.
+
+        :param files: sequence of full path of the file (including file name),
+         size of the file in bytes, and file modification time
+        :param camera_model: optional camera model. If the files are not from a
+         camera, then should be None.
+        :return: for each file, in the same order, a GetThumbnailPath tuple as
+         described in get_thumbnail_path()
+        """
+
+        if not self.valid:
+            return [self.not_found] * len(files)
+
+        in_caches = self.thumb_db.have_thumbnails(
+            [
+                (self.md5.get_uri(full_file_name, camera_model), size, mtime)
+                for full_file_name, size, mtime in files
+            ]
+        )
+
+        to_check = sum(
+            1 for in_cache in in_caches if in_cache is not None and not in_cache.failure
+        )
+        if to_check > self.scandir_threshold:
+            with os.scandir(self.cache_dir) as entries:
+                on_disk = {entry.name for entry in entries}
+
+            def exists(md5_name: str) -> bool:
+                return md5_name in on_disk
+
+        else:
+
+            def exists(md5_name: str) -> bool:
+                return os.path.exists(os.path.join(self.cache_dir, md5_name))
+
+        results = []
+        missing = []
+        for in_cache in in_caches:
+            if in_cache is None:
+                results.append(self.not_found)
+            elif in_cache.failure:
+                results.append(
+                    GetThumbnailPath(
+                        ThumbnailCacheDiskStatus.failure, None, in_cache.mdatatime, None
+                    )
+                )
+            elif not exists(in_cache.md5_name):
+                missing.append(in_cache.md5_name)
+                results.append(self.not_found)
+            else:
+                results.append(
+                    GetThumbnailPath(
+                        ThumbnailCacheDiskStatus.found,
+                        os.path.join(self.cache_dir, in_cache.md5_name),
+                        in_cache.mdatatime,
+                        in_cache.orientation_unknown,
+                    )
+                )
+
+        if missing:
+            self.thumb_db.delete_thumbnails(missing)
+
+        return results
+
+    def close(self) -> None:
+        """
+        Close the persistent database connection used for bulk lookups
+        """
+
+        if self.valid:
+            self.thumb_db.close()
+
     def cleanup_cache(self, days: int = 30) -> None:
         """
         Remove all thumbnails that have not been accessed for x days
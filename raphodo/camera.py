@@ -2,9 +2,12 @@
 # SPDX-FileCopyrightText: Copyright 2012-2015 Jim Easterbrook <jim@jim-easterbrook.me.uk>
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import contextlib
+import hashlib
 import logging
 import os
 import re
+from typing import BinaryIO
 
 import gphoto2 as gp
 
@@ -551,12 +554,9 @@ class Camera:
         # get_exif_extract() can raise CameraProblemEx(code=CameraErrorCode.read):
         buffer = self.get_exif_extract(dir_name, file_name, chunk_size_in_bytes)
 
-        view = memoryview(buffer)
-        dest_file = None
         try:
             with open(dest_full_filename, "wb") as dest_file:
-                src_bytes = view.tobytes()
-                dest_file.write(src_bytes)
+                dest_file.write(buffer)
             if mtime is not None:
                 os.utime(dest_full_filename, times=(mtime, mtime))
         except (OSError, PermissionError) as ex:
@@ -578,8 +578,12 @@ class Camera:
         check_for_command,
         return_file_bytes=False,
         chunk_size=1048576,
-    ) -> bytes | None:
+        md5: "hashlib._Hash | None" = None,
+    ) -> bytearray | None:
         """
+        Save the file from the camera to a local destination, writing each chunk
+        as it is read from the camera.
+
         :param dir_name: directory on the camera
         :param file_name: the photo or video
         :param size: the size of the file in bytes
@@ -590,60 +594,96 @@ class Camera:
         :param check_for_command: a function with which to check to see
          if the execution should pause, resume or stop
         :param return_file_bytes: if True, return a copy of the file's
-         bytes, else make that part of the return value None
+         bytes, else make that part of the return value None. Only when
+         True is memory allocated for the entire file.
         :param chunk_size: the size of the chunks to copy. The default
          is 1MB.
-        :return: True if the file was successfully saved, else False,
-         and the bytes that were copied
+        :param md5: if specified, a hash to update with each chunk
+        :return: the bytes that were copied, if requested
         """
 
-        src_bytes = None
-        view = memoryview(bytearray(size))
+        if return_file_bytes:
+            file_bytes = bytearray(size)
+            view = memoryview(file_bytes)
+        else:
+            file_bytes = None
+            view = memoryview(bytearray(min(chunk_size, size)))
+
         amount_downloaded = 0
-        for offset in range(0, size, chunk_size):
-            check_for_command()
-            stop = min(offset + chunk_size, size)
+        with contextlib.ExitStack() as stack:
             try:
-                bytes_read = gp.check_result(
-                    self.camera.file_read(
-                        dir_name,
-                        file_name,
-                        gp.GP_FILE_TYPE_NORMAL,
-                        offset,
-                        view[offset:stop],
+                dest_file = stack.enter_context(open(dest_full_filename, "wb"))
+            except OSError as ex:
+                self._log_save_error(dir_name, file_name, ex)
+                raise CameraProblemEx(code=CameraErrorCode.write, py_exception=ex)
+
+            for offset in range(0, size, chunk_size):
+                check_for_command()
+                stop = min(offset + chunk_size, size)
+                if file_bytes is None:
+                    chunk = view[: stop - offset]
+                else:
+                    chunk = view[offset:stop]
+                try:
+                    bytes_read = gp.check_result(
+                        self.camera.file_read(
+                            dir_name,
+                            file_name,
+                            gp.GP_FILE_TYPE_NORMAL,
+                            offset,
+                            chunk,
+                        )
                     )
-                )
+                except gp.GPhoto2Error as ex:
+                    logging.error(
+                        "Error copying file %s from camera %s: %s",
+                        os.path.join(dir_name, file_name),
+                        self.display_name,
+                        gphoto2_named_error(ex.code),
+                    )
+                    self._remove_partial_file(dest_file, dest_full_filename)
+                    if progress_callback is not None:
+                        progress_callback(size, size)
+                    raise CameraProblemEx(code=CameraErrorCode.read, gp_exception=ex)
+
+                chunk = chunk[:bytes_read]
+                try:
+                    dest_file.write(chunk)
+                except OSError as ex:
+                    self._log_save_error(dir_name, file_name, ex)
+                    self._remove_partial_file(dest_file, dest_full_filename)
+                    raise CameraProblemEx(code=CameraErrorCode.write, py_exception=ex)
+                if md5 is not None:
+                    md5.update(chunk)
                 amount_downloaded += bytes_read
                 if progress_callback is not None:
                     progress_callback(amount_downloaded, size)
-            except gp.GPhoto2Error as ex:
-                logging.error(
-                    "Error copying file %s from camera %s: %s",
-                    os.path.join(dir_name, file_name),
-                    self.display_name,
-                    gphoto2_named_error(ex.code),
-                )
-                if progress_callback is not None:
-                    progress_callback(size, size)
-                raise CameraProblemEx(code=CameraErrorCode.read, gp_exception=ex)
 
-        dest_file = None
-        try:
-            with open(dest_full_filename, "wb") as dest_file:
-                src_bytes = view.tobytes()
-                dest_file.write(src_bytes)
-        except (OSError, PermissionError) as ex:
-            logging.error(
-                "Error saving file %s from camera %s. Error %s: %s",
-                os.path.join(dir_name, file_name),
-                self.display_name,
-                ex.errno,
-                ex.strerror,
-            )
-            raise CameraProblemEx(code=CameraErrorCode.write, py_exception=ex)
+            # Closing the file writes what remains buffered, which can also fail
+            try:
+                dest_file.close()
+            except OSError as ex:
+                self._log_save_error(dir_name, file_name, ex)
+                self._remove_partial_file(dest_file, dest_full_filename)
+                raise CameraProblemEx(code=CameraErrorCode.write, py_exception=ex)
 
-        if return_file_bytes:
-            return src_bytes
+        return file_bytes
+
+    @staticmethod
+    def _remove_partial_file(dest_file: BinaryIO, dest_full_filename: str) -> None:
+        with contextlib.suppress(OSError):
+            dest_file.close()
+        with contextlib.suppress(OSError):
+            os.remove(dest_full_filename)
+
+    def _log_save_error(self, dir_name: str, file_name: str, ex: OSError) -> None:
+        logging.error(
+            "Error saving file %s from camera %s. Error %s: %s",
+            os.path.join(dir_name, file_name),
+            self.display_name,
+            ex.errno,
+            ex.strerror,
+        )
 
     def get_thumbnail(
         self,
@@ -773,6 +813,20 @@ class Camera:
                         return child2.get_value()
         return ""
 
+    def serial_number(self) -> str:
+        """
+        :return: the camera's serial number, as found in the camera configuration
+         loaded when the camera was initialized. Empty string if not found.
+        """
+
+        if self.camera_config is None:
+            return ""
+        try:
+            widget = self.camera_config.get_child_by_name("serialnumber")
+        except gp.GPhoto2Error:
+            return ""
+        return widget.get_value() or ""
+
     def get_storage_media_capacity(self, refresh: bool = False) -> list[StorageSpace]:
         """
         Determine the bytes free and bytes total (media capacity)
@@ -8,10 +8,14 @@ import locale
 import logging
 import os
 import pickle
+import queue
 import shutil
 import stat
 import sys
-from collections import defaultdict
+import threading
+from collections import defaultdict, deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from itertools import chain
 from operator import attrgetter
 
@@ -99,6 +103,70 @@ def copy_file_metadata(src: str, dst: str) -> tuple | None:
     #     return inst,
 
 
+def md5_of_file(
+    full_file_name: str, chunk_size: int = 1024 * 1024, bypass_cache: bool = False
+) -> str:
+    """
+    Calculate the MD5 hash of a file, reading it in chunks so that memory use
+    is constant regardless of the file's size
+
+    :param full_file_name: the file to hash
+    :param chunk_size: how much of the file to read at a time
+    :param bypass_cache: if True, read the file from the storage device rather
+     than from any copy of it in the page cache, and do not leave it in the page
+     cache. Use this to check a file that was just written is intact.
+    :return: the hex digest of the hash
+    """
+
+    md5 = hashlib.md5()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    drop_cache = bypass_cache and hasattr(os, "posix_fadvise")
+    with open(full_file_name, "rb", buffering=0) as f:
+        fd = f.fileno()
+        if drop_cache:
+            # Pages can be dropped from the cache only once they have been written
+            with contextlib.suppress(OSError):
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        offset = 0
+        while size := f.readinto(buffer):
+            md5.update(view[:size])
+            if drop_cache:
+                with contextlib.suppress(OSError):
+                    os.posix_fadvise(fd, offset, size, os.POSIX_FADV_DONTNEED)
+                offset += size
+    return md5.hexdigest()
+
+
+def _copy_file_range(src_fd: int, dest_fd: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dest_fd, count)
+
+
+def _sendfile(src_fd: int, dest_fd: int, count: int) -> int:
+    return os.sendfile(dest_fd, src_fd, None, count)
+
+
+# Functions that copy between two files without the file contents passing through
+# user space, in order of preference. Since Linux 2.6.33 sendfile can write to any
+# file, not only sockets.
+kernel_copy_functions = []
+if hasattr(os, "copy_file_range"):
+    kernel_copy_functions.append(_copy_file_range)
+if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+    kernel_copy_functions.append(_sendfile)
+
+# Errors indicating the file systems or kernel do not support copying this way
+kernel_copy_unsupported = {
+    errno.ENOSYS,
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+}
+
+
 def copy_camera_file_metadata(mtime: float, dst: str) -> tuple | None:
     # test code:
     # try:
@@ -112,6 +180,94 @@ def copy_camera_file_metadata(mtime: float, dst: str) -> tuple | None:
         return (inst,)  # note the comma: return a Tuple
 
 
+class ReadAhead:
+    """
+    Read files in a thread, ahead of their contents being written elsewhere.
+
+    The files are read in order into a bounded pool of buffers, so that reading
+    the next file can proceed while the current one is being written.
+    """
+
+    def __init__(self, files: list[str], chunk_size: int, buffers: int) -> None:
+        """
+        :param files: the files to read, in the order they will be written
+        :param chunk_size: how much of a file to read at a time
+        :param buffers: how many chunks can be read ahead of being written
+        """
+
+        self.pool: queue.SimpleQueue[bytearray] = queue.SimpleQueue()
+        for _ in range(buffers):
+            self.pool.put(bytearray(chunk_size))
+        # index of file in files, buffer, size of chunk in buffer, exception.
+        # A chunk size of zero indicates the end of the file.
+        self.chunks: queue.SimpleQueue[
+            tuple[int, bytearray | None, int, OSError | None]
+        ] = queue.SimpleQueue()
+        # Index of the most recent file whose contents have all been yielded, or
+        # that could not be read
+        self.finished = -1
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.read, args=(files,), name="ReadAhead", daemon=True
+        )
+        self.thread.start()
+
+    def read(self, files: list[str]) -> None:
+        for index, full_file_name in enumerate(files):
+            try:
+                with open(full_file_name, "rb", buffering=0) as f:
+                    while True:
+                        buffer = self.pool.get()
+                        if self.stop_event.is_set():
+                            return
+                        size = f.readinto(buffer)
+                        self.chunks.put((index, buffer, size, None))
+                        if not size:
+                            break
+            except OSError as e:
+                self.chunks.put((index, None, 0, e))
+
+    def file_chunks(self, index: int) -> Iterator[memoryview]:
+        """
+        Yield the contents of a file, one chunk at a time. Each chunk is valid
+        only until the next is requested.
+
+        :param index: the file's position in the list of files being read
+        :raises OSError: if the file could not be read
+        """
+
+        while True:
+            chunk_index, buffer, size, exception = self.chunks.get()
+            assert chunk_index == index
+            if exception is not None:
+                self.finished = index
+                raise exception
+            try:
+                if not size:
+                    self.finished = index
+                    return
+                yield memoryview(buffer)[:size]
+            finally:
+                self.pool.put(buffer)
+
+    def skip_file(self, index: int) -> None:
+        """
+        Discard any remaining contents of a file that will not be written.
+
+        :param index: the file's position in the list of files being read
+        """
+
+        if self.finished < index:
+            with contextlib.suppress(OSError):
+                for _chunk in self.file_chunks(index):
+                    pass
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        # Wake the thread should it be waiting for a buffer
+        self.pool.put(bytearray())
+
+
 class FileCopy:
     """
     Used by classes CopyFilesWorker and BackupFilesWorker
@@ -119,6 +275,8 @@ class FileCopy:
 
     def __init__(self):
         self.io_buffer = 1024 * 1024
+        # How many chunks of size io_buffer can be read ahead of being written
+        self.read_ahead_buffers = 16
         self.batch_size_bytes = 5 * 1024 * 1024
         self.dest = self.src = None
 
@@ -137,71 +295,202 @@ class FileCopy:
     def copy_from_filesystem(
         self, source: str, destination: str, rpd_file: RPDFile
     ) -> bool:
-        src_chunks = []
+        """
+        Copy a file from one file system location to another.
+
+        If the file must be verified, its MD5 hash is calculated as it is copied.
+        Otherwise the file is copied within the kernel where possible.
+        """
+
         try:
             with (
                 open(destination, "wb", self.io_buffer) as self.dest,
                 open(source, "rb", self.io_buffer) as self.src,
             ):
                 total = rpd_file.size
-                amount_downloaded = 0
 
-                while True:
-                    # first check if process is being stopped or paused
-                    self.check_for_controller_directive()
+                if self.verify_file:
+                    md5 = hashlib.md5()
+                    self.copy_in_user_space(0, total, md5)
+                    rpd_file.md5 = md5.hexdigest()
+                else:
+                    amount_downloaded = self.copy_in_kernel(total)
+                    # Copy whatever could not be copied in the kernel, if anything
+                    self.src.seek(amount_downloaded)
+                    self.dest.seek(amount_downloaded)
+                    self.copy_in_user_space(amount_downloaded, total)
 
-                    chunk = self.src.read(self.io_buffer)
-                    if chunk:
-                        self.dest.write(chunk)
-                        if self.verify_file:
-                            src_chunks.append(chunk)
-                        amount_downloaded += len(chunk)
-                        self.update_progress(amount_downloaded, total)
-                    else:
-                        break
+            return True
+        except (OSError, FileNotFoundError, PermissionError) as e:
+            self.copy_problem(source, destination, e)
+            return False
+        except Exception as e:
+            self.copy_problem(source, destination, e, unexpected=True)
+            return False
 
-            if self.verify_file:
-                src_bytes = b"".join(src_chunks)
-                rpd_file.md5 = hashlib.md5(src_bytes).hexdigest()
+    def copy_from_read_ahead(
+        self,
+        read_ahead: ReadAhead,
+        index: int,
+        destination: str,
+        rpd_file: RPDFile,
+    ) -> bool:
+        """
+        Write a file whose contents are being read in another thread.
+
+        If the file must be verified, its MD5 hash is calculated as it is written.
 
+        :param read_ahead: the thread reading the file
+        :param index: the file's position in the list of files being read
+        :param destination: where to write the file
+        :param rpd_file: the file being copied
+        """
+
+        source = rpd_file.full_file_name
+        total = rpd_file.size
+        amount_downloaded = 0
+        md5 = hashlib.md5() if self.verify_file else None
+        chunks = read_ahead.file_chunks(index)
+        try:
+            with open(destination, "wb", self.io_buffer) as self.dest:
+                for chunk in chunks:
+                    self.dest.write(chunk)
+                    if md5 is not None:
+                        md5.update(chunk)
+                    amount_downloaded += len(chunk)
+                    self.update_progress(amount_downloaded, total)
+
+                    # check if process is being stopped or paused
+                    self.check_for_controller_directive()
+
+            if md5 is not None:
+                rpd_file.md5 = md5.hexdigest()
             return True
         except (OSError, FileNotFoundError, PermissionError) as e:
-            self.problems.append(
-                FileCopyProblem(
-                    name=os.path.basename(source),
-                    uri=get_uri(full_file_name=source),
-                    exception=e,
-                )
-            )
-            try:
-                msg = f"{e.errno}: {e.strerror}"
-            except AttributeError:
-                msg = str(e)
-            logging.error("%s. Failed to copy %s to %s", msg, source, destination)
-            return False
+            self.copy_problem(source, destination, e)
         except Exception as e:
-            self.problems.append(
-                FileCopyProblem(
-                    name=os.path.basename(source),
-                    uri=get_uri(full_file_name=source),
-                    exception=e,
-                )
+            self.copy_problem(source, destination, e, unexpected=True)
+        chunks.close()
+        read_ahead.skip_file(index)
+        return False
+
+    def copy_problem(
+        self, source: str, destination: str, e: Exception, unexpected: bool = False
+    ) -> None:
+        """
+        Log and record a problem copying a file
+
+        :param source: the file being copied
+        :param destination: where it was being copied to
+        :param e: the exception that occurred
+        :param unexpected: whether the exception was not an OSError
+        """
+
+        self.problems.append(
+            FileCopyProblem(
+                name=os.path.basename(source),
+                uri=get_uri(full_file_name=source),
+                exception=e,
             )
-            try:
-                msg = f"{e.errno}: {e.strerror}"
-            except AttributeError:
-                msg = str(e)
+        )
+        try:
+            msg = f"{e.errno}: {e.strerror}"
+        except AttributeError:
+            msg = str(e)
+        if unexpected:
             logging.error(
                 "Unexpected error: %s. Failed to copy %s to %s",
                 msg,
                 source,
                 destination,
             )
-            return False
+        else:
+            logging.error("%s. Failed to copy %s to %s", msg, source, destination)
+
+    def copy_in_kernel(self, total: int) -> int:
+        """
+        Copy the source file to the destination using copy_file_range or sendfile,
+        so that the file contents are never copied into this process's memory.
+
+        :param total: the size of the file in bytes
+        :return: the number of bytes copied. If the file systems do not support
+         copying this way, the rest of the file must be copied some other way.
+        """
+
+        src_fd = self.src.fileno()
+        dest_fd = self.dest.fileno()
+        amount_downloaded = 0
+
+        for kernel_copy in kernel_copy_functions:
+            while True:
+                # first check if process is being stopped or paused
+                self.check_for_controller_directive()
+
+                try:
+                    copied = kernel_copy(src_fd, dest_fd, self.io_buffer)
+                except OSError as e:
+                    if e.errno in kernel_copy_unsupported:
+                        break
+                    raise
+                if not copied:
+                    if amount_downloaded:
+                        # end of file
+                        return amount_downloaded
+                    # Some file systems report nothing was copied instead of
+                    # indicating the operation is unsupported
+                    break
+                amount_downloaded += copied
+                self.update_progress(amount_downloaded, total)
+        return amount_downloaded
+
+    def copy_in_user_space(
+        self,
+        amount_downloaded: int,
+        total: int,
+        md5: "hashlib._Hash | None" = None,
+    ) -> None:
+        """
+        Copy the source file to the destination by reading each chunk into a
+        reusable buffer, optionally updating an MD5 hash with each chunk.
+
+        :param amount_downloaded: how much of the file has already been copied
+        :param total: the size of the file in bytes
+        :param md5: hash to update
+        """
+
+        buffer = bytearray(self.io_buffer)
+        view = memoryview(buffer)
+
+        while True:
+            # first check if process is being stopped or paused
+            self.check_for_controller_directive()
+
+            size = self.src.readinto(buffer)
+            if not size:
+                break
+            chunk = view[:size]
+            self.dest.write(chunk)
+            if md5 is not None:
+                md5.update(chunk)
+            amount_downloaded += size
+            self.update_progress(amount_downloaded, total)
 
 
 class CopyFilesWorker(WorkerInPublishPullPipeline, FileCopy):
+    sink_batch_size = 50
+
     def __init__(self):
+        # When downloading from a file system, reads files ahead of their being
+        # written
+        self.read_ahead: ReadAhead | None = None
+        # When reading ahead, copies file system metadata and associate files
+        self.finishing: ThreadPoolExecutor | None = None
+        # Copies whose results are yet to be sent to the main process, in the order
+        # they were made: completion of file system metadata and associate file
+        # copying, rpd_file, whether the copy succeeded, and the download count
+        self.finished_copies: deque[tuple[Future[tuple | None], RPDFile, bool, int]] = (
+            deque()
+        )
         super().__init__("CopyFiles")
 
     def terminate_camera_removed(self) -> None:
@@ -217,6 +506,7 @@ class CopyFilesWorker(WorkerInPublishPullPipeline, FileCopy):
 
     def cleanup_pre_stop(self) -> None:
         super().cleanup_pre_stop()
+        self.stop_read_ahead()
         if self.camera is not None and self.camera.camera_initialized:
             self.camera.free_camera()
         self.send_problems()
@@ -262,15 +552,16 @@ class CopyFilesWorker(WorkerInPublishPullPipeline, FileCopy):
             #     self.bytes_downloaded = 0
 
     def copy_from_camera(self, rpd_file: RPDFile) -> bool:
+        md5 = hashlib.md5() if self.verify_file else None
         try:
-            src_bytes = self.camera.save_file_by_chunks(
+            self.camera.save_file_by_chunks(
                 dir_name=rpd_file.path,
                 file_name=rpd_file.name,
                 size=rpd_file.size,
                 dest_full_filename=rpd_file.temp_full_file_name,
                 progress_callback=self.update_progress,
                 check_for_command=self.check_for_controller_directive,
-                return_file_bytes=self.verify_file,
+                md5=md5,
             )
         except CameraProblemEx as e:
             name = rpd_file.name
@@ -288,8 +579,8 @@ class CopyFilesWorker(WorkerInPublishPullPipeline, FileCopy):
                 )
             return False
 
-        if self.verify_file:
-            rpd_file.md5 = hashlib.md5(src_bytes).hexdigest()
+        if md5 is not None:
+            rpd_file.md5 = md5.hexdigest()
 
         return True
 
@@ -357,6 +648,159 @@ class CopyFilesWorker(WorkerInPublishPullPipeline, FileCopy):
             copy_file_metadata(associate_file_fullname, temp_full_name)
         return temp_full_name
 
+    def finish_copy(
+        self, rpd_file: RPDFile, temp_name: str, dest_dir: str
+    ) -> tuple | None:
+        """
+        Copy the file system metadata and any associate files of a file that was
+        successfully copied
+
+        :param rpd_file: the file that was copied
+        :param temp_name: temporary name of the file, without extension
+        :param dest_dir: temporary directory the file was copied to
+        :return: any errors copying the file system metadata
+        """
+
+        temp_full_file_name = rpd_file.temp_full_file_name
+        if rpd_file.from_camera:
+            mdata_exceptions = copy_camera_file_metadata(
+                float(rpd_file.modification_time), temp_full_file_name
+            )
+        else:
+            mdata_exceptions = copy_file_metadata(
+                rpd_file.full_file_name, temp_full_file_name
+            )
+
+        # copy THM (video thumbnail file) if there is one
+        if rpd_file.thm_full_name:
+            rpd_file.temp_thm_full_name = self.copy_associate_file(
+                # translators: refers to the video thumbnail file that some
+                # cameras generate -- it has a .THM file extension
+                rpd_file,
+                temp_name,
+                dest_dir,
+                rpd_file.thm_full_name,
+                _("video THM"),
+            )
+
+        # copy audio file if there is one
+        if rpd_file.audio_file_full_name:
+            rpd_file.temp_audio_full_name = self.copy_associate_file(
+                rpd_file,
+                temp_name,
+                dest_dir,
+                rpd_file.audio_file_full_name,
+                _("audio"),
+            )
+
+        # copy XMP file if there is one
+        if rpd_file.xmp_file_full_name:
+            rpd_file.temp_xmp_full_name = self.copy_associate_file(
+                rpd_file,
+                temp_name,
+                dest_dir,
+                rpd_file.xmp_file_full_name,
+                "XMP",
+            )
+
+        # copy Magic Lantern LOG file if there is one
+        if rpd_file.log_file_full_name:
+            rpd_file.temp_log_full_name = self.copy_associate_file(
+                rpd_file,
+                temp_name,
+                dest_dir,
+                rpd_file.log_file_full_name,
+                "LOG",
+            )
+
+        return mdata_exceptions
+
+    def send_finished_copies(self, wait: bool) -> None:
+        """
+        Send the results of copies to the main process, in the order the copies
+        were made, once their file system metadata and associate files have been
+        copied
+
+        :param wait: if True, wait for all copies to be finished, else send only
+         those already finished
+        """
+
+        while self.finished_copies and (wait or self.finished_copies[0][0].done()):
+            finished, rpd_file, copy_succeeded, download_count = (
+                self.finished_copies.popleft()
+            )
+            self.content = pickle.dumps(
+                CopyFilesResults(
+                    copy_succeeded=copy_succeeded,
+                    rpd_file=rpd_file,
+                    download_count=download_count,
+                    mdata_exceptions=finished.result(),
+                ),
+                pickle.HIGHEST_PROTOCOL,
+            )
+            self.send_message_to_sink()
+
+    def start_read_ahead(
+        self,
+        rpd_files: list[RPDFile],
+        photo_temp_dir: str | None,
+        video_temp_dir: str | None,
+    ) -> dict[int, int]:
+        """
+        When downloading from a file system other than the one being downloaded to,
+        start reading files ahead of their being written, so that neither file
+        system sits idle. While reading ahead, file system metadata and associate
+        files are copied in other threads.
+
+        :param rpd_files: the files to be downloaded, in download order
+        :param photo_temp_dir: temporary directory photos are downloaded to
+        :param video_temp_dir: temporary directory videos are downloaded to
+        :return: position of each file being read ahead in rpd_files: its position
+         in the list of files being read
+        """
+
+        read_ahead_index = {}
+        sources = []
+        different_device: dict[FileType, bool] = {}
+        for idx, rpd_file in enumerate(rpd_files):
+            if rpd_file.from_camera or rpd_file.cache_full_file_name:
+                continue
+            file_type = rpd_file.file_type
+            if file_type not in different_device:
+                if file_type == FileType.photo:
+                    dest_dir = photo_temp_dir
+                else:
+                    dest_dir = video_temp_dir
+                try:
+                    different_device[file_type] = not same_device(
+                        rpd_file.full_file_name, dest_dir
+                    )
+                except (OSError, TypeError):
+                    different_device[file_type] = False
+            if different_device[file_type]:
+                read_ahead_index[idx] = len(sources)
+                sources.append(rpd_file.full_file_name)
+
+        if sources:
+            logging.debug(
+                "Reading %s files ahead of writing them while copying from %s",
+                len(sources),
+                self.display_name,
+            )
+            self.read_ahead = ReadAhead(
+                sources, chunk_size=self.io_buffer, buffers=self.read_ahead_buffers
+            )
+            self.finishing = ThreadPoolExecutor(max_workers=2)
+        return read_ahead_index
+
+    def stop_read_ahead(self) -> None:
+        if self.read_ahead is not None:
+            self.read_ahead.stop()
+            self.read_ahead = None
+        if self.finishing is not None:
+            self.finishing.shutdown(wait=False, cancel_futures=True)
+            self.finishing = None
+
     def do_work(self):
         self.problems = CopyingProblems()
         args: CopyFilesArguments = pickle.loads(self.content)
@@ -443,6 +887,10 @@ class CopyFilesWorker(WorkerInPublishPullPipeline, FileCopy):
 
         self.display_name = args.device.display_name
 
+        read_ahead_index = self.start_read_ahead(
+            rpd_files, photo_temp_dir, video_temp_dir
+        )
+
         for idx, rpd_file in enumerate(rpd_files):
             self.dest = self.src = None
 
@@ -494,8 +942,7 @@ class CopyFilesWorker(WorkerInPublishPullPipeline, FileCopy):
                             )
                         )
                     if self.verify_file:
-                        with open(temp_full_file_name, "rb") as f:
-                            rpd_file.md5 = hashlib.md5(f.read()).hexdigest()
+                        rpd_file.md5 = md5_of_file(temp_full_file_name, self.io_buffer)
                     self.update_progress(rpd_file.size, rpd_file.size)
                 else:
                     # The download folder changed since the scan occurred, and is now
@@ -554,83 +1001,40 @@ class CopyFilesWorker(WorkerInPublishPullPipeline, FileCopy):
                     # Scenario 1
                     source = rpd_file.full_file_name
                     destination = rpd_file.temp_full_file_name
-                    copy_succeeded = self.copy_from_filesystem(
-                        source, destination, rpd_file
-                    )
+                    if idx in read_ahead_index:
+                        copy_succeeded = self.copy_from_read_ahead(
+                            read_ahead=self.read_ahead,
+                            index=read_ahead_index[idx],
+                            destination=destination,
+                            rpd_file=rpd_file,
+                        )
+                    else:
+                        copy_succeeded = self.copy_from_filesystem(
+                            source, destination, rpd_file
+                        )
 
             # increment this amount regardless of whether the copy actually
             # succeeded or not. It's necessary to keep the user informed.
             self.total_downloaded += rpd_file.size
 
-            mdata_exceptions = None
-
             if not copy_succeeded:
                 rpd_file.status = DownloadStatus.download_failed
                 logging.debug("Download failed for %s", rpd_file.full_file_name)
+                finished = Future()
+                finished.set_result(None)
+            elif self.finishing is not None:
+                finished = self.finishing.submit(
+                    self.finish_copy, rpd_file, temp_name, dest_dir
+                )
             else:
-                if rpd_file.from_camera:
-                    mdata_exceptions = copy_camera_file_metadata(
-                        float(rpd_file.modification_time), temp_full_file_name
-                    )
-                else:
-                    mdata_exceptions = copy_file_metadata(
-                        rpd_file.full_file_name, temp_full_file_name
-                    )
-
-                # copy THM (video thumbnail file) if there is one
-                if rpd_file.thm_full_name:
-                    rpd_file.temp_thm_full_name = self.copy_associate_file(
-                        # translators: refers to the video thumbnail file that some
-                        # cameras generate -- it has a .THM file extension
-                        rpd_file,
-                        temp_name,
-                        dest_dir,
-                        rpd_file.thm_full_name,
-                        _("video THM"),
-                    )
-
-                # copy audio file if there is one
-                if rpd_file.audio_file_full_name:
-                    rpd_file.temp_audio_full_name = self.copy_associate_file(
-                        rpd_file,
-                        temp_name,
-                        dest_dir,
-                        rpd_file.audio_file_full_name,
-                        _("audio"),
-                    )
-
-                # copy XMP file if there is one
-                if rpd_file.xmp_file_full_name:
-                    rpd_file.temp_xmp_full_name = self.copy_associate_file(
-                        rpd_file,
-                        temp_name,
-                        dest_dir,
-                        rpd_file.xmp_file_full_name,
-                        "XMP",
-                    )
-
-                # copy Magic Lantern LOG file if there is one
-                if rpd_file.log_file_full_name:
-                    rpd_file.temp_log_full_name = self.copy_associate_file(
-                        rpd_file,
-                        temp_name,
-                        dest_dir,
-                        rpd_file.log_file_full_name,
-                        "LOG",
-                    )
+                finished = Future()
+                finished.set_result(self.finish_copy(rpd_file, temp_name, dest_dir))
 
-            download_count = idx + 1
+            self.finished_copies.append((finished, rpd_file, copy_succeeded, idx + 1))
+            self.send_finished_copies(wait=False)
 
-            self.content = pickle.dumps(
-                CopyFilesResults(
-                    copy_succeeded=copy_succeeded,
-                    rpd_file=rpd_file,
-                    download_count=download_count,
-                    mdata_exceptions=mdata_exceptions,
-                ),
-                pickle.HIGHEST_PROTOCOL,
-            )
-            self.send_message_to_sink()
+        self.send_finished_copies(wait=True)
+        self.stop_read_ahead()
 
         if len(self.problems):
             logging.debug(
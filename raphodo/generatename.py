@@ -788,6 +788,64 @@ def get_video_metadata_component(video: VideoSubfolder | VideoName):
     return v
 
 
+# The ExifTool tags read by MetadataExiftool to get the value of each metadata
+# element
+metadata_exiftool_tags = {
+    APERTURE: ("FNumber",),
+    ISO: ("ISO",),
+    EXPOSURE_TIME: ("ExposureTime",),
+    FOCAL_LENGTH: ("FocalLength",),
+    CAMERA_MAKE: ("Make",),
+    CAMERA_MODEL: ("Model",),
+    SHORT_CAMERA_MODEL: ("Model",),
+    SHORT_CAMERA_MODEL_HYPHEN: ("Model",),
+    SERIAL_NUMBER: ("SerialNumber",),
+    SHUTTER_COUNT: ("ShutterCount", "ImageNumber"),
+    FILE_NUMBER: ("FileNumber",),
+    OWNER_NAME: ("OwnerName",),
+    ARTIST: ("Artist",),
+    COPYRIGHT: ("Copyright",),
+    CODEC: ("VideoStreamType", "VideoCodec"),
+    WIDTH: ("ImageWidth",),
+    HEIGHT: ("ImageHeight",),
+    FPS: ("FrameRate", "VideoFrameRate"),
+    LENGTH: ("Duration",),
+}
+
+# The ExifTool tags read to get a file's date and time, which is needed even when
+# names are not generated from it, e.g. when synchronizing RAW + JPEG sequence
+# numbers
+date_time_exiftool_tags = (
+    "DateTimeOriginal",
+    "CreateDate",
+    "FileModifyDate",
+    "SubSecTime",
+    "TimeZone",
+)
+
+
+def exiftool_tags(*pref_lists: list[str]) -> set[str]:
+    """
+    Determine which ExifTool tags must be read to generate names using the
+    preferences lists
+
+    >>> sorted(exiftool_tags([METADATA, APERTURE, "", TEXT, "-", ""]))
+    ... # doctest: +NORMALIZE_WHITESPACE
+    ['CreateDate', 'DateTimeOriginal', 'FNumber', 'FileModifyDate', 'SubSecTime',
+    'TimeZone']
+
+    :param pref_lists: file name and subfolder generation preferences lists
+    :return: set of ExifTool tag names
+    """
+
+    tags = set(date_time_exiftool_tags)
+    for pref_list in pref_lists:
+        for i in range(0, len(pref_list), 3):
+            if pref_list[i] == METADATA:
+                tags.update(metadata_exiftool_tags.get(pref_list[i + 1], ()))
+    return tags
+
+
 class Sequences:
     """
     Stores sequence numbers and letters used in generating file names.
@@ -6,11 +6,14 @@ Handle interprocess communication using 0MQ
 """
 
 import argparse
+import json
 import logging
 import os
 import pickle
 import shlex
+import socket
 import sys
+import threading
 import time
 from collections import deque
 from collections.abc import Sequence
@@ -35,8 +38,11 @@ from zmq.eventloop.zmqstream import ZMQStream
 from raphodo.constants import (
     BackupStatus,
     CameraErrorCode,
+    DeviceTimestampTZ,
+    DeviceType,
     ExtractionProcessing,
     ExtractionTask,
+    FileType,
     RenameAndMoveStatus,
 )
 from raphodo.devices import Device
@@ -50,6 +56,7 @@ from raphodo.problemnotification import (
 )
 from raphodo.proximity import TemporalProximityGroups
 from raphodo.rpdfile import FileSizeSum, FileTypeCounter, Photo, RPDFile, Video
+from raphodo.sharedthumbnails import SharedThumbnail
 from raphodo.storage.storage import StorageSpace
 from raphodo.tools.utilities import CacheDirs, set_pdeathsig
 from raphodo.ui.viewutils import ThumbnailDataForProximity
@@ -132,7 +139,93 @@ class ThreadNames:
     new_version = "new_version"
 
 
+class WorkerZygote:
+    """
+    Start worker processes by forking them from a zygote process that has already
+    imported the modules they need. See zygote.py.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.process: psutil.Popen | None = None
+        self.socket: socket.socket | None = None
+        self.replies = None
+        # Set if the zygote could not be used, in which case workers are started
+        # as normal
+        self.failed = os.getenv("RPD_NO_ZYGOTE") is not None
+
+    def _start(self) -> None:
+        self.socket, zygote_socket = socket.socketpair()
+        self.replies = self.socket.makefile("r", encoding="utf-8")
+        fileno = zygote_socket.fileno()
+        args = [
+            sys.executable,
+            os.path.join(os.path.abspath(os.path.dirname(__file__)), "zygote.py"),
+            "--socket",
+            str(fileno),
+        ]
+        try:
+            self.process = psutil.Popen(
+                args, pass_fds=(fileno,), preexec_fn=set_pdeathsig()
+            )
+        finally:
+            zygote_socket.close()
+        logging.debug("Started zygote process with pid %s", self.process.pid)
+
+    def ensure_running(self) -> None:
+        """
+        Start the zygote process, if it is not already running, so that it can
+        import the modules workers need before the first worker is requested.
+        """
+
+        with self.lock:
+            if self.failed or self.process is not None:
+                return
+            try:
+                self._start()
+            except OSError as e:
+                logging.warning("Failed to start zygote process: %s", e)
+                self.failed = True
+
+    def fork_worker(self, module: str, argv: list[str]) -> psutil.Process | None:
+        """
+        Fork a worker process from the zygote.
+
+        :param module: the module the worker runs as its __main__ module
+        :param argv: the worker's command line arguments, starting with the
+         script name
+        :return: the worker process, or None if the zygote could not be used
+        """
+
+        with self.lock:
+            if self.failed:
+                return None
+            try:
+                if self.process is None:
+                    self._start()
+                request = json.dumps([module, argv]) + "\n"
+                self.socket.sendall(request.encode())
+                return psutil.Process(int(self.replies.readline()))
+            except (OSError, ValueError, psutil.Error) as e:
+                logging.warning(
+                    "Failed to start %s using the zygote process. Starting worker "
+                    "processes without it. %s",
+                    module,
+                    e,
+                )
+                self.failed = True
+                return None
+
+
+worker_zygote = WorkerZygote()
+
+
 class ProcessManager:
+    # Whether to fork worker processes from the zygote process, rather than start
+    # a new Python interpreter for each one. The zygote must preload the worker's
+    # module.
+    use_zygote = False
+
     def __init__(self, logging_port: int, thread_name: str) -> None:
         super().__init__()
 
@@ -146,6 +239,9 @@ class ProcessManager:
         # Monitor which workers we have running
         self.workers: list[int] = []
 
+        if self.use_zygote:
+            worker_zygote.ensure_running()
+
     def _get_cmd(self) -> str:
         return "{} {}".format(
             sys.executable,
@@ -164,6 +260,16 @@ class ProcessManager:
         command_line = self._get_command_line(worker_id)
         args = shlex.split(command_line)
 
+        proc = None
+        if self.use_zygote:
+            module = f"raphodo.{os.path.splitext(self._process_to_run)[0]}"
+            proc = worker_zygote.fork_worker(module, args[1:])
+        if proc is not None:
+            logging.debug("Forked '%s' from zygote with pid %s", command_line, proc.pid)
+            self.workers.append(worker_id)
+            self.processes[worker_id] = proc
+            return
+
         # run command immediately, without waiting a reply, and instruct the Linux
         # kernel to send a terminate signal should this process unexpectedly die
         try:
@@ -299,10 +405,10 @@ class PullPipelineManager(ProcessManager, QObject):
             if self.receiver_socket in socks:
                 # Receive messages from the workers
                 # (or the terminate socket)
-                worker_id, directive, content = self.receiver_socket.recv_multipart()
+                worker_id, directive, *contents = self.receiver_socket.recv_multipart()
 
                 if directive == b"cmd":
-                    command = content
+                    command = contents[0]
                     assert command in (b"STOPPED", b"FINISHED", b"KILL")
                     if command == b"KILL":
                         # Terminate immediately, without regard for any
@@ -318,10 +424,10 @@ class PullPipelineManager(ProcessManager, QObject):
                         logging.debug(
                             "%s worker %s has stopped", self._process_name, worker_id
                         )
-                        self.workerStopped.emit(worker_id)
+                        self.worker_stopped(worker_id)
                     else:
                         # Worker has finished its work
-                        self.workerFinished.emit(worker_id)
+                        self.worker_finished(worker_id)
                     self.workers.remove(worker_id)
                     del self.processes[worker_id]
                     if not self.workers:
@@ -329,9 +435,14 @@ class PullPipelineManager(ProcessManager, QObject):
                     if not self.workers and self.terminating:
                         logging.debug(f"{self._process_name} is exiting")
                         break
+                elif directive == b"batch":
+                    # Several messages the worker sent together
+                    self.content_worker_id = worker_id
+                    self.process_sink_batch(contents)
                 else:
                     assert directive == b"data"
-                    self.content = content
+                    self.content = contents[0]
+                    self.content_worker_id = worker_id
                     self.process_sink_data()
 
             if self.thread_controller in socks:
@@ -365,6 +476,22 @@ class PullPipelineManager(ProcessManager, QObject):
         data = pickle.loads(self.content)
         self.message.emit(data)
 
+    def process_sink_batch(self, contents: list[bytes]) -> None:
+        """
+        Process several messages a worker sent together.
+
+        Override in subclass to emit one signal for all of them.
+        """
+
+        for self.content in contents:
+            self.process_sink_data()
+
+    def worker_finished(self, worker_id: int) -> None:
+        self.workerFinished.emit(worker_id)
+
+    def worker_stopped(self, worker_id: int) -> None:
+        self.workerStopped.emit(worker_id)
+
     def terminate_sink(self) -> None:
         self.terminate_socket.send_multipart([b"0", b"cmd", b"KILL"])
 
@@ -468,8 +595,29 @@ class LoadBalancerWorkerManager(ProcessManager):
         ]
 
 
+# Lanes of the thumbnail load balancer. Tasks in the expensive lane, like extracting
+# a frame from a video, take far longer than tasks in the cheap lane, like loading a
+# thumbnail embedded in a photo's exif.
+cheap_lane = b"cheap"
+expensive_lane = b"expensive"
+
+
 class LRUQueue:
-    """LRUQueue class using ZMQStream/IOLoop for event dispatching"""
+    """
+    LRUQueue class using ZMQStream/IOLoop for event dispatching.
+
+    Tasks are queued in a cheap and an expensive lane. Expensive tasks are sent only
+    to idle workers, and may occupy only a share of the workers while cheap tasks are
+    waiting, so a few long videos cannot starve the photos queued behind them. Idle
+    workers take expensive tasks beyond that share when no cheap tasks are waiting.
+
+    Each worker is given prefetch credits: it is sent up to that many cheap tasks at
+    once, so it need not wait on a round trip to the load balancer before starting
+    its next task. Cheap tasks are never queued behind an expensive task.
+    """
+
+    # Stop receiving tasks while this many are waiting to be sent to workers
+    max_queued_tasks = 200
 
     def __init__(
         self,
@@ -478,10 +626,30 @@ class LRUQueue:
         controller_socket: zmq.Socket,
         worker_type: str,
         process_manager: LoadBalancerWorkerManager,
+        expensive_worker_percent: int = 50,
+        prefetch: int = 2,
     ) -> None:
+        """
+        :param expensive_worker_percent: percentage of workers that may work on
+         expensive tasks while cheap tasks are waiting
+        :param prefetch: how many cheap tasks a worker may be sent at once
+        """
+
         self.worker_type = worker_type
         self.process_manager = process_manager
-        self.workers = deque()
+        # Workers that are ready for work, least recently used first
+        self.workers: deque[bytes] = deque()
+        # Worker identity: lanes of tasks the worker has been sent and not finished
+        self.outstanding: dict[bytes, deque[bytes]] = {}
+        self.tasks: dict[bytes, deque[list[bytes]]] = {
+            cheap_lane: deque(),
+            expensive_lane: deque(),
+        }
+        no_workers = process_manager.no_workers
+        self.max_expensive = max(1, no_workers * expensive_worker_percent // 100)
+        self.max_expensive_unshared = max(self.max_expensive, no_workers - 1)
+        self.prefetch = max(1, prefetch)
+        self.receiving = True
         self.terminating = False
         self.terminating_workers: set[bytes] = set()
         self.stopped_workers: set[int] = set()
@@ -490,16 +658,17 @@ class LRUQueue:
         self.frontend = ZMQStream(frontend_socket)
         self.controller = ZMQStream(controller_socket)
         self.backend.on_recv(self.handle_backend)
+        self.frontend.on_recv(self.handle_frontend)
         self.controller.on_recv(self.handle_controller)
 
         self.loop = ioloop.IOLoop.instance()
 
     def handle_controller(self, msg):
         self.terminating = True
+        for lane in self.tasks.values():
+            lane.clear()
 
-        while len(self.workers):
-            worker_identity = self.workers.popleft()
-
+        for worker_identity in self.outstanding:
             logging.debug(
                 "%s load balancer sending stop cmd to worker %s",
                 self.worker_type,
@@ -507,27 +676,24 @@ class LRUQueue:
             )
             self.backend.send_multipart([worker_identity, b"", b"cmd", b"STOP"])
             self.terminating_workers.add(worker_identity)
+        self.workers.clear()
 
         self.loop.add_timeout(time.time() + 3, self.loop.stop)
 
     def handle_backend(self, msg):
-        # Queue worker address for LRU routing
-        worker_identity, empty, client_addr = msg[:3]
+        worker_identity, empty = msg[:2]
 
-        # add worker back to the list of workers
-        self.workers.append(worker_identity)
+        # Second frame is empty
+        assert empty == b""
 
         zw = self.process_manager.zombie_workers()
         if zw:
             logging.critical("%s dead thumbnail extractors", len(zw))
 
-        # Second frame is empty
-        assert empty == b""
-
         if msg[-1] == b"STOPPED" and self.terminating:
             worker_id = get_worker_id_from_identity(worker_identity)
             self.stopped_workers.add(worker_id)
-            self.terminating_workers.remove(worker_identity)
+            self.terminating_workers.discard(worker_identity)
             if len(self.terminating_workers) == 0:
                 for worker_id in self.stopped_workers:
                     p: psutil.Process = self.process_manager.processes[worker_id]
@@ -542,20 +708,89 @@ class LRUQueue:
                         else:
                             logging.debug("Process %s is sleeping", pid)
                 self.loop.add_timeout(time.time() + 0.5, self.loop.stop)
+            return
 
-        if len(self.workers) == 1:
-            # on first recv, start accepting frontend messages
-            self.frontend.on_recv(self.handle_frontend)
+        if self.terminating:
+            return
+
+        if msg[-1] == b"READY":
+            self.outstanding[worker_identity] = deque()
+        elif self.outstanding.get(worker_identity):
+            self.outstanding[worker_identity].popleft()
+
+        # Queue worker address for LRU routing
+        if worker_identity in self.workers:
+            self.workers.remove(worker_identity)
+        self.workers.append(worker_identity)
+
+        self.dispatch()
 
     def handle_frontend(self, request):
-        #  Dequeue and drop the next worker address
-        worker_identity = self.workers.popleft()
+        if len(request) == 3:
+            lane = request[0]
+            request = request[1:]
+        else:
+            lane = cheap_lane
+        self.tasks[lane].append(request)
+        self.dispatch()
+
+    def expensive_workers(self) -> int:
+        return sum(1 for lanes in self.outstanding.values() if expensive_lane in lanes)
+
+    def available_worker(self, lane: bytes) -> bytes | None:
+        """
+        Find the least recently used worker that can be sent a task in the lane,
+        preferring workers that are idle.
 
-        message = [worker_identity, b""] + request
-        self.backend.send_multipart(message)
-        if len(self.workers) == 0:
-            # stop receiving until workers become available again
+        :return: the worker's identity, or None if no worker can take the task
+        """
+
+        if lane == expensive_lane:
+            if self.tasks[cheap_lane]:
+                max_expensive = self.max_expensive
+            else:
+                max_expensive = self.max_expensive_unshared
+            if self.expensive_workers() >= max_expensive:
+                return None
+
+        prefetching = None
+        for worker_identity in self.workers:
+            lanes = self.outstanding[worker_identity]
+            if not lanes:
+                return worker_identity
+            if (
+                prefetching is None
+                and lane == cheap_lane
+                and len(lanes) < self.prefetch
+                and expensive_lane not in lanes
+            ):
+                prefetching = worker_identity
+        return prefetching
+
+    def dispatch(self) -> None:
+        """
+        Send waiting tasks to workers that can take them
+        """
+
+        for lane in (expensive_lane, cheap_lane):
+            tasks = self.tasks[lane]
+            while tasks:
+                worker_identity = self.available_worker(lane)
+                if worker_identity is None:
+                    break
+                self.backend.send_multipart([worker_identity, b""] + tasks.popleft())
+                self.outstanding[worker_identity].append(lane)
+                self.workers.remove(worker_identity)
+                self.workers.append(worker_identity)
+
+        queued = len(self.tasks[cheap_lane]) + len(self.tasks[expensive_lane])
+        if self.receiving and queued >= self.max_queued_tasks:
+            # stop receiving until workers catch up
             self.frontend.stop_on_recv()
+            self.receiving = False
+        elif not self.receiving and queued < self.max_queued_tasks:
+            self.frontend.on_recv(self.handle_frontend)
+            self.receiving = True
 
 
 class LoadBalancer:
@@ -565,6 +800,8 @@ class LoadBalancer:
         self.parser.add_argument("--send", required=True)
         self.parser.add_argument("--controller", required=True)
         self.parser.add_argument("--logging", required=True)
+        self.parser.add_argument("--expensive-workers", type=int, default=50)
+        self.parser.add_argument("--prefetch", type=int, default=2)
 
         args = self.parser.parse_args()
         self.controller_port = args.controller
@@ -603,7 +840,15 @@ class LoadBalancer:
         process_manager.start_workers()
 
         # create queue with the sockets
-        queue = LRUQueue(backend, frontend, controller, worker_type, process_manager)  # noqa: F841
+        queue = LRUQueue(  # noqa: F841
+            backend,
+            frontend,
+            controller,
+            worker_type,
+            process_manager,
+            expensive_worker_percent=args.expensive_workers,
+            prefetch=args.prefetch,
+        )
 
         # start reactor, which is an infinite loop
         ioloop.IOLoop.instance().start()
@@ -630,11 +875,21 @@ class LoadBalancerManager(ProcessManager, QObject):
         sink_port: int,
         logging_port: int,
         thread_name: str,
+        expensive_worker_percent: int = 50,
+        prefetch: int = 2,
     ) -> None:
+        """
+        :param expensive_worker_percent: percentage of workers that may work on
+         expensive tasks while cheap tasks are waiting
+        :param prefetch: how many cheap tasks a worker may be sent at once
+        """
+
         super().__init__(logging_port=logging_port, thread_name=thread_name)
         self.no_workers = no_workers
         self.sink_port = sink_port
         self.context = context
+        self.expensive_worker_percent = expensive_worker_percent
+        self.prefetch = prefetch
 
     @pyqtSlot()
     def start_load_balancer(self) -> None:
@@ -666,7 +921,9 @@ class LoadBalancerManager(ProcessManager, QObject):
 
         return (
             f"{cmd} --receive {self.requester_port} --send {self.sink_port} "
-            f"--controller {self.controller_port} --logging {self.logging_port}"
+            f"--controller {self.controller_port} --logging {self.logging_port} "
+            f"--expensive-workers {self.expensive_worker_percent} "
+            f"--prefetch {self.prefetch}"
         )
 
 
@@ -884,6 +1141,12 @@ class ProcessLoggerPublisher:
 
 
 class WorkerProcess:
+    # The most messages sent to the sink together, and the longest time in seconds
+    # a message waits to be sent together with others. A batch size of 1 sends each
+    # message as soon as it is ready.
+    sink_batch_size = 1
+    sink_batch_seconds = 0.1
+
     def __init__(self, worker_type: str) -> None:
         super().__init__()
         self.parser = argparse.ArgumentParser()
@@ -891,6 +1154,10 @@ class WorkerProcess:
         self.parser.add_argument("--send", required=True)
         self.parser.add_argument("--logging", required=True)
 
+        # Messages waiting to be sent to the sink, and when the first was added
+        self.sink_batch: list[bytes] = []
+        self.sink_batch_started = 0.0
+
     def cleanup_pre_stop(self) -> None:
         """
         Operations to run if process is stopped.
@@ -916,7 +1183,39 @@ class WorkerProcess:
         )
 
     def send_message_to_sink(self) -> None:
-        self.sender.send_multipart([self.worker_id, b"data", self.content])
+        if self.sink_batch_size == 1:
+            self.sender.send_multipart([self.worker_id, b"data", self.content])
+            return
+
+        if not self.sink_batch:
+            self.sink_batch_started = time.monotonic()
+        self.sink_batch.append(self.content)
+        if len(self.sink_batch) >= self.sink_batch_size or self.sink_batch_due():
+            self.flush_sink_messages()
+
+    def sink_batch_due(self) -> bool:
+        """
+        :return: True if messages have waited long enough to be sent to the sink
+        """
+
+        return (
+            bool(self.sink_batch)
+            and time.monotonic() - self.sink_batch_started >= self.sink_batch_seconds
+        )
+
+    def flush_sink_messages(self) -> None:
+        """
+        Send any messages waiting to be sent to the sink, as one multipart message.
+
+        Must be called before the process waits for something other than its own
+        work, and before it sends a command to the sink.
+        """
+
+        if len(self.sink_batch) == 1:
+            self.sender.send_multipart([self.worker_id, b"data", self.sink_batch[0]])
+        elif self.sink_batch:
+            self.sender.send_multipart([self.worker_id, b"batch", *self.sink_batch])
+        self.sink_batch.clear()
 
     def initialise_process(self) -> None:
         # Wait to receive "START" message
@@ -1044,12 +1343,15 @@ class WorkerInPublishPullPipeline(WorkerProcess):
                 )
             else:
                 self.cleanup_pre_stop()
+                self.flush_sink_messages()
                 self.disconnect_logging()
                 # signal to sink that we've terminated before finishing
                 self.sender.send_multipart([self.worker_id, b"cmd", b"STOPPED"])
                 sys.exit(0)
 
     def check_for_controller_directive(self) -> None:
+        if self.sink_batch_due():
+            self.flush_sink_messages()
         try:
             # Don't block if the process is running regularly
             # If there is no command, an exception will occur
@@ -1060,10 +1362,12 @@ class WorkerInPublishPullPipeline(WorkerProcess):
             if command == b"PAUSE":
                 # Because the process is paused, do a blocking read to
                 # wait for the next command
+                self.flush_sink_messages()
                 worker_id, command = self.controller.recv_multipart()
                 assert command in [b"RESUME", b"STOP"]
             if command == b"STOP":
                 self.cleanup_pre_stop()
+                self.flush_sink_messages()
                 # before finishing, signal to sink that we've terminated
                 self.sender.send_multipart([self.worker_id, b"cmd", b"STOPPED"])
                 sys.exit(0)
@@ -1071,10 +1375,12 @@ class WorkerInPublishPullPipeline(WorkerProcess):
             pass  # Continue working
 
     def resume_work(self) -> None:
+        self.flush_sink_messages()
         worker_id, command = self.controller.recv_multipart()
         assert command in [b"RESUME", b"STOP"]
         if command == b"STOP":
             self.cleanup_pre_stop()
+            self.flush_sink_messages()
             self.disconnect_logging()
             # before finishing, signal to sink that we've terminated
             self.sender.send_multipart([self.worker_id, b"cmd", b"STOPPED"])
@@ -1084,6 +1390,7 @@ class WorkerInPublishPullPipeline(WorkerProcess):
         self.logger_publisher.close()
 
     def send_finished_command(self) -> None:
+        self.flush_sink_messages()
         self.sender.send_multipart([self.worker_id, b"cmd", b"FINISHED"])
 
 
@@ -1100,7 +1407,9 @@ class LoadBalancerWorker:
 
         self.context = zmq.Context()
 
-        self.requester = self.context.socket(zmq.REQ)
+        # A dealer rather than a request socket, so the load balancer can send this
+        # worker its next task before it has finished the current one
+        self.requester = self.context.socket(zmq.DEALER)
         self.identity = create_identity(worker_type, args.identity)
         self.requester.identity = self.identity
         self.requester.connect(f"tcp://localhost:{args.request}")
@@ -1115,9 +1424,26 @@ class LoadBalancerWorker:
         )
 
         # Tell the load balancer we are ready for work
-        self.requester.send(b"READY")
+        self.requester.send_multipart([b"", b"READY"])
         self.do_work()
 
+    def receive_task(self) -> tuple[bytes, bytes]:
+        """
+        Wait for the load balancer to send a task or a command
+
+        :return: directive and content
+        """
+
+        empty, directive, content = self.requester.recv_multipart()
+        return directive, content
+
+    def task_finished(self) -> None:
+        """
+        Tell the load balancer a task is finished, returning its credit
+        """
+
+        self.requester.send_multipart([b"", b"OK"])
+
     def do_work(self) -> None:
         # Implement in subclass
         pass
@@ -1135,7 +1461,7 @@ class LoadBalancerWorker:
         self.cleanup_pre_stop()
         identity = self.requester.identity.decode()
         # signal to load balancer that we've terminated before finishing
-        self.requester.send_multipart([b"", b"", b"STOPPED"])
+        self.requester.send_multipart([b"", b"STOPPED"])
         self.requester.close()
         self.sender.close()
         self.logger_publisher.close()
@@ -1239,7 +1565,14 @@ class ScanArguments:
     """
 
     def __init__(
-        self, device: Device, ignore_other_types: bool, log_gphoto2: bool
+        self,
+        device: Device,
+        ignore_other_types: bool,
+        log_gphoto2: bool,
+        scan_processes: int = 1,
+        partition: tuple[int, int] | None = None,
+        scan_id: int | None = None,
+        device_timestamp_type: DeviceTimestampTZ | None = None,
     ) -> None:
         """
         Pass arguments to the scan process
@@ -1248,11 +1581,24 @@ class ScanArguments:
         :param ignore_other_types: ignore file types like TIFF
         :param log_gphoto2: whether to generate detailed gphoto2 log
          messages
+        :param scan_processes: how many processes may scan the device in
+         parallel. Applies only to external volumes and paths on This Computer.
+        :param partition: when the device is scanned by more than one process,
+         the index of the part of the device this process scans, and the number
+         of parts
+        :param scan_id: scan id of the device, when it differs from the worker
+         id of the process scanning it
+        :param device_timestamp_type: how the device records timestamps, if
+         already determined by the process scanning the first part of the device
         """
 
         self.device = device
         self.ignore_other_types = ignore_other_types
         self.log_gphoto2 = log_gphoto2
+        self.scan_processes = scan_processes
+        self.partition = partition
+        self.scan_id = scan_id
+        self.device_timestamp_type = device_timestamp_type
 
 
 class ScanResults:
@@ -1280,6 +1626,7 @@ class ScanResults:
         camera_removed: bool | None = None,
         entire_video_required: bool | None = None,
         entire_photo_required: bool | None = None,
+        device_timestamp_type: DeviceTimestampTZ | None = None,
     ) -> None:
         self.rpd_files = rpd_files
         self.file_type_counter = file_type_counter
@@ -1302,6 +1649,7 @@ class ScanResults:
         self.camera_removed = camera_removed
         self.entire_video_required = entire_video_required
         self.entire_photo_required = entire_photo_required
+        self.device_timestamp_type = device_timestamp_type
 
 
 class CopyFilesArguments:
@@ -1457,8 +1805,18 @@ class OffloadData:
         rpd_files: Sequence[RPDFile] | None = None,
         strip_characters: bool | None = None,
         folders_preview: FoldersPreview | None = None,
+        removed_uids: Sequence[bytes] | None = None,
     ) -> None:
+        """
+        :param thumbnail_rows: files to add to the Timeline, or whose values have
+         changed since the Timeline was last generated
+        :param proximity_seconds: the Timeline's temporal span. If specified, the
+         Timeline is generated.
+        :param removed_uids: files to remove from the Timeline
+        """
+
         self.thumbnail_rows = thumbnail_rows
+        self.removed_uids = removed_uids
         self.proximity_seconds = proximity_seconds
         self.rpd_files = rpd_files
         self.strip_characters = strip_characters
@@ -1480,9 +1838,17 @@ class BackupArguments:
     Pass start up data to the back up process
     """
 
-    def __init__(self, path: str, device_name: str) -> None:
+    def __init__(self, path: str, device_name: str, fan_out: bool = False) -> None:
+        """
+        :param path: the path to back up to
+        :param device_name: the backup device's display name
+        :param fan_out: if True, back up to this device using the process that
+         backs up to all other devices in fan-out mode, reading each file only once
+        """
+
         self.path = path
         self.device_name = device_name
+        self.fan_out = fan_out
 
 
 class BackupFileData:
@@ -1612,10 +1978,16 @@ class GenerateThumbnailsResults:
         scan_id: int | None = None,
         cache_dirs: CacheDirs | None = None,
         camera_removed: bool | None = None,
+        shared_thumbnail: SharedThumbnail | None = None,
+        in_thumbnail_cache: bool = False,
     ) -> None:
         self.rpd_file = rpd_file
-        # If thumbnail_bytes is None, there is no thumbnail
+        # If thumbnail_bytes and shared_thumbnail are None, there is no thumbnail
         self.thumbnail_bytes = thumbnail_bytes
+        self.shared_thumbnail = shared_thumbnail
+        # Whether the thumbnail is in the Rapid Photo Downloader thumbnail cache, and
+        # so can be loaded from it again
+        self.in_thumbnail_cache = in_thumbnail_cache
         self.scan_id = scan_id
         self.cache_dirs = cache_dirs
         self.camera_removed = camera_removed
@@ -1636,6 +2008,7 @@ class ThumbnailExtractorArgument:
         write_fdo_thumbnail: bool,
         send_thumb_to_main: bool,
         force_exiftool: bool,
+        shared_memory: bool = False,
     ) -> None:
         self.rpd_file = rpd_file
         self.task = task
@@ -1649,6 +2022,32 @@ class ThumbnailExtractorArgument:
         self.write_fdo_thumbnail = write_fdo_thumbnail
         self.send_thumb_to_main = send_thumb_to_main
         self.force_exiftool = force_exiftool
+        # Whether to send the thumbnail to the main process using shared memory
+        self.shared_memory = shared_memory
+
+    def lane(self) -> bytes:
+        """
+        :return: the thumbnail load balancer lane the task should be queued in
+        """
+
+        if self.task in (
+            ExtractionTask.load_heif_directly,
+            ExtractionTask.load_heif_and_exif_directly,
+        ):
+            return expensive_lane
+        if self.rpd_file.file_type == FileType.video and self.task in (
+            ExtractionTask.extract_from_file,
+            ExtractionTask.extract_from_file_and_load_metadata,
+        ):
+            # Extracting a frame using GStreamer
+            return expensive_lane
+        if self.rpd_file.extension in ("tif", "tiff") and self.task in (
+            ExtractionTask.load_file_directly,
+            ExtractionTask.load_file_and_exif_directly,
+            ExtractionTask.load_file_directly_metadata_from_secondary,
+        ):
+            return expensive_lane
+        return cheap_lane
 
 
 class RenameMoveFileManager(PushPullDaemonManager):
@@ -1738,6 +2137,8 @@ class ScanManager(PublishPullPipelineManager):
     this computer path)
     """
 
+    use_zygote = True
+
     scannedFiles = pyqtSignal(
         "PyQt_PyObject", "PyQt_PyObject", FileTypeCounter, "PyQt_PyObject", bool, bool
     )
@@ -1752,9 +2153,148 @@ class ScanManager(PublishPullPipelineManager):
         self._process_name = "Scan Manager"
         self._process_to_run = "scan.py"
 
+        # Large external volumes and paths on This Computer can be scanned by more
+        # than one process, each scanning a part of the device. The process
+        # scanning the first part has a worker id equal to the device's scan id.
+        # The processes scanning the other parts are assigned negative worker ids
+        # of equal length, so no worker id's subscription filter is a prefix of
+        # another's.
+
+        # scan id: arguments for the processes scanning the other parts
+        self.partition_arguments: dict[int, ScanArguments] = {}
+        # worker id of process scanning one of the other parts: scan id
+        self.partition_workers: dict[int, int] = {}
+        # scan id: worker ids of all processes scanning the device that are running
+        self.partition_workers_running: dict[int, set[int]] = {}
+        # scan id: worker id: most recent file type counter and file size sum
+        self.partition_totals: dict[
+            int, dict[int, tuple[FileTypeCounter, FileSizeSum]]
+        ] = {}
+        self.partition_worker_counter = 0
+
+    def start_worker(self, worker_id: bytes, data: bytes) -> None:
+        scan_arguments: ScanArguments = pickle.loads(data)
+        if (
+            scan_arguments.scan_processes > 1
+            and scan_arguments.partition is None
+            and scan_arguments.device.device_type
+            in (DeviceType.volume, DeviceType.path)
+        ):
+            scan_id = int(worker_id)
+            logging.debug(
+                "Scanning %s using %s processes",
+                scan_arguments.device.display_name,
+                scan_arguments.scan_processes,
+            )
+            scan_arguments.partition = (0, scan_arguments.scan_processes)
+            self.partition_arguments[scan_id] = scan_arguments
+            self.partition_workers_running[scan_id] = {scan_id}
+            self.partition_totals[scan_id] = {}
+            data = pickle.dumps(scan_arguments, pickle.HIGHEST_PROTOCOL)
+        super().start_worker(worker_id=worker_id, data=data)
+
+    def start_partition_workers(
+        self, scan_id: int, device_timestamp_type: DeviceTimestampTZ
+    ) -> None:
+        """
+        Start the processes that scan the other parts of the device, now that the
+        process scanning the first part has determined the device's approach to
+        timestamps.
+
+        :param scan_id: scan id of the device
+        :param device_timestamp_type: how the device records timestamps
+        """
+
+        scan_arguments = self.partition_arguments.pop(scan_id, None)
+        if scan_arguments is None or self.terminating:
+            # The scan has already been stopped
+            return
+
+        scan_arguments.scan_id = scan_id
+        scan_arguments.device_timestamp_type = device_timestamp_type
+        partitions = scan_arguments.partition[1]
+        for index in range(1, partitions):
+            self.partition_worker_counter += 1
+            worker_id = -(1_000_000 + self.partition_worker_counter)
+            scan_arguments.partition = (index, partitions)
+            self.partition_workers[worker_id] = scan_id
+            self.partition_workers_running[scan_id].add(worker_id)
+            super().start_worker(
+                worker_id=make_filter_from_worker_id(worker_id),
+                data=pickle.dumps(scan_arguments, pickle.HIGHEST_PROTOCOL),
+            )
+
+    def stop_worker(self, worker_id: bytes) -> None:
+        scan_id = int(worker_id)
+        self.partition_arguments.pop(scan_id, None)
+        for partition_worker_id in self.partition_workers_running.get(scan_id, ()):
+            if partition_worker_id != scan_id:
+                super().stop_worker(make_filter_from_worker_id(partition_worker_id))
+        super().stop_worker(worker_id)
+
+    def partition_worker_done(self, worker_id: int) -> int | None:
+        """
+        Track the completion of the processes scanning the device.
+
+        :param worker_id: the process that has finished or stopped
+        :return: the device's scan id if the scan of the device is complete, else
+         None
+        """
+
+        scan_id = self.partition_workers.pop(worker_id, worker_id)
+        running = self.partition_workers_running.get(scan_id)
+        if running is None:
+            return scan_id
+        running.discard(worker_id)
+        if running:
+            return None
+        del self.partition_workers_running[scan_id]
+        del self.partition_totals[scan_id]
+        self.partition_arguments.pop(scan_id, None)
+        return scan_id
+
+    def worker_finished(self, worker_id: int) -> None:
+        scan_id = self.partition_worker_done(worker_id)
+        if scan_id is not None:
+            self.workerFinished.emit(scan_id)
+
+    def worker_stopped(self, worker_id: int) -> None:
+        scan_id = self.partition_worker_done(worker_id)
+        if scan_id is not None:
+            self.workerStopped.emit(scan_id)
+
+    def combine_partition_totals(
+        self, data: ScanResults
+    ) -> tuple[FileTypeCounter, FileSizeSum]:
+        """
+        The file type counter and file size sum sent by a scan process are running
+        totals for the part of the device it is scanning. Combine them with the
+        most recent totals for the other parts of the device.
+
+        :param data: scan results from one process scanning the device
+        :return: file type counter and file size sum for the device
+        """
+
+        totals = self.partition_totals[data.rpd_files[0].scan_id]
+        totals[int(self.content_worker_id)] = (
+            data.file_type_counter,
+            data.file_size_sum,
+        )
+        file_type_counter = FileTypeCounter()
+        file_size_sum = FileSizeSum()
+        for counter, size_sum in totals.values():
+            file_type_counter.update(counter)
+            for key, size in size_sum.items():
+                file_size_sum[key] += size
+        return file_type_counter, file_size_sum
+
     def process_sink_data(self) -> None:
         data: ScanResults = pickle.loads(self.content)
         if data.rpd_files is not None:
+            if data.rpd_files[0].scan_id in self.partition_totals:
+                data.file_type_counter, data.file_size_sum = (
+                    self.combine_partition_totals(data)
+                )
             assert data.file_type_counter
             assert data.file_size_sum
             assert data.entire_video_required is not None
@@ -1786,6 +2326,8 @@ class ScanManager(PublishPullPipelineManager):
                 self.scanProblems.emit(data.scan_id, data.problems)
             elif data.camera_removed is not None:
                 self.cameraRemovedDuringScan.emit(data.scan_id)
+            elif data.device_timestamp_type is not None:
+                self.start_partition_workers(data.scan_id, data.device_timestamp_type)
             else:
                 assert data.fatal_error
                 self.fatalError.emit(data.scan_id)
@@ -1800,39 +2342,198 @@ class BackupManager(PublishPullPipelineManager):
     handles both the photos and the videos. However if photos are being
     backed up to one drive, and videos to another, there would be a
     worker process for each drive (2 in total).
+
+    Alternatively, in fan-out mode, a single worker process backs up to all
+    devices, reading each file once and writing it to every device. Messages
+    sent to the individual devices are forwarded to that process, with the data
+    for each file forwarded only once every device has been sent it.
     """
 
+    use_zygote = True
+
     message = pyqtSignal(int, bool, bool, RPDFile, str, "PyQt_PyObject")
+    # List of message arguments, from messages a worker sent together
+    messages = pyqtSignal("PyQt_PyObject")
     bytesBackedUp = pyqtSignal("PyQt_PyObject", "PyQt_PyObject")
+    # List of bytesBackedUp arguments, from messages a worker sent together
+    bytesBackedUpBatch = pyqtSignal("PyQt_PyObject")
     backupProblems = pyqtSignal(int, "PyQt_PyObject")
 
     def __init__(self, logging_port: int) -> None:
         super().__init__(logging_port=logging_port, thread_name=ThreadNames.backup)
         self._process_name = "Backup Manager"
         self._process_to_run = "backupfile.py"
+        # Devices backed up to in fan-out mode
+        self.fan_out_devices: set[int] = set()
+        # Worker id of the fan-out process, or None if it has been told to stop. A
+        # stopping process remains a worker until it reports it has stopped, so each
+        # fan-out process is given a new negative id, and work for its successor is
+        # never sent to it. Consecutive ids never share a prefix, which matters
+        # because workers subscribe to messages by prefix.
+        self.fan_out_worker_id: int | None = None
+        self.last_fan_out_worker_id = 0
+        # rpd_file uid: {device_id: BackupFileData}
+        self.fan_out_pending: dict[bytes, dict[int, BackupFileData]] = {}
+
+    def send_to_fan_out_worker(self, items: list[tuple[int, Any]]) -> None:
+        """
+        :param items: device ids and the data to send for each device
+        """
+
+        if self.fan_out_worker_id not in self.workers:
+            logging.error(
+                "Cannot send data for %s backup device(s) because there is no "
+                "backup process in fan-out mode",
+                len(items),
+            )
+            return
+        super().send_message_to_worker(
+            data=pickle.dumps(items, pickle.HIGHEST_PROTOCOL),
+            worker_id=make_filter_from_worker_id(self.fan_out_worker_id),
+        )
+
+    def flush_fan_out_pending(self) -> None:
+        """
+        Forward the data for each file that every device has now been sent
+        """
+
+        for uid in list(self.fan_out_pending):
+            pending = self.fan_out_pending[uid]
+            if self.fan_out_devices.issubset(pending):
+                del self.fan_out_pending[uid]
+                items = [
+                    (device_id, data)
+                    for device_id, data in pending.items()
+                    if device_id in self.fan_out_devices
+                ]
+                if items:
+                    self.send_to_fan_out_worker(items)
+
+    def start_worker(self, worker_id: bytes, data: bytes) -> None:
+        backup_arguments: BackupArguments = pickle.loads(data)
+        if not backup_arguments.fan_out:
+            super().start_worker(worker_id=worker_id, data=data)
+            return
+
+        device_id = int(worker_id)
+        self.fan_out_devices.add(device_id)
+        items = [(device_id, backup_arguments)]
+        if self.fan_out_worker_id in self.workers:
+            self.send_to_fan_out_worker(items)
+        else:
+            self.last_fan_out_worker_id -= 1
+            self.fan_out_worker_id = self.last_fan_out_worker_id
+            logging.debug(
+                "Starting backup process %s in fan-out mode", self.fan_out_worker_id
+            )
+            super().start_worker(
+                worker_id=make_filter_from_worker_id(self.fan_out_worker_id),
+                data=pickle.dumps(items, pickle.HIGHEST_PROTOCOL),
+            )
+
+    def send_message_to_worker(
+        self, data: bytes, worker_id: bytes | None = None
+    ) -> None:
+        if worker_id is None or int(worker_id) not in self.fan_out_devices:
+            super().send_message_to_worker(data=data, worker_id=worker_id)
+            return
+
+        device_id = int(worker_id)
+        backup_file_data: BackupFileData = pickle.loads(data)
+        if backup_file_data.rpd_file is None:
+            self.send_to_fan_out_worker([(device_id, backup_file_data)])
+        else:
+            uid = backup_file_data.rpd_file.uid
+            self.fan_out_pending.setdefault(uid, {})[device_id] = backup_file_data
+            self.flush_fan_out_pending()
+
+    def stop_worker(self, worker_id: bytes) -> None:
+        device_id = int(worker_id)
+        if device_id not in self.fan_out_devices:
+            super().stop_worker(worker_id)
+            return
+
+        self.fan_out_devices.remove(device_id)
+        self.send_to_fan_out_worker([(device_id, None)])
+        if self.fan_out_devices:
+            self.flush_fan_out_pending()
+        else:
+            if self.fan_out_pending:
+                logging.error(
+                    "Discarding backup data for %s file(s) not yet sent to every "
+                    "backup device",
+                    len(self.fan_out_pending),
+                )
+                self.fan_out_pending.clear()
+            super().stop_worker(make_filter_from_worker_id(self.fan_out_worker_id))
+            # Any device added from now on is backed up to by a new process
+            self.fan_out_worker_id = None
+
+    @staticmethod
+    def bytes_backed_up(data: BackupResults) -> tuple[int, int]:
+        assert data.scan_id is not None
+        assert data.chunk_downloaded >= 0
+        assert data.total_downloaded >= 0
+        return data.scan_id, data.chunk_downloaded
+
+    @staticmethod
+    def file_backed_up(
+        data: BackupResults,
+    ) -> tuple[int, bool, bool, RPDFile, str, tuple | None]:
+        assert data.do_backup is not None
+        assert data.rpd_file is not None
+        return (
+            data.device_id,
+            data.backup_succeeded,
+            data.do_backup,
+            data.rpd_file,
+            data.backup_full_file_name,
+            data.mdata_exceptions,
+        )
 
     def process_sink_data(self) -> None:
         data: BackupResults = pickle.loads(self.content)
         if data.total_downloaded is not None:
-            assert data.scan_id is not None
-            assert data.chunk_downloaded >= 0
-            assert data.total_downloaded >= 0
-            self.bytesBackedUp.emit(data.scan_id, data.chunk_downloaded)
+            self.bytesBackedUp.emit(*self.bytes_backed_up(data))
         elif data.backup_succeeded is not None:
-            assert data.do_backup is not None
-            assert data.rpd_file is not None
-            self.message.emit(
-                data.device_id,
-                data.backup_succeeded,
-                data.do_backup,
-                data.rpd_file,
-                data.backup_full_file_name,
-                data.mdata_exceptions,
-            )
+            self.message.emit(*self.file_backed_up(data))
         else:
             assert data.problems is not None
             self.backupProblems.emit(data.device_id, data.problems)
 
+    def process_sink_batch(self, contents: list[bytes]) -> None:
+        """
+        Emit one signal for each run of files backed up, and one for each run of
+        bytes backed up, keeping the order in which the worker sent its messages
+        """
+
+        files = []
+        progress = []
+        for self.content in contents:
+            data: BackupResults = pickle.loads(self.content)
+            if data.total_downloaded is not None:
+                if files:
+                    self.messages.emit(files)
+                    files = []
+                progress.append(self.bytes_backed_up(data))
+            elif data.backup_succeeded is not None:
+                if progress:
+                    self.bytesBackedUpBatch.emit(progress)
+                    progress = []
+                files.append(self.file_backed_up(data))
+            else:
+                if files:
+                    self.messages.emit(files)
+                    files = []
+                if progress:
+                    self.bytesBackedUpBatch.emit(progress)
+                    progress = []
+                self.process_sink_data()
+        if files:
+            self.messages.emit(files)
+        if progress:
+            self.bytesBackedUpBatch.emit(progress)
+
 
 class CopyFilesManager(PublishPullPipelineManager):
     """
@@ -1840,9 +2541,15 @@ class CopyFilesManager(PublishPullPipelineManager):
     during the download process
     """
 
+    use_zygote = True
+
     message = pyqtSignal(bool, RPDFile, int, "PyQt_PyObject")
+    # List of message arguments, from messages a worker sent together
+    messages = pyqtSignal("PyQt_PyObject")
     tempDirs = pyqtSignal(int, str, str)
     bytesDownloaded = pyqtSignal(int, "PyQt_PyObject", "PyQt_PyObject")
+    # List of bytesDownloaded arguments, from messages a worker sent together
+    bytesDownloadedBatch = pyqtSignal("PyQt_PyObject")
     copyProblems = pyqtSignal(int, "PyQt_PyObject")
     cameraRemoved = pyqtSignal(int)
 
@@ -1851,32 +2558,37 @@ class CopyFilesManager(PublishPullPipelineManager):
         self._process_name = "Copy Files Manager"
         self._process_to_run = "copyfiles.py"
 
+    @staticmethod
+    def bytes_downloaded(data: CopyFilesResults) -> tuple[int, int, int]:
+        assert data.scan_id is not None
+        if data.chunk_downloaded < 0:
+            logging.critical(
+                "Chunk downloaded is less than zero: %s", data.chunk_downloaded
+            )
+        if data.total_downloaded < 0:
+            logging.critical(
+                "Chunk downloaded is less than zero: %s", data.total_downloaded
+            )
+        return data.scan_id, data.total_downloaded, data.chunk_downloaded
+
+    @staticmethod
+    def file_copied(data: CopyFilesResults) -> tuple[bool, RPDFile, int, tuple | None]:
+        assert data.rpd_file is not None
+        assert data.download_count is not None
+        return (
+            data.copy_succeeded,
+            data.rpd_file,
+            data.download_count,
+            data.mdata_exceptions,
+        )
+
     def process_sink_data(self) -> None:
         data: CopyFilesResults = pickle.loads(self.content)
         if data.total_downloaded is not None:
-            assert data.scan_id is not None
-            if data.chunk_downloaded < 0:
-                logging.critical(
-                    "Chunk downloaded is less than zero: %s", data.chunk_downloaded
-                )
-            if data.total_downloaded < 0:
-                logging.critical(
-                    "Chunk downloaded is less than zero: %s", data.total_downloaded
-                )
-
-            self.bytesDownloaded.emit(
-                data.scan_id, data.total_downloaded, data.chunk_downloaded
-            )
+            self.bytesDownloaded.emit(*self.bytes_downloaded(data))
 
         elif data.copy_succeeded is not None:
-            assert data.rpd_file is not None
-            assert data.download_count is not None
-            self.message.emit(
-                data.copy_succeeded,
-                data.rpd_file,
-                data.download_count,
-                data.mdata_exceptions,
-            )
+            self.message.emit(*self.file_copied(data))
 
         elif data.problems is not None:
             self.copyProblems.emit(data.scan_id, data.problems)
@@ -1887,3 +2599,36 @@ class CopyFilesManager(PublishPullPipelineManager):
             assert data.photo_temp_dir is not None and data.video_temp_dir is not None
             assert data.scan_id is not None
             self.tempDirs.emit(data.scan_id, data.photo_temp_dir, data.video_temp_dir)
+
+    def process_sink_batch(self, contents: list[bytes]) -> None:
+        """
+        Emit one signal for each run of files copied, and one for each run of bytes
+        downloaded, keeping the order in which the worker sent its messages
+        """
+
+        files = []
+        progress = []
+        for self.content in contents:
+            data: CopyFilesResults = pickle.loads(self.content)
+            if data.total_downloaded is not None:
+                if files:
+                    self.messages.emit(files)
+                    files = []
+                progress.append(self.bytes_downloaded(data))
+            elif data.copy_succeeded is not None:
+                if progress:
+                    self.bytesDownloadedBatch.emit(progress)
+                    progress = []
+                files.append(self.file_copied(data))
+            else:
+                if files:
+                    self.messages.emit(files)
+                    files = []
+                if progress:
+                    self.bytesDownloadedBatch.emit(progress)
+                    progress = []
+                self.process_sink_data()
+        if files:
+            self.messages.emit(files)
+        if progress:
+            self.bytesDownloadedBatch.emit(progress)
@@ -60,15 +60,20 @@ The function set_pdeathsig is used to automatically terminate the process when t
 program exits.
 Added call to exiftool_version_info()
 Added execute_binary()
+Added get_tags_batch_no_formatting()
+Read replies in linear time, and added ExifToolPool.
 Update to Python 3.10 conventions.
 """
 
 import codecs
+import contextlib
 import json
 import os
+import queue
 import subprocess
 import sys
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 from raphodo.programversions import exiftool_version_info
 from raphodo.tools.utilities import set_pdeathsig
@@ -86,10 +91,10 @@ If the executable is not located in one of the paths listed in the
 # The standard value should be fine.
 sentinel = b"{ready}"
 
-# The block size when reading from exiftool.  The standard value
-# should be fine, though other values might give better performance in
-# some cases.
-block_size = 4096
+# The initial block size when reading from exiftool. It doubles each
+# time a reply fills the buffer it is being read into, so large replies
+# such as embedded previews are read in few system calls.
+block_size = 65536
 
 
 # This code has been adapted from Lib/os.py in the Python source tree
@@ -263,11 +268,20 @@ class ExifTool:
             raise ValueError("ExifTool instance not running.")
         self._process.stdin.write(b"\n".join(params + (b"-execute\n",)))
         self._process.stdin.flush()
-        output = b""
+        # Read directly into a buffer that grows as needed, so that reading a
+        # large reply does not repeatedly copy what has already been read
+        output = bytearray(block_size)
+        length = 0
         fd = self._process.stdout.fileno()
-        while not output[-32:].strip().endswith(sentinel):
-            output += os.read(fd, block_size)
-        return output.strip()[: -len(sentinel)]
+        while not output[max(0, length - 32) : length].strip().endswith(sentinel):
+            if length == len(output):
+                output.extend(bytes(length))
+            read = os.readv(fd, [memoryview(output)[length:]])
+            if not read:
+                raise ValueError("ExifTool instance closed its output.")
+            length += read
+        del output[length:]
+        return bytes(output.strip()[: -len(sentinel)])
 
     def execute_json(self, *params):
         """Execute the given batch of parameters and parse the JSON output.
@@ -341,6 +355,21 @@ class ExifTool:
         params.extend(filenames)
         return self.execute_json(*params)
 
+    def get_tags_batch_no_formatting(self, tags, filenames):
+        """Return only specified tags for the given files, with the tag values
+        formatted by ExifTool.
+
+        This method is similar to :py:meth:`get_tags_batch()`, except
+        that the parameter ``-n`` is not used.
+        """
+        if isinstance(tags, basestring):
+            raise TypeError("The argument 'tags' must be an iterable of strings")
+        if isinstance(filenames, basestring):
+            raise TypeError("The argument 'filenames' must be an iterable of strings")
+        params = ["-" + t for t in tags]
+        params.extend(filenames)
+        return self.execute_json_no_formatting(*params)
+
     def get_tags(self, tags, filename):
         """Return only specified tags for a single file.
 
@@ -374,3 +403,143 @@ class ExifTool:
         ``None`` if this tag was not found in the file.
         """
         return self.get_tag_batch(tag, [filename])[0]
+
+
+class ExifToolPool:
+    """Run several ``exiftool`` processes in batch mode, to be shared by
+    the threads of a program.
+
+    The pool has the same methods for querying files as
+    :py:class:`ExifTool`. Each request is run by an idle process, waiting
+    for one to become idle if necessary. Requests for many files are
+    divided between the processes, which run them concurrently.
+
+    Like :py:class:`ExifTool`, the pool can be used as a context manager::
+
+        with ExifToolPool(processes=4) as et:
+            metadata = et.get_metadata_batch(files)
+    """
+
+    # Do not divide batches of files into parts smaller than this
+    min_files_per_process = 8
+
+    def __init__(self, processes=2, common_arguments=None, executable_=None):
+        """
+        :param processes: how many ``exiftool`` processes to run
+        :param common_arguments: each call to exiftool will contain
+        these command line arguments
+        :param executable_:
+        """
+        self.processes = max(1, processes)
+        self.common_arguments = common_arguments
+        self.executable = executable_
+        self._processes = []
+        self._idle = queue.Queue()
+        self._executor = None
+        self.running = False
+
+    def start(self):
+        """Start the ``exiftool`` processes."""
+        if self.running:
+            warnings.warn("ExifTool pool already running; doing nothing.")
+            return
+
+        for _ in range(self.processes):
+            et = ExifTool(self.common_arguments, self.executable)
+            et.start()
+            if not et.running:
+                break
+            self._processes.append(et)
+            self._idle.put(et)
+        self.running = bool(self._processes)
+        if len(self._processes) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=len(self._processes))
+
+    def terminate(self):
+        """Terminate the ``exiftool`` processes."""
+        if not self.running:
+            return
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for et in self._processes:
+            et.terminate()
+        self._processes = []
+        self._idle = queue.Queue()
+        self.running = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.terminate()
+
+    def __del__(self):
+        self.terminate()
+
+    @contextlib.contextmanager
+    def process(self):
+        """Use an idle ``exiftool`` process, waiting for one if necessary."""
+        if not self.running:
+            raise ValueError("ExifTool pool not running.")
+        et = self._idle.get()
+        try:
+            yield et
+        finally:
+            self._idle.put(et)
+
+    def _run(self, method, *params):
+        with self.process() as et:
+            return getattr(et, method)(*params)
+
+    def _run_batch(self, method, filenames, *params):
+        """Run the method on parts of the list of files concurrently,
+        returning the combined results in the order of the files."""
+        if isinstance(filenames, basestring):
+            raise TypeError("The argument 'filenames' must be an iterable of strings")
+        filenames = list(filenames)
+        parts = min(len(self._processes), len(filenames) // self.min_files_per_process)
+        if parts <= 1:
+            return self._run(method, *params, filenames)
+        part_size = -(-len(filenames) // parts)
+        futures = [
+            self._executor.submit(
+                self._run, method, *params, filenames[i : i + part_size]
+            )
+            for i in range(0, len(filenames), part_size)
+        ]
+        return [result for future in futures for result in future.result()]
+
+    def execute(self, *params):
+        return self._run("execute", *params)
+
+    def execute_json(self, *params):
+        return self._run("execute_json", *params)
+
+    def execute_json_no_formatting(self, *params):
+        return self._run("execute_json_no_formatting", *params)
+
+    def execute_binary(self, *params):
+        return self._run("execute_binary", *params)
+
+    def get_metadata_batch(self, filenames):
+        return self._run_batch("get_metadata_batch", filenames)
+
+    def get_metadata(self, filename):
+        return self._run("get_metadata", filename)
+
+    def get_tags_batch(self, tags, filenames):
+        return self._run_batch("get_tags_batch", filenames, tags)
+
+    def get_tags_batch_no_formatting(self, tags, filenames):
+        return self._run_batch("get_tags_batch_no_formatting", filenames, tags)
+
+    def get_tags(self, tags, filename):
+        return self._run("get_tags", tags, filename)
+
+    def get_tag_batch(self, tag, filenames):
+        return self._run_batch("get_tag_batch", filenames, tag)
+
+    def get_tag(self, tag, filename):
+        return self._run("get_tag", tag, filename)
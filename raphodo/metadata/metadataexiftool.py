@@ -9,6 +9,7 @@ import datetime
 import logging
 import re
 from collections import OrderedDict
+from collections.abc import Iterable, Sequence
 from typing import Any
 
 import raphodo.metadata.exiftool as exiftool
@@ -26,6 +27,9 @@ _index_preview = {
     4: "ThumbnailTIFF",
 }
 
+# Tags whose values are wanted as formatted by ExifTool, i.e. without the -n option
+string_format_tags = frozenset(("VideoStreamType", "FileNumber", "ExposureTime"))
+
 
 def generate_short_camera_model(
     model_name: str, include_characters: str = "", missing: str = ""
@@ -181,6 +185,10 @@ class MetadataExiftool:
             self.ext = None
         self.metadata = dict()
         self.metadata_string_format = dict()
+        # Values of tags read for many files at once by prefetch_metadata(). Tags
+        # that were read but are not in the file are absent from the dict.
+        self.prefetched = dict()
+        self.prefetched_tags = set()
         self.et_process = et_process
         if file_type is None and full_file_name is not None:
             file_type = fileformats.file_type_from_splitext(file_name=full_file_name)
@@ -241,7 +249,10 @@ class MetadataExiftool:
         self.ignore_tiff_preview_256 = ("cr2",)
 
     def _get(self, key, missing):
-        if key in ("VideoStreamType", "FileNumber", "ExposureTime"):
+        if key in self.prefetched_tags:
+            return self.prefetched.get(key, missing)
+
+        if key in string_format_tags:
             # special cases: want ExifTool's string formatting
             # i.e. no -n tag
             if not self.metadata_string_format:
@@ -719,6 +730,51 @@ class MetadataExiftool:
         return [v for v in self.index_preview.values() if v in self.metadata]
 
 
+def prefetch_metadata(
+    et_process: exiftool.ExifTool,
+    files: Sequence[MetadataExiftool],
+    tags: Iterable[str],
+) -> None:
+    """
+    Read only the given tags for many files at once, instead of reading every tag
+    one file at a time when each file's metadata is first used.
+
+    Tags not prefetched are still read as needed.
+
+    :param et_process: the daemon ExifTool process
+    :param files: metadata of the files whose tags should be read
+    :param tags: names of the tags to read
+    """
+
+    tags = set(tags)
+    # Files whose metadata has already been read in full need nothing more
+    by_name = {f.full_file_name: f for f in files if not f.metadata}
+    if not by_name or not tags:
+        return
+
+    names = list(by_name)
+    # tags to read, and the ExifTool call that reads them
+    calls = []
+    numeric_tags = tags - string_format_tags
+    if numeric_tags:
+        calls.append((numeric_tags, et_process.get_tags_batch))
+    formatted_tags = tags & string_format_tags
+    if formatted_tags:
+        calls.append((formatted_tags, et_process.get_tags_batch_no_formatting))
+
+    for call_tags, get_tags_batch in calls:
+        try:
+            results = get_tags_batch(call_tags, names)
+        except ValueError as e:
+            logging.warning("Could not prefetch metadata using ExifTool: %s", e)
+            return
+        for file_values in results:
+            metadata = by_name.get(file_values.pop("SourceFile", None))
+            if metadata is not None:
+                metadata.prefetched.update(file_values)
+                metadata.prefetched_tags.update(call_tags)
+
+
 if __name__ == "__main__":
     import sys
 
@@ -18,12 +18,14 @@ from raphodo.interprocess import (
     OffloadData,
     OffloadResults,
 )
-from raphodo.proximity import TemporalProximityGroups
+from raphodo.proximity import ProximityIndex
 
 
 class OffloadWorker(DaemonProcess):
     def __init__(self) -> None:
         super().__init__("Offload")
+        # Files in the Timeline, kept between generations of it
+        self.proximity_index = ProximityIndex()
 
     def run(self) -> None:
         try:
@@ -33,10 +35,13 @@ class OffloadWorker(DaemonProcess):
                 self.check_for_command(directive, content)
 
                 data: OffloadData = pickle.loads(content)
-                if data.thumbnail_rows:
-                    groups = TemporalProximityGroups(
-                        thumbnail_rows=data.thumbnail_rows,
-                        temporal_span=data.proximity_seconds,
+                if data.proximity_seconds is not None:
+                    self.proximity_index.update(
+                        thumbnail_rows=data.thumbnail_rows or (),
+                        removed_uids=data.removed_uids or (),
+                    )
+                    groups = self.proximity_index.groups(
+                        temporal_span=data.proximity_seconds
                     )
                     self.content = pickle.dumps(
                         OffloadResults(proximity_groups=groups), pickle.HIGHEST_PROTOCOL
@@ -371,6 +371,7 @@ class Preferences:
         video_backup_identifier=platform_videos_identifier(),
         backup_photo_location=os.path.expanduser("~"),
         backup_video_location=os.path.expanduser("~"),
+        backup_fan_out=False,  # new in 0.9.37
     )
     automation_defaults = dict(
         auto_download_at_startup=False,
@@ -388,6 +389,14 @@ class Preferences:
         save_fdo_thumbnails=True,
         max_cpu_cores=default_thumbnail_process_count(),
         keep_thumbnails_days=30,
+        scan_directory_listing_threads=4,  # new in 0.9.37
+        scan_processes_per_device=1,  # new in 0.9.37
+        thumbnail_shared_memory=False,  # new in 0.9.37
+        thumbnail_expensive_worker_percent=50,  # new in 0.9.37
+        thumbnail_prefetch=2,  # new in 0.9.37
+        thumbnail_memory_budget=512,  # new in 0.9.37
+        rename_exiftool_processes=2,  # new in 0.9.37
+        thumbnail_camera_read_ahead=8,  # new in 0.9.37
     )
     error_defaults = dict(
         conflict_resolution=int(constants.ConflictResolution.skip),
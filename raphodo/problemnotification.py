@@ -174,6 +174,15 @@ class FileCopyProblem(SeriousProblem):
         return escape(_("Unable to copy file %s")) % self.href
 
 
+class FileVerificationProblem(SeriousProblem):
+    @property
+    def body(self) -> str:
+        return (
+            escape(_("File %s does not match the original and may be corrupt"))
+            % self.href
+        )
+
+
 class FileZeroLengthProblem(SeriousProblem):
     @property
     def body(self) -> str:
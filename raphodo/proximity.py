@@ -2,14 +2,18 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
+from bisect import bisect_right
 from collections import Counter, defaultdict, deque, namedtuple
-from collections.abc import Generator
-from datetime import datetime
+from collections.abc import Generator, Sequence
+from datetime import date, datetime
 from itertools import groupby
 from operator import attrgetter
+from time import localtime
 
 import arrow.arrow
 from arrow.arrow import Arrow
+from dateutil.tz import tzlocal
+from sortedcontainers import SortedKeyList
 
 try:
     from PyQt5.Qt import QWIDGETSIZE_MAX
@@ -36,6 +40,7 @@ from PyQt5.QtCore import (
 )
 from PyQt5.QtGui import (
     QColor,
+    QCursor,
     QFont,
     QFontMetricsF,
     QGuiApplication,
@@ -62,6 +67,7 @@ from PyQt5.QtWidgets import (
     QStyledItemDelegate,
     QStyleOptionViewItem,
     QTableView,
+    QToolTip,
     QVBoxLayout,
     QWidget,
 )
@@ -106,8 +112,6 @@ ProximityRow = namedtuple(
     "tooltip_date_col1, tooltip_date_col2",
 )
 
-UidTime = namedtuple("UidTime", "ctime, arrowtime, uid, previously_downloaded")
-
 
 def humanize_time_span(
     start: Arrow,
@@ -745,8 +749,22 @@ class TemporalProximityGroups:
 
     # @profile
     def __init__(
-        self, thumbnail_rows: list[ThumbnailDataForProximity], temporal_span: int = 3600
+        self,
+        thumbnail_rows: list[ThumbnailDataForProximity],
+        temporal_span: int = 3600,
+        local_dates: list[tuple[int, int, int]] | None = None,
+        group_starts: list[int] | None = None,
     ):
+        """
+        :param thumbnail_rows: the files to display in the Timeline
+        :param temporal_span: the largest gap in seconds between files in the same
+         proximity group
+        :param local_dates: the local year, month and day of each file. If
+         specified, thumbnail_rows must already be sorted by ctime.
+        :param group_starts: the index of the first file in each proximity group,
+         if thumbnail_rows is already sorted by ctime
+        """
+
         self.rows: list[ProximityRow] = []
 
         self.invalid_rows: tuple[int] = tuple()
@@ -755,7 +773,8 @@ class TemporalProximityGroups:
         self.uids = MetaUid()
 
         self.file_types_in_cell: dict[tuple[int, int], str] = dict()
-        times_by_proximity: defaultdict[int, Arrow] = defaultdict(list)
+        # group_no: time of the first file in the proximity group
+        start_by_proximity: dict[int, Arrow] = dict()
 
         # The rows the user sees in column 2 can span more than one row of the Timeline.
         # Each day always spans at least one row in the Timeline, possibly more.
@@ -767,14 +786,11 @@ class TemporalProximityGroups:
             int, tuple[tuple[int, int, int], list[bytes]]
         ] = dict()
 
-        # uid: (year, month, day)
-        year_month_day: dict[bytes, tuple[int, int, int]] = dict()
-
         # group_no: list[uid]
-        uids_by_proximity: dict[int, list[bytes]] = defaultdict(list)
+        uids_by_proximity: dict[int, list[bytes]] = dict()
         # Determine if proximity group contains any files have not been previously
         # downloaded
-        new_files_by_proximity: dict[int, set[bool]] = defaultdict(set)
+        new_files_by_proximity: dict[int, bool] = dict()
 
         # Text that will appear in column 2 -- they proximity groups
         text_by_proximity = deque()
@@ -810,6 +826,11 @@ class TemporalProximityGroups:
         # col1, col2, uid
         self.col1_col2_uid: list[tuple[int, int, bytes]] = []
 
+        # How many proximity groups there would be for each of the temporal spans the
+        # user can choose
+        # minutes: number of groups
+        self.group_counts: dict[int, int] = {}
+
         if len(thumbnail_rows) == 0:
             return
 
@@ -818,18 +839,11 @@ class TemporalProximityGroups:
 
         self.display_values = ProximityDisplayValues()
 
-        thumbnail_rows.sort(key=attrgetter("ctime"))
+        if local_dates is None:
+            thumbnail_rows.sort(key=attrgetter("ctime"))
 
-        # Generate an arrow date time for every timestamp we have
-        uid_times = [
-            UidTime(
-                tr.ctime,
-                arrow.get(tr.ctime).to("local"),
-                tr.uid,
-                tr.previously_downloaded,
-            )
-            for tr in thumbnail_rows
-        ]
+        ctimes = [row.ctime for row in thumbnail_rows]
+        all_uids = [row.uid for row in thumbnail_rows]
 
         self.thumbnail_types = tuple(row.file_type for row in thumbnail_rows)
 
@@ -838,42 +852,42 @@ class TemporalProximityGroups:
         current_month = now.month
 
         # Phase 1: Associate unique ids with their year, month and day
-        for x in uid_times:
-            t: Arrow = x.arrowtime
-            year = t.year
-            month = t.month
-            day = t.day
-
-            # Could use arrow.floor here, but it's extremely slow
-            self.day_groups[(year, month, day)].append(x.uid)
-            self.month_groups[(year, month)].append(x.uid)
-            self.year_groups[year].append(x.uid)
-            if year != current_year:
-                # the Timeline contains an entry from the previous year to now
-                self._previous_year = True
-            if month != current_month or self._previous_year:
-                # the Timeline contains an entry from the previous month to now
-                self._previous_month = True
-            # Remember this extracted value
-            year_month_day[x.uid] = year, month, day
-
-        # Phase 2: Identify the proximity groups
-        group_no = 0
-        prev = uid_times[0]
-
-        times_by_proximity[group_no].append(prev.arrowtime)
-        uids_by_proximity[group_no].append(prev.uid)
-        new_files_by_proximity[group_no].add(not prev.previously_downloaded)
-
-        if len(uid_times) > 1:
-            for current in uid_times[1:]:
-                ctime = current.ctime
-                if ctime - prev.ctime > temporal_span:
-                    group_no += 1
-                times_by_proximity[group_no].append(current.arrowtime)
-                uids_by_proximity[group_no].append(current.uid)
-                new_files_by_proximity[group_no].add(not current.previously_downloaded)
-                prev = current
+
+        # Creating an Arrow date time for every timestamp is extremely slow, so
+        # convert each timestamp directly to its local calendar date. Arrow date
+        # times are created only for the start and end of each proximity group.
+        if local_dates is None:
+            local_dates = [localtime(ctime)[:3] for ctime in ctimes]
+
+        for uid, y_m_d in zip(all_uids, local_dates):
+            year, month, day = y_m_d
+            self.day_groups[y_m_d].append(uid)
+            self.month_groups[(year, month)].append(uid)
+            self.year_groups[year].append(uid)
+
+        # Does the Timeline contain an entry from the previous year or month to now?
+        self._previous_year = any(year != current_year for year in self.year_groups)
+        self._previous_month = self._previous_year or any(
+            month != current_month for year, month in self.month_groups
+        )
+
+        # Phase 2: Identify the proximity groups, by finding the gaps between
+        # timestamps that are larger than the temporal span
+
+        # Index of the first and last file in each proximity group
+        if group_starts is None:
+            group_starts = [0] + [
+                i
+                for i, (prev, current) in enumerate(zip(ctimes, ctimes[1:]), start=1)
+                if current - prev > temporal_span
+            ]
+        group_ends = [i - 1 for i in group_starts[1:]] + [len(ctimes) - 1]
+
+        for group_no, (first, last) in enumerate(zip(group_starts, group_ends)):
+            uids_by_proximity[group_no] = all_uids[first : last + 1]
+            new_files_by_proximity[group_no] = not all(
+                row.previously_downloaded for row in thumbnail_rows[first : last + 1]
+            )
 
         # Phase 3: Generate the proximity group's text that will appear in
         # the right-most column and its tooltips.
@@ -883,11 +897,12 @@ class TemporalProximityGroups:
         # in the proximity group is more than 1, then also keep a copy of the group
         # where it is broken into separate calendar days
 
-        # The iteration order doesn't really matter here, so can get away with the
-        # potentially unsorted output of dict.items()
-        for group_no, group in times_by_proximity.items():
-            start: Arrow = group[0]
-            end: Arrow = group[-1]
+        for group_no, (first, last) in enumerate(zip(group_starts, group_ends)):
+            # Use the same time zone rules as localtime(), which Arrow's "local"
+            # does not on every version of Arrow
+            start = arrow.get(ctimes[first]).to(tzlocal())
+            end = start if first == last else arrow.get(ctimes[last]).to(tzlocal())
+            start_by_proximity[group_no] = start
 
             # Generate the text
             short_form = humanize_time_span(start, end, insert_cr_on_long_line=True)
@@ -896,20 +911,20 @@ class TemporalProximityGroups:
 
             # Calculate the number of calendar days spanned by this proximity group
             # e.g. 2015-12-1 12:00 - 2015-12-2 15:00 = 2 days
-            if len(group) > 1:
-                span = len(list(Arrow.span_range("day", start, end)))
-                day_spans_by_proximity[group_no] = span
-                if span > 1:
-                    # break the proximity group members into calendar days
-                    uids_by_day_in_proximity_group[group_no] = tuple(
-                        (y_m_d, list(day))
-                        for y_m_d, day in groupby(
-                            uids_by_proximity[group_no], year_month_day.get
-                        )
+            span = (
+                date(*local_dates[last]).toordinal()
+                - date(*local_dates[first]).toordinal()
+                + 1
+            )
+            day_spans_by_proximity[group_no] = span
+            if span > 1:
+                # break the proximity group members into calendar days
+                uids_by_day_in_proximity_group[group_no] = tuple(
+                    (y_m_d, [all_uids[i] for i in day])
+                    for y_m_d, day in groupby(
+                        range(first, last + 1), local_dates.__getitem__
                     )
-            else:
-                # start == end
-                day_spans_by_proximity[group_no] = 1
+                )
 
         # Phase 4: Generate the rows to be displayed in the Timeline
 
@@ -930,13 +945,11 @@ class TemporalProximityGroups:
 
             timeline_row += 1
 
-            proximity_group_times = times_by_proximity[group_no]
-            atime: Arrow = proximity_group_times[0]
-            uid: bytes = uids_by_proximity[group_no][0]
-            y_m_d = year_month_day[uid]
+            atime: Arrow = start_by_proximity[group_no]
+            y_m_d = local_dates[group_starts[group_no]]
 
             col2_text, tooltip_col2_text = text_by_proximity.popleft()
-            new_file = any(new_files_by_proximity[group_no])
+            new_file = new_files_by_proximity[group_no]
 
             self.rows.append(
                 self.make_row(
@@ -956,7 +969,7 @@ class TemporalProximityGroups:
             # self.dump_row(group_no)
 
             if span == 1:
-                thumbnail_index += len(proximity_group_times)
+                thumbnail_index += len(uids)
                 continue
 
             thumbnail_index += len(uids_by_day_in_proximity_group[group_no][0])
@@ -1183,6 +1196,135 @@ class TemporalProximityGroups:
         return self.uids[row, 2]
 
 
+class ProximityIndex:
+    """
+    The files displayed in the Timeline, sorted by time.
+
+    Kept by the offload process between generations of the Timeline, so that only
+    the files added, changed or removed since the last generation need be sent to
+    it, and the local date of each file is calculated only once.
+    """
+
+    def __init__(self) -> None:
+        self.rows = SortedKeyList(key=attrgetter("ctime", "uid"))
+        # uid: row
+        self.rows_by_uid: dict[bytes, ThumbnailDataForProximity] = {}
+        # uid: (year, month, day)
+        self.local_dates: dict[bytes, tuple[int, int, int]] = {}
+        # The gap in seconds between each file and the next, sorted by the size of
+        # the gap, and the index of the file that follows each gap
+        self._gaps: list[float] | None = None
+        self._gap_indexes: list[int] | None = None
+        # uid: Timeline cells (col 1, col 2) the file was last assigned to
+        self.cells: dict[bytes, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def update(
+        self,
+        thumbnail_rows: Sequence[ThumbnailDataForProximity],
+        removed_uids: Sequence[bytes] = (),
+    ) -> None:
+        """
+        Add files to the index, replace files whose values have changed, and remove
+        files
+
+        :param thumbnail_rows: files that are new or whose values have changed
+        :param removed_uids: files to remove
+        """
+
+        for uid in removed_uids:
+            self._remove(uid)
+        for row in thumbnail_rows:
+            # Keep the cells of a file whose values have changed, so it is sent to
+            # the main window only if its cells change too
+            previous = self.rows_by_uid.get(row.uid)
+            if previous is not None:
+                self.rows.remove(previous)
+            self.rows.add(row)
+            self.rows_by_uid[row.uid] = row
+            self.local_dates[row.uid] = localtime(row.ctime)[:3]
+        if thumbnail_rows or removed_uids:
+            self._gaps = None
+
+    def _remove(self, uid: bytes) -> None:
+        row = self.rows_by_uid.pop(uid, None)
+        if row is not None:
+            self.rows.remove(row)
+            del self.local_dates[uid]
+            self.cells.pop(uid, None)
+
+    def _sort_gaps(self) -> None:
+        if self._gaps is None:
+            ctimes = [row.ctime for row in self.rows]
+            gaps = sorted(
+                (current - prev, i)
+                for i, (prev, current) in enumerate(zip(ctimes, ctimes[1:]), start=1)
+            )
+            self._gaps = [gap for gap, i in gaps]
+            self._gap_indexes = [i for gap, i in gaps]
+
+    def _first_break(self, temporal_span: int) -> int:
+        """
+        :return: position in the sorted gaps of the smallest gap larger than the
+         temporal span
+        """
+
+        self._sort_gaps()
+        return bisect_right(self._gaps, temporal_span)
+
+    def group_count(self, temporal_span: int) -> int:
+        """
+        :return: how many proximity groups there are for the temporal span
+        """
+
+        if not self.rows:
+            return 0
+        first_break = self._first_break(temporal_span)
+        return 1 + len(self._gaps) - first_break
+
+    def group_starts(self, temporal_span: int) -> list[int]:
+        """
+        :return: the index of the first file in each proximity group for the
+         temporal span
+        """
+
+        first_break = self._first_break(temporal_span)
+        return [0] + sorted(self._gap_indexes[first_break:])
+
+    def groups(self, temporal_span: int) -> TemporalProximityGroups:
+        """
+        Generate the Timeline.
+
+        The generated groups' col1_col2_uid contains only the files whose Timeline
+        cells have changed since the Timeline was last generated.
+
+        :param temporal_span: the largest gap in seconds between files in the same
+         proximity group
+        """
+
+        thumbnail_rows = list(self.rows)
+        groups = TemporalProximityGroups(
+            thumbnail_rows=thumbnail_rows,
+            temporal_span=temporal_span,
+            local_dates=[self.local_dates[row.uid] for row in thumbnail_rows],
+            group_starts=self.group_starts(temporal_span),
+        )
+        groups.group_counts = {
+            minutes: self.group_count(minutes * 60) for minutes in proximity_time_steps
+        }
+        changed = [
+            (col1, col2, uid)
+            for col1, col2, uid in groups.col1_col2_uid
+            if self.cells.get(uid) != (col1, col2)
+        ]
+        for col1, col2, uid in changed:
+            self.cells[uid] = col1, col2
+        groups.col1_col2_uid = changed
+        return groups
+
+
 class TemporalProximityModel(QAbstractTableModel):
     tooltip_image_size = QSize(90, 90)
 
@@ -1917,6 +2059,10 @@ class TemporalValuePicker(QWidget):
 
     def __init__(self, minutes: int, parent=None) -> None:
         super().__init__(parent)
+        # How many groups the Timeline would have at each slider value
+        # minutes: number of groups
+        self.group_counts: dict[int, int] = {}
+
         self.slider = QSlider(Qt.Horizontal)
         self.slider.setTickPosition(QSlider.TicksBelow)
         self.slider.setToolTip(
@@ -1962,6 +2108,7 @@ class TemporalValuePicker(QWidget):
 
     @pyqtSlot()
     def sliderReleased(self):
+        QToolTip.hideText()
         if self.pressed_value != self.slider.value():
             self.valueChanged.emit(proximity_time_steps[self.slider.value()])
 
@@ -1970,6 +2117,22 @@ class TemporalValuePicker(QWidget):
         self.display.setText(self.displayString(value))
         if not self.slider.isSliderDown():
             self.valueChanged.emit(proximity_time_steps[value])
+        else:
+            self.previewGroupCount(value)
+
+    def previewGroupCount(self, index: int) -> None:
+        """
+        While the slider is being dragged, show how many groups the Timeline would
+        have if the slider were released
+        """
+
+        groups = self.group_counts.get(proximity_time_steps[index])
+        if groups is not None:
+            # Translators: %(variable)s represents Python code, not a plural of the term
+            # variable. You must keep the %(variable)s untranslated, or the program will
+            # crash.
+            text = _("Groups in Timeline: %(number)s") % dict(number=groups)
+            QToolTip.showText(QCursor.pos(), text, self.slider)
 
     def displayString(self, index: int) -> str:
         minutes = proximity_time_steps[index]
@@ -2369,6 +2532,9 @@ class TemporalProximity(QWidget):
             return False
 
         self.temporalProximityModel.groups = proximity_groups
+        self.rapidApp.temporalProximityControls.temporalValuePicker.group_counts = (
+            proximity_groups.group_counts
+        )
 
         depth = proximity_groups.depth()
         self.temporalProximityDelegate.depth = depth
@@ -266,6 +266,7 @@ from raphodo.ui.splashscreen import SplashScreen
 from raphodo.ui.toggleview import QToggleView
 from raphodo.ui.viewutils import (
     MainWindowSplitter,
+    ThumbnailDataForProximity,
     any_screen_scaled,
     qt5_screen_scale_environment_variable,
     scaledIcon,
@@ -885,6 +886,15 @@ class RapidWindow(QMainWindow):
         # cause this process and thus the GUI to become unresponsive
         logging.debug("Starting offload manager...")
 
+        # The files most recently sent to the offload process to generate the
+        # Timeline, which keeps them between generations of the Timeline
+        # uid: ThumbnailDataForProximity
+        self.proximity_rows_sent: dict[bytes, ThumbnailDataForProximity] = {}
+        # Timeline cells assigned to files, received from the offload process but
+        # not yet applied because the Timeline was not updated
+        # uid: (col 1, col 2)
+        self.proximity_cells_pending: dict[bytes, tuple[int, int]] = {}
+
         self.offloadThread = QThread()
         self.offloadmq = OffloadManager(logging_port=self.logging_port)
         self.offloadThread.started.connect(self.offloadmq.run_sink)
@@ -967,7 +977,11 @@ class RapidWindow(QMainWindow):
         self.copyfilesThread.started.connect(self.copyfilesmq.run_sink)
         self.copyfilesmq.sinkStarted.connect(self.initStage8)
         self.copyfilesmq.message.connect(self.copyfilesDownloaded)
+        self.copyfilesmq.messages.connect(self.copyfilesDownloadedBatch)
         self.copyfilesmq.bytesDownloaded.connect(self.copyfilesBytesDownloaded)
+        self.copyfilesmq.bytesDownloadedBatch.connect(
+            self.copyfilesBytesDownloadedBatch
+        )
         self.copyfilesmq.tempDirs.connect(self.tempDirsReceivedFromCopyFiles)
         self.copyfilesmq.copyProblems.connect(self.copyfilesProblems)
         self.copyfilesmq.workerFinished.connect(self.copyfilesFinished)
@@ -990,7 +1004,9 @@ class RapidWindow(QMainWindow):
         self.backupThread.started.connect(self.backupmq.run_sink)
         self.backupmq.sinkStarted.connect(self.initStage9)
         self.backupmq.message.connect(self.fileBackedUp)
+        self.backupmq.messages.connect(self.filesBackedUp)
         self.backupmq.bytesBackedUp.connect(self.backupFileBytesBackedUp)
+        self.backupmq.bytesBackedUpBatch.connect(self.backupFileBytesBackedUpBatch)
         self.backupmq.backupProblems.connect(self.backupFileProblems)
 
         self.backupmq.moveToThread(self.backupThread)
@@ -3565,6 +3581,24 @@ Do you want to proceed with the download?"""
             ),
         )
 
+    @pyqtSlot("PyQt_PyObject")
+    def copyfilesDownloadedBatch(
+        self, files: list[tuple[bool, RPDFile, int, tuple[Exception] | None]]
+    ) -> None:
+        """
+        Several files have been copied by a copy files process.
+
+        :param files: the arguments of copyfilesDownloaded for each file
+        """
+
+        for download_succeeded, rpd_file, download_count, mdata_exceptions in files:
+            self.copyfilesDownloaded(
+                download_succeeded=download_succeeded,
+                rpd_file=rpd_file,
+                download_count=download_count,
+                mdata_exceptions=mdata_exceptions,
+            )
+
     @pyqtSlot(int, "PyQt_PyObject", "PyQt_PyObject")
     def copyfilesBytesDownloaded(
         self, scan_id: int, total_downloaded: int, chunk_downloaded: int
@@ -3574,8 +3608,37 @@ Do you want to proceed with the download?"""
         downloaded / copied.
         """
 
-        if scan_id not in self.devices:
-            return
+        self.copyfilesBytesDownloadedBatch(
+            [(scan_id, total_downloaded, chunk_downloaded)]
+        )
+
+    @pyqtSlot("PyQt_PyObject")
+    def copyfilesBytesDownloadedBatch(
+        self, progress: list[tuple[int, int, int]]
+    ) -> None:
+        """
+        Update the tracking of how many bytes have been downloaded / copied for
+        several progress reports, then update the display once.
+
+        :param progress: scan id, total downloaded and chunk downloaded for each
+         report
+        """
+
+        updated = False
+        for scan_id, total_downloaded, chunk_downloaded in progress:
+            if scan_id in self.devices:
+                self.trackBytesDownloaded(scan_id, total_downloaded, chunk_downloaded)
+                updated = True
+        if updated:
+            self.updateFileDownloadDeviceProgress()
+
+    def trackBytesDownloaded(
+        self, scan_id: int, total_downloaded: int, chunk_downloaded: int
+    ) -> None:
+        """
+        Update the tracking of how many bytes have been downloaded / copied from
+        a device, without updating the display.
+        """
 
         try:
             assert total_downloaded >= 0
@@ -3595,7 +3658,6 @@ Do you want to proceed with the download?"""
             )
         self.time_check.increment(bytes_downloaded=chunk_downloaded)
         self.time_remaining.update(scan_id, bytes_downloaded=chunk_downloaded)
-        self.updateFileDownloadDeviceProgress()
 
     @pyqtSlot(int, "PyQt_PyObject")
     def copyfilesProblems(self, scan_id: int, problems: CopyingProblems) -> None:
@@ -3888,11 +3950,37 @@ Do you want to proceed with the download?"""
                 )
                 self.fileDownloadFinished(backup_succeeded, rpd_file)
 
+    @pyqtSlot("PyQt_PyObject")
+    def filesBackedUp(
+        self,
+        files: list[tuple[int, bool, bool, RPDFile, str, tuple[Exception] | None]],
+    ) -> None:
+        """
+        Several files have been backed up by a backup process.
+
+        :param files: the arguments of fileBackedUp for each file
+        """
+
+        for args in files:
+            self.fileBackedUp(*args)
+
     @pyqtSlot("PyQt_PyObject", "PyQt_PyObject")
     def backupFileBytesBackedUp(self, scan_id: int, chunk_downloaded: int) -> None:
-        self.download_tracker.increment_bytes_backed_up(scan_id, chunk_downloaded)
-        self.time_check.increment(bytes_downloaded=chunk_downloaded)
-        self.time_remaining.update(scan_id, bytes_downloaded=chunk_downloaded)
+        self.backupFileBytesBackedUpBatch([(scan_id, chunk_downloaded)])
+
+    @pyqtSlot("PyQt_PyObject")
+    def backupFileBytesBackedUpBatch(self, progress: list[tuple[int, int]]) -> None:
+        """
+        Update the tracking of how many bytes have been backed up for several
+        progress reports, then update the display once.
+
+        :param progress: scan id and chunk backed up for each report
+        """
+
+        for scan_id, chunk_downloaded in progress:
+            self.download_tracker.increment_bytes_backed_up(scan_id, chunk_downloaded)
+            self.time_check.increment(bytes_downloaded=chunk_downloaded)
+            self.time_remaining.update(scan_id, bytes_downloaded=chunk_downloaded)
         self.updateFileDownloadDeviceProgress()
 
     def initializeBackupThumbCache(self) -> None:
@@ -4978,8 +5066,19 @@ Do you want to proceed with the download?"""
             logging.info("Generating Timeline because %s", reason)
 
             self.temporalProximity.setState(TemporalProximityState.generating)
+
+            # Send only the files that have been added, changed or removed since the
+            # Timeline was last generated
+            current = {row.uid: row for row in rows}
+            changed = [
+                row for row in rows if self.proximity_rows_sent.get(row.uid) != row
+            ]
+            removed = [uid for uid in self.proximity_rows_sent if uid not in current]
+            self.proximity_rows_sent = current
             data = OffloadData(
-                thumbnail_rows=rows, proximity_seconds=self.prefs.proximity_seconds
+                thumbnail_rows=changed,
+                removed_uids=removed,
+                proximity_seconds=self.prefs.proximity_seconds,
             )
             self.sendToOffload(data=data)
         else:
@@ -4993,8 +5092,17 @@ Do you want to proceed with the download?"""
     def proximityGroupsGenerated(
         self, proximity_groups: TemporalProximityGroups
     ) -> None:
+        # Only files whose Timeline cells have changed are included
+        for col1, col2, uid in proximity_groups.col1_col2_uid:
+            self.proximity_cells_pending[uid] = col1, col2
         if self.temporalProximity.setGroups(proximity_groups=proximity_groups):
-            self.thumbnailModel.assignProximityGroups(proximity_groups.col1_col2_uid)
+            self.thumbnailModel.assignProximityGroups(
+                [
+                    (col1, col2, uid)
+                    for uid, (col1, col2) in self.proximity_cells_pending.items()
+                ]
+            )
+            self.proximity_cells_pending = {}
         self.temporalProximity.setProximityHeight()
         self.sourcePanel.setSplitterSize()
 
@@ -5484,6 +5592,7 @@ Do you want to proceed with the download?"""
             device=device,
             ignore_other_types=self.ignore_other_photo_types,
             log_gphoto2=self.log_gphoto2,
+            scan_processes=self.prefs.scan_processes_per_device,
         )
         self.sendStartWorkerToThread(
             self.scan_controller, worker_id=scan_id, data=scan_arguments
@@ -6209,7 +6318,11 @@ Do you want to proceed with the download?"""
             create_inproc_msg(
                 b"START_WORKER",
                 worker_id=device_id,
-                data=BackupArguments(path, self.backup_devices.name(path)),
+                data=BackupArguments(
+                    path,
+                    self.backup_devices.name(path),
+                    fan_out=self.prefs.backup_fan_out,
+                ),
             )
         )
 
@@ -15,16 +15,19 @@ import os
 import pickle
 import sqlite3
 import sys
-from collections import namedtuple
+from collections import deque, namedtuple
 from datetime import datetime
 from enum import Enum
 
+import zmq
+
 with contextlib.suppress(locale.Error):
     # Use the default locale as defined by the LANG variable
     locale.setlocale(locale.LC_ALL, "")
 
 import raphodo.generatename as gn
 import raphodo.metadata.exiftool as exiftool
+import raphodo.metadata.fileformats as fileformats
 from raphodo.constants import (
     ConflictResolution,
     DownloadStatus,
@@ -37,6 +40,7 @@ from raphodo.interprocess import (
     RenameAndMoveFileData,
     RenameAndMoveFileResults,
 )
+from raphodo.metadata.metadataexiftool import MetadataExiftool, prefetch_metadata
 from raphodo.prefs.preferences import DownloadsTodayTracker, Preferences
 from raphodo.problemnotification import (
     DuplicateFileWhenSyncingProblem,
@@ -62,6 +66,9 @@ from raphodo.tools.utilities import (
 
 install_gettext()
 
+# The most files waiting to be renamed whose metadata is read at once
+metadata_prefetch_batch_size = 50
+
 
 class SyncRawJpegStatus(Enum):
     matching_pair = 1
@@ -316,6 +323,12 @@ class RenameMoveFileWorker(DaemonProcess):
         # clarifies any problems with type checking in an IDE
         self.problems = RenamingProblems()
 
+        # Messages received from the main process but not yet worked on:
+        # directive, content, and unpickled content if it is data
+        self.messages: deque[tuple[bytes, bytes, RenameAndMoveFileData | None]] = (
+            deque()
+        )
+
     def notify_file_already_exists(
         self, rpd_file: Photo | Video, identifier: str | None = None
     ) -> None:
@@ -977,6 +990,68 @@ class RenameMoveFileWorker(DaemonProcess):
         self.uses_sequence_letter = self.prefs.any_pref_uses_sequence_letter_value()
         self.uses_stored_sequence_no = self.prefs.any_pref_uses_stored_sequence_no()
 
+    def receive_messages(self) -> None:
+        """
+        Wait for the next message from the main process, and take any others that
+        are already waiting, so the metadata of all their files can be read at once
+        """
+
+        messages = [self.receiver.recv_multipart()]
+        while len(messages) < metadata_prefetch_batch_size:
+            try:
+                messages.append(self.receiver.recv_multipart(zmq.NOBLOCK))
+            except zmq.Again:
+                break
+
+        rpd_files = []
+        for directive, content in messages:
+            if directive == b"cmd":
+                data = None
+            else:
+                data: RenameAndMoveFileData = pickle.loads(content)
+                if data.rpd_file is not None and data.download_succeeded:
+                    rpd_files.append(data.rpd_file)
+            self.messages.append((directive, content, data))
+
+        if rpd_files:
+            self.prefetch_metadata(rpd_files)
+
+    def prefetch_metadata(self, rpd_files: list[Photo | Video]) -> None:
+        """
+        For files whose metadata is read using ExifTool, read in one go only those
+        tags needed to generate their subfolder and file names
+        """
+
+        force_exiftool = self.prefs.force_exiftool
+        photos = []
+        videos = []
+        for rpd_file in rpd_files:
+            if rpd_file.file_type == FileType.video:
+                videos.append(rpd_file)
+            elif force_exiftool or fileformats.use_exiftool_on_photo(
+                rpd_file.extension, preview_extraction_irrelevant=True
+            ):
+                photos.append(rpd_file)
+
+        prefs = self.prefs
+        photo_tags = gn.exiftool_tags(prefs.photo_subfolder, prefs.photo_rename)
+        video_tags = gn.exiftool_tags(prefs.video_subfolder, prefs.video_rename)
+
+        for files, tags in ((photos, photo_tags), (videos, video_tags)):
+            metadata = []
+            for rpd_file in files:
+                if load_metadata(
+                    rpd_file=rpd_file,
+                    et_process=self.exiftool_process,
+                    problems=self.problems,
+                    force_exiftool=force_exiftool,
+                ) and isinstance(rpd_file.metadata, MetadataExiftool):
+                    metadata.append(rpd_file.metadata)
+            if metadata:
+                prefetch_metadata(
+                    et_process=self.exiftool_process, files=metadata, tags=tags
+                )
+
     def run(self) -> None:
         """
         Generate subfolder and filename, and attempt to move the file
@@ -1002,18 +1077,21 @@ class RenameMoveFileWorker(DaemonProcess):
 
         with (
             stdchannel_redirected(sys.stderr, os.devnull),
-            exiftool.ExifTool() as self.exiftool_process,
+            exiftool.ExifToolPool(
+                processes=self.prefs.rename_exiftool_processes
+            ) as self.exiftool_process,
         ):
             while True:
                 if i:
                     logging.debug("Finished %s. Getting next task.", i)
 
                 # rename file and move to generated subfolder
-                directive, content = self.receiver.recv_multipart()
+                if not self.messages:
+                    self.receive_messages()
+                directive, content, data = self.messages.popleft()
 
                 self.check_for_command(directive, content)
 
-                data: RenameAndMoveFileData = pickle.loads(content)
                 if data.message == RenameAndMoveStatus.download_started:
                     # reinitialize downloads today and stored sequence number
                     # in case the user has updated them via the user interface
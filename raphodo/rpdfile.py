@@ -3,9 +3,11 @@
 
 # ruff: noqa: E402
 
+import functools
 import logging
 import mimetypes
 import os
+import sys
 import time
 import uuid
 from collections import Counter, UserDict
@@ -168,6 +170,121 @@ def make_key(file_t: FileType, path: str) -> str:
     return f"{path}:{file_t.value}"
 
 
+# Version of the compact state with which RPDFile instances are pickled. Increment
+# it whenever _state_fields changes.
+RPDFILE_STATE_VERSION = 1
+
+_no_default = object()
+
+# Every attribute RPDFile.__init__ assigns, with the value it is usually assigned.
+# Attributes with that value are omitted when pickling. Only None, False and "" are
+# used, because they are compared by identity.
+_state_fields: tuple[tuple[str, Any], ...] = (
+    ("from_camera", False),
+    ("camera_details", None),
+    ("device_display_name", _no_default),
+    ("device_uri", _no_default),
+    ("camera_model", None),
+    ("camera_port", None),
+    ("camera_display_name", None),
+    ("is_mtp_device", False),
+    ("camera_storage_descriptions", None),
+    ("path", _no_default),
+    ("name", _no_default),
+    ("prev_full_name", None),
+    ("prev_datetime", None),
+    ("previously_downloaded", False),
+    ("full_file_name", _no_default),
+    ("raw_exif_bytes", None),
+    ("exif_source", None),
+    ("file_type", _no_default),
+    ("extension", _no_default),
+    ("extension_type", _no_default),
+    ("mime_type", None),
+    ("size", _no_default),
+    ("_datetime", None),
+    ("_no_datetime_metadata", None),
+    ("never_read_mdatatime", False),
+    ("device_timestamp_type", _no_default),
+    ("mdatatime_caused_ctime_change", False),
+    ("_mtime", _no_default),
+    ("_raw_mtime", _no_default),
+    ("ctime", _no_default),
+    ("_mdatatime", _no_default),
+    ("camera_memory_card_identifiers", None),
+    ("thm_full_name", None),
+    ("audio_file_full_name", None),
+    ("xmp_file_full_name", None),
+    ("log_file_full_name", None),
+    ("status", _no_default),
+    ("problem", None),
+    ("scan_id", _no_default),
+    ("uid", _no_default),
+    ("job_code", None),
+    ("thumbnail_status", _no_default),
+    ("fdo_thumbnail_128_name", ""),
+    ("fdo_thumbnail_256_name", ""),
+    ("fdo_thumbnail_256", None),
+    ("thumbnail_cache_status", _no_default),
+    ("cache_full_file_name", ""),
+    ("temp_sample_full_file_name", None),
+    ("temp_sample_is_complete_file", False),
+    ("temp_full_file_name", ""),
+    ("temp_thm_full_name", ""),
+    ("temp_audio_full_name", ""),
+    ("temp_xmp_full_name", ""),
+    ("temp_log_full_name", ""),
+    ("temp_cache_full_file_chunk", ""),
+    ("download_start_time", None),
+    ("download_folder", ""),
+    ("download_subfolder", ""),
+    ("download_path", ""),
+    ("download_name", ""),
+    ("download_full_file_name", ""),
+    ("download_full_base_name", ""),
+    ("download_thm_full_name", ""),
+    ("download_xmp_full_name", ""),
+    ("download_log_full_name", ""),
+    ("download_audio_full_name", ""),
+    ("thm_extension", ""),
+    ("audio_extension", ""),
+    ("xmp_extension", ""),
+    ("log_extension", ""),
+    ("metadata", None),
+    ("metadata_failure", False),
+    ("subfolder_pref_list", _no_default),
+    ("name_pref_list", _no_default),
+    ("generate_extension_case", ""),
+    ("modified_via_daemon_process", False),
+    ("name_generation_problem", False),
+)
+_state_field_names = frozenset(name for name, default in _state_fields)
+_state_defaults = {
+    name: default for name, default in _state_fields if default is not _no_default
+}
+# Strings shared by many files, interned when unpickled to reduce memory use
+_interned_state_fields = (
+    "path",
+    "device_display_name",
+    "device_uri",
+    "download_folder",
+    "download_subfolder",
+    "download_path",
+)
+
+
+@functools.cache
+def _state_names(mask: int) -> tuple[str, ...]:
+    """
+    :param mask: bit mask indicating which of _state_fields are pickled
+    :return: names of the pickled attributes, in order
+    """
+
+    return tuple(
+        name for bit, (name, default) in enumerate(_state_fields) if mask >> bit & 1
+    )
+
+
 class FileSizeSum(UserDict):
     """Sum size in bytes of photos and videos"""
 
@@ -575,6 +692,58 @@ class RPDFile:
         # If true, there was a name generation problem
         self.name_generation_problem = False
 
+    def __getstate__(self) -> tuple[int, int, tuple, dict[str, Any] | None]:
+        """
+        Pickle a compact version of the file's attributes, because RPDFile instances
+        are sent between processes in large numbers.
+
+        Attributes are stored by their position in _state_fields rather than by
+        name, and attributes that have their usual value are omitted.
+
+        :return: state version, bit mask of the attributes stored, their values,
+         and any attributes not in _state_fields
+        """
+
+        state = self.__dict__
+        mask = 0
+        values = []
+        for bit, (name, default) in enumerate(_state_fields):
+            value = state.get(name, default)
+            if value is not default:
+                mask |= 1 << bit
+                values.append(value)
+        extra = state.keys() - _state_field_names
+        return (
+            RPDFILE_STATE_VERSION,
+            mask,
+            tuple(values),
+            {name: state[name] for name in extra} if extra else None,
+        )
+
+    def __setstate__(
+        self, state: tuple[int, int, tuple, dict[str, Any] | None] | dict[str, Any]
+    ) -> None:
+        if isinstance(state, dict):
+            # Pickled before the compact state was introduced
+            self.__dict__.update(state)
+            return
+
+        version, mask, values, extra = state
+        if version != RPDFILE_STATE_VERSION:
+            raise ValueError(
+                f"Cannot unpickle RPDFile state version {version}: expected version "
+                f"{RPDFILE_STATE_VERSION}"
+            )
+        attributes = self.__dict__
+        attributes.update(_state_defaults)
+        attributes.update(zip(_state_names(mask), values))
+        if extra:
+            attributes.update(extra)
+        for name in _interned_state_fields:
+            value = attributes.get(name)
+            if type(value) is str:
+                attributes[name] = sys.intern(value)
+
     def should_write_fdo(self) -> bool:
         """
         :return: True if a FDO thumbnail should be written for this file
@@ -6,7 +6,7 @@ import datetime
 import logging
 import os
 import sqlite3
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 from collections.abc import Sequence
 from typing import Any, NamedTuple
 
@@ -29,6 +29,10 @@ class FileDownloaded(NamedTuple):
 
 InCache = namedtuple("InCache", "md5_name, mdatatime, orientation_unknown, failure")
 
+CameraFolderSummary = namedtuple(
+    "CameraFolderSummary", "file_count, last_name, last_mtime, last_size"
+)
+
 ThumbnailRow = namedtuple(
     "ThumbnailRow",
     "uid, scan_id, mtime, marked, file_name, extension, file_type, downloaded, "
@@ -140,6 +144,10 @@ class ThumbnailRowsSQL:
         rows = self.conn.execute(query).fetchall()
         return [row[0] for row in rows]
 
+    def get_device_names(self) -> dict[int, str]:
+        query = "SELECT scan_id, device_name FROM devices"
+        return dict(self.conn.execute(query).fetchall())
+
     def add_thumbnail_rows(self, thumbnail_rows: Sequence[ThumbnailRow]) -> None:
         """
         Add a list of rows to the database of thumbnail rows
@@ -737,6 +745,49 @@ class DownloadedSQL:
         # h:mm. Set to actual offset when one is found. Can be negative.
         self.found_offset_hr = ""
 
+        # Long-lived connection used while a device is being scanned
+        self._session_conn: sqlite3.Connection | None = None
+
+    def start_scan_session(self) -> None:
+        """
+        Open a connection to the database that is kept open until
+        end_scan_session() is called.
+
+        Scanning a device can involve tens of thousands of lookups. Opening a
+        new connection for each one is expensive. The database is switched to
+        WAL mode so that the renaming process can continue to record downloaded
+        files while a scan is in progress.
+        """
+
+        if self._session_conn is not None:
+            return
+
+        conn = sqlite3.connect(
+            self.db, detect_types=sqlite3.PARSE_DECLTYPES, timeout=sqlite3_timeout
+        )
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError as e:
+            logging.warning("Could not set downloaded files database to WAL: %s", e)
+        conn.execute(
+            """CREATE TEMP TABLE IF NOT EXISTS scan_batch (
+            idx INTEGER PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL
+            )"""
+        )
+        self._session_conn = conn
+
+    def end_scan_session(self) -> None:
+        """
+        Close the connection opened by start_scan_session()
+        """
+
+        if self._session_conn is not None:
+            self._session_conn.close()
+            self._session_conn = None
+
     def no_downloaded(self) -> None:
         """
         :return: how many downloaded files are in the db
@@ -844,7 +895,10 @@ class DownloadedSQL:
         :return: download name (including path) and when it was
          downloaded, else None if never downloaded
         """
-        conn = sqlite3.connect(self.db, detect_types=sqlite3.PARSE_DECLTYPES)
+        if self._session_conn is not None:
+            conn = self._session_conn
+        else:
+            conn = sqlite3.connect(self.db, detect_types=sqlite3.PARSE_DECLTYPES)
         c = conn.cursor()
         c.execute(
             "SELECT download_name, download_datetime as [timestamp] FROM "
@@ -859,44 +913,131 @@ class DownloadedSQL:
         if time_zone_offset_resolution is None:
             return None
 
-        if self.found_offset:
-            c.execute(
-                "SELECT download_name, download_datetime as [timestamp] "
-                f"FROM {self.table_name} "
-                "WHERE file_name=? AND size=? AND mtime=?",
-                (name, size, modification_time - self.found_offset),
-            )
-            row = c.fetchone()
-            if row is not None:
-                logging.debug("Reused time zone offset %s", self.found_offset_hr)
-                return FileDownloaded._make(row)
-            else:
-                logging.info(
-                    "Using time zone offset unsuccessful %s", self.found_offset_hr
-                )
-
-        # Determine if there is a file with the same time and date within +- 24 hours
-        # i.e. 3600 seconds * 24 = 86400
-        # For why 24 hours, see this map:
-        # https://en.wikipedia.org/wiki/Time_zone#/media/File:World_Time_Zones_Map.png
         c.execute(
             f"""SELECT download_name, download_datetime as [timestamp], mtime 
             FROM {self.table_name} 
             WHERE file_name=? AND size=? AND mtime<=? AND mtime >=?""",
             (name, size, modification_time + 86400, modification_time - 86400),
         )
-        row = c.fetchone()
-        if row is not None:
-            # we now have a time within 24 hours in either direction of the mtime
-            mtime: float = row[2]
-            for offset in self.time_zone_offsets[time_zone_offset_resolution]:
-                if mtime + offset == modification_time:
-                    self.found_offset = offset
-                    m, s = divmod(offset, 60)
-                    h, m = divmod(m, 60)
-                    self.found_offset_hr = f"{h:d}:{m:02d}"
-                    logging.info("Time zone offset is %s", self.found_offset_hr)
-                    return FileDownloaded(download_name=name, download_datetime=row[1])
+        return self._match_time_zone_offset(
+            name=name,
+            modification_time=modification_time,
+            candidates=c.fetchall(),
+            time_zone_offset_resolution=time_zone_offset_resolution,
+        )
+
+    def files_downloaded(
+        self,
+        files: Sequence[tuple[str, int, float]],
+        time_zone_offset_resolution: int | None = None,
+    ) -> list[FileDownloaded | None]:
+        """
+        Set-based equivalent of file_downloaded(), for use with a batch of
+        files, e.g. all those in one directory.
+
+        Must be called between start_scan_session() and end_scan_session().
+
+        :param files: sequence of file name (not including path), file size
+         in bytes and file modification time
+        :param time_zone_offset_resolution: if not None, look for files
+         downloaded previously whose modification time differs by a time zone
+         offset
+        :return: for each file, in the same order, the download name
+         (including path) and when it was downloaded, else None if never
+         downloaded
+        """
+
+        assert self._session_conn is not None
+        results: list[FileDownloaded | None] = [None] * len(files)
+        if not files:
+            return results
+
+        conn = self._session_conn
+        conn.execute("DELETE FROM scan_batch")
+        conn.executemany(
+            "INSERT INTO scan_batch (idx, file_name, size, mtime) VALUES (?,?,?,?)",
+            ((idx, *file) for idx, file in enumerate(files)),
+        )
+
+        for idx, download_name, download_datetime in conn.execute(
+            f"""SELECT b.idx, d.download_name, d.download_datetime as [timestamp] 
+            FROM scan_batch b JOIN {self.table_name} d 
+            ON d.file_name=b.file_name AND d.size=b.size AND d.mtime=b.mtime"""
+        ):
+            results[idx] = FileDownloaded(download_name, download_datetime)
+
+        if time_zone_offset_resolution is not None and None in results:
+            candidates: defaultdict[int, list[tuple]] = defaultdict(list)
+            for idx, download_name, download_datetime, mtime in conn.execute(
+                f"""SELECT b.idx, d.download_name, 
+                d.download_datetime as [timestamp], d.mtime 
+                FROM scan_batch b JOIN {self.table_name} d 
+                ON d.file_name=b.file_name AND d.size=b.size 
+                AND d.mtime<=b.mtime + 86400 AND d.mtime>=b.mtime - 86400"""
+            ):
+                if results[idx] is None:
+                    candidates[idx].append((download_name, download_datetime, mtime))
+
+            for idx, rows in candidates.items():
+                name, size, modification_time = files[idx]
+                results[idx] = self._match_time_zone_offset(
+                    name=name,
+                    modification_time=modification_time,
+                    candidates=rows,
+                    time_zone_offset_resolution=time_zone_offset_resolution,
+                )
+
+        conn.execute("DELETE FROM scan_batch")
+        # End the implicit transaction, so the database is not kept locked
+        conn.commit()
+        return results
+
+    def _match_time_zone_offset(
+        self,
+        name: str,
+        modification_time: float,
+        candidates: list[tuple[str, datetime.datetime, float]],
+        time_zone_offset_resolution: int,
+    ) -> FileDownloaded | None:
+        """
+        Determine if a previously downloaded file differs from this file only
+        by a time zone offset.
+
+        :param name: file name, not including path
+        :param modification_time: file modification time
+        :param candidates: download name, download datetime and modification
+         time of downloaded files with the same name and size, and a
+         modification time within 24 hours of this file's
+        :param time_zone_offset_resolution: offset resolution in minutes
+        :return: download name (including path) and when it was
+         downloaded, else None if never downloaded
+        """
+
+        if not candidates:
+            return None
+
+        if self.found_offset:
+            for download_name, download_datetime, mtime in candidates:
+                if mtime == modification_time - self.found_offset:
+                    logging.debug("Reused time zone offset %s", self.found_offset_hr)
+                    return FileDownloaded(download_name, download_datetime)
+            logging.info("Using time zone offset unsuccessful %s", self.found_offset_hr)
+
+        # Determine if there is a file with the same time and date within +- 24 hours
+        # i.e. 3600 seconds * 24 = 86400
+        # For why 24 hours, see this map:
+        # https://en.wikipedia.org/wiki/Time_zone#/media/File:World_Time_Zones_Map.png
+        row = candidates[0]
+        # we now have a time within 24 hours in either direction of the mtime
+        mtime: float = row[2]
+        for offset in self.time_zone_offsets[time_zone_offset_resolution]:
+            if mtime + offset == modification_time:
+                self.found_offset = offset
+                m, s = divmod(offset, 60)
+                h, m = divmod(m, 60)
+                self.found_offset_hr = f"{h:d}:{m:02d}"
+                logging.info("Time zone offset is %s", self.found_offset_hr)
+                return FileDownloaded(download_name=name, download_datetime=row[1])
         return None
 
 
@@ -916,6 +1057,9 @@ class CacheSQL:
         if create_table_if_not_exists:
             self.update_table()
 
+        # Long-lived connection used for bulk lookups
+        self._bulk_conn: sqlite3.Connection | None = None
+
     def db_fs_name(self) -> str:
         return "thumbnail_cache.sqlite"
 
@@ -1038,6 +1182,76 @@ class CacheSQL:
         else:
             return None
 
+    def _bulk_connection(self) -> sqlite3.Connection:
+        """
+        :return: the connection used for bulk lookups, opening it if needed
+        """
+
+        if self._bulk_conn is None:
+            conn = sqlite3.connect(self.db, timeout=sqlite3_timeout)
+            conn.execute(
+                """CREATE TEMP TABLE IF NOT EXISTS probe (
+                idx INTEGER PRIMARY KEY,
+                uri TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+                )"""
+            )
+            self._bulk_conn = conn
+        return self._bulk_conn
+
+    def close(self) -> None:
+        """
+        Close the connection used for bulk lookups, if it is open
+        """
+
+        if self._bulk_conn is not None:
+            self._bulk_conn.close()
+            self._bulk_conn = None
+
+    @retry(stop=stop_after_attempt(sqlite3_retry_attempts))
+    def have_thumbnails(
+        self, keys: Sequence[tuple[str, int, float]]
+    ) -> list[InCache | None]:
+        """
+        Bulk equivalent of have_thumbnail(), using one query on a persistent
+        connection
+
+        :param keys: sequence of uri (file name including path), file size in
+         bytes and file modification time
+        :return: for each key, in the same order, the md5 name (excluding path)
+         and if the value indicates a thumbnail generation failure, else None if
+         thumbnail not present
+        """
+
+        results: list[InCache | None] = [None] * len(keys)
+        if not keys:
+            return results
+
+        conn = self._bulk_connection()
+        try:
+            conn.execute("DELETE FROM probe")
+            conn.executemany(
+                "INSERT INTO probe (idx, uri, size, mtime) VALUES (?,?,?,?)",
+                ((idx, *key) for idx, key in enumerate(keys)),
+            )
+            for idx, *row in conn.execute(
+                f"""SELECT p.idx, c.md5_name, c.mdatatime, c.orientation_unknown, 
+                c.failure FROM probe p JOIN {self.table_name} c 
+                ON c.uri=p.uri AND c.size=p.size AND c.mtime=p.mtime"""
+            ):
+                results[idx] = InCache._make(row)
+            conn.execute("DELETE FROM probe")
+        except sqlite3.OperationalError as e:
+            logging.warning(
+                "Database error reading %s thumbnails: %s. May retry.", len(keys), e
+            )
+            conn.rollback()
+            raise sqlite3.OperationalError from e
+        # End the implicit transaction, so the database is not kept locked
+        conn.commit()
+        return results
+
     @retry(stop=stop_after_attempt(sqlite3_retry_attempts))
     def _delete(self, names: list[str], conn):
         conn.execute(
@@ -1098,6 +1312,267 @@ class CacheSQL:
         conn.close()
 
 
+class CameraListingSQL:
+    """
+    Index of the files listed on cameras during scans, kept between program runs.
+
+    Getting the modification time and size of a file on a camera can require a
+    round trip to the camera for each file, which when there are thousands of files
+    makes scanning slow. Most of the time, few if any files in a folder have changed
+    since the camera was last scanned.
+
+    A folder whose media file count and last listed file are unchanged since the
+    last scan is assumed to be unchanged, and the index used instead of asking the
+    camera about its files. Nothing in the index is trusted for a folder that has
+    changed, because a file name can be reused for a different file.
+
+    Folders no longer on a camera are removed from the index when the camera is
+    scanned, and cameras not scanned for a long time are removed entirely.
+    """
+
+    def __init__(
+        self, data_dir: str | None = None, max_age: float = 90 * 24 * 60 * 60
+    ) -> None:
+        """
+        :param data_dir: where the database is saved. If None, use default
+        :param max_age: seconds after which a camera storage that has not been
+         scanned is removed from the index
+        """
+
+        if data_dir is None:
+            data_dir = get_program_data_directory(create_if_not_exist=True)
+        self.db = os.path.join(data_dir, "camera_scan_index.sqlite")
+        self.table_name = "listing"
+        self.folder_table_name = "folders"
+        self.camera_table_name = "cameras"
+        self.max_age = max_age
+        self.update_table()
+
+    def update_table(self, reset: bool = False) -> None:
+        """
+        Create or update the database tables
+        :param reset: if True, delete the contents of the tables and
+         build them
+        """
+
+        conn = sqlite3.connect(self.db, timeout=sqlite3_timeout)
+
+        if reset:
+            conn.execute(rf"""DROP TABLE IF EXISTS {self.table_name}""")
+            conn.execute(rf"""DROP TABLE IF EXISTS {self.folder_table_name}""")
+            conn.execute(rf"""DROP TABLE IF EXISTS {self.camera_table_name}""")
+            conn.execute("VACUUM")
+
+        conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.table_name} (
+            serial TEXT NOT NULL,
+            storage TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            name TEXT NOT NULL,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            listed REAL NOT NULL,
+            PRIMARY KEY (serial, storage, folder, name)
+            )"""
+        )
+
+        conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.folder_table_name} (
+            serial TEXT NOT NULL,
+            storage TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            file_count INTEGER NOT NULL,
+            last_name TEXT NOT NULL,
+            last_mtime REAL NOT NULL,
+            last_size INTEGER NOT NULL,
+            PRIMARY KEY (serial, storage, folder)
+            )"""
+        )
+
+        conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.camera_table_name} (
+            serial TEXT NOT NULL,
+            storage TEXT NOT NULL,
+            scanned REAL NOT NULL,
+            PRIMARY KEY (serial, storage)
+            )"""
+        )
+
+        conn.commit()
+        conn.close()
+
+    def get_folder_summary(
+        self, serial: str, storage: str, folder: str
+    ) -> CameraFolderSummary | None:
+        """
+        :param serial: the camera's serial number
+        :param storage: the description of the camera's storage
+        :param folder: the folder on the camera
+        :return: the folder's media file count and last listed file when it was
+         last scanned, or None if it is not in the index
+        """
+
+        conn = sqlite3.connect(self.db, timeout=sqlite3_timeout)
+        try:
+            row = conn.execute(
+                f"""SELECT file_count, last_name, last_mtime, last_size
+                FROM {self.folder_table_name}
+                WHERE serial=? AND storage=? AND folder=?""",
+                (serial, storage, folder),
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            logging.warning("Database error reading camera scan index: %s", e)
+            row = None
+        finally:
+            conn.close()
+        return None if row is None else CameraFolderSummary._make(row)
+
+    def get_folder(
+        self, serial: str, storage: str, folder: str
+    ) -> dict[str, tuple[float, int, float]]:
+        """
+        Get the indexed listing of a folder. Call only once the folder is known to be
+        unchanged since it was indexed.
+
+        :param serial: the camera's serial number
+        :param storage: the description of the camera's storage
+        :param folder: the folder on the camera
+        :return: modification time, size and time it was listed of each file in the
+         folder, by name
+        """
+
+        conn = sqlite3.connect(self.db, timeout=sqlite3_timeout)
+        try:
+            rows = conn.execute(
+                f"""SELECT name, mtime, size, listed FROM {self.table_name}
+                WHERE serial=? AND storage=? AND folder=?""",
+                (serial, storage, folder),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            logging.warning("Database error reading camera scan index: %s", e)
+            rows = []
+        finally:
+            conn.close()
+        return {name: (mtime, size, listed) for name, mtime, size, listed in rows}
+
+    def set_folder(
+        self,
+        serial: str,
+        storage: str,
+        folder: str,
+        files: Sequence[tuple[str, float, int, float]],
+        summary: CameraFolderSummary | None,
+    ) -> None:
+        """
+        Replace the indexed listing of the folder
+
+        :param serial: the camera's serial number
+        :param storage: the description of the camera's storage
+        :param folder: the folder on the camera
+        :param files: name, modification time, size and time it was listed of each
+         file in the folder
+        :param summary: the folder's media file count and last listed file, or None
+         if the folder must be treated as changed when next scanned
+        """
+
+        key = (serial, storage, folder)
+        conn = sqlite3.connect(self.db, timeout=sqlite3_timeout)
+        try:
+            with conn:
+                for table_name in (self.table_name, self.folder_table_name):
+                    conn.execute(
+                        f"""DELETE FROM {table_name}
+                        WHERE serial=? AND storage=? AND folder=?""",
+                        key,
+                    )
+                conn.executemany(
+                    f"""INSERT INTO {self.table_name}
+                    (serial, storage, folder, name, mtime, size, listed)
+                    VALUES (?,?,?,?,?,?,?)""",
+                    ((*key, *file) for file in files),
+                )
+                if summary is not None:
+                    conn.execute(
+                        f"""INSERT INTO {self.folder_table_name}
+                        (serial, storage, folder, file_count, last_name, last_mtime,
+                        last_size) VALUES (?,?,?,?,?,?,?)""",
+                        (*key, *summary),
+                    )
+        except sqlite3.OperationalError as e:
+            logging.warning("Database error updating camera scan index: %s", e)
+        finally:
+            conn.close()
+
+    def set_scanned(self, serial: str, storage: str, folders: set[str]) -> None:
+        """
+        Record that the camera storage was scanned, removing from the index the
+        folders on it that were not visited in the scan
+
+        :param serial: the camera's serial number
+        :param storage: the description of the camera's storage
+        :param folders: the folders on the camera visited in the scan
+        """
+
+        conn = sqlite3.connect(self.db, timeout=sqlite3_timeout)
+        try:
+            with conn:
+                indexed = {
+                    folder
+                    for (folder,) in conn.execute(
+                        f"""SELECT folder FROM {self.table_name}
+                        WHERE serial=? AND storage=?
+                        UNION SELECT folder FROM {self.folder_table_name}
+                        WHERE serial=? AND storage=?""",
+                        (serial, storage, serial, storage),
+                    )
+                }
+                for table_name in (self.table_name, self.folder_table_name):
+                    conn.executemany(
+                        f"""DELETE FROM {table_name}
+                        WHERE serial=? AND storage=? AND folder=?""",
+                        ((serial, storage, folder) for folder in indexed - folders),
+                    )
+                conn.execute(
+                    f"""INSERT OR REPLACE INTO {self.camera_table_name}
+                    (serial, storage, scanned) VALUES (?,?,?)""",
+                    (serial, storage, datetime.datetime.now().timestamp()),
+                )
+        except sqlite3.OperationalError as e:
+            logging.warning("Database error updating camera scan index: %s", e)
+        finally:
+            conn.close()
+
+    def expire(self) -> None:
+        """
+        Remove camera storage not scanned for too long
+        """
+
+        oldest = datetime.datetime.now().timestamp() - self.max_age
+        conn = sqlite3.connect(self.db, timeout=sqlite3_timeout)
+        try:
+            with conn:
+                conn.execute(
+                    f"DELETE FROM {self.camera_table_name} WHERE scanned<?", (oldest,)
+                )
+                # A camera storage being scanned for the first time is not yet
+                # recorded as scanned, but its files were listed recently
+                conn.execute(
+                    f"""DELETE FROM {self.table_name} WHERE listed<?
+                    AND (serial, storage) NOT IN
+                    (SELECT serial, storage FROM {self.camera_table_name})""",
+                    (oldest,),
+                )
+                conn.execute(
+                    f"""DELETE FROM {self.folder_table_name}
+                    WHERE (serial, storage, folder) NOT IN
+                    (SELECT serial, storage, folder FROM {self.table_name})"""
+                )
+        except sqlite3.OperationalError as e:
+            logging.warning("Database error expiring camera scan index: %s", e)
+        finally:
+            conn.close()
+
+
 class FileFormatSQL:
     def __init__(self, data_dir: str = None) -> None:
         """
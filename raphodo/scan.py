@@ -27,16 +27,21 @@ A sample photo or video for (1) can be used for (2)
 """
 
 import contextlib
+import itertools
 import locale
 import logging
 import operator
 import os
 import pickle
+import stat
 import sys
 import tempfile
+import time
 from collections import defaultdict, deque, namedtuple
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import NamedTuple
 
 import raphodo.metadata.fileextensions
 
@@ -52,7 +57,7 @@ import raphodo.metadata.metadataexiftool as metadataexiftool
 import raphodo.metadata.metadataphoto as metadataphoto
 import raphodo.metadata.metadatavideo as metadatavideo
 import raphodo.rpdfile as rpdfile
-from raphodo.cache import ThumbnailCacheSql
+from raphodo.cache import GetThumbnailPath, ThumbnailCacheSql
 from raphodo.camera import Camera, gphoto2_named_error, gphoto2_python_logging
 from raphodo.cameraerror import CameraError, CameraProblemEx, iOSDeviceError
 from raphodo.constants import (
@@ -83,7 +88,12 @@ from raphodo.problemnotification import (
     ScanProblems,
     UnhandledFileProblem,
 )
-from raphodo.rpdsql import DownloadedSQL
+from raphodo.rpdsql import (
+    CameraFolderSummary,
+    CameraListingSQL,
+    DownloadedSQL,
+    FileDownloaded,
+)
 from raphodo.storage.storage import (
     CameraDetails,
     StorageSpace,
@@ -114,10 +124,109 @@ CameraMetadataDetails = namedtuple(
 SampleMetadata = namedtuple("SampleMetadata", "datetime determined_by")
 
 
+class DirectoryListing(NamedTuple):
+    path: str
+    files: list[os.DirEntry]
+    subdirectories: list[os.DirEntry]
+
+
+def list_directory(
+    path: str, prefetch_stat: Callable[[str], bool]
+) -> DirectoryListing | None:
+    """
+    List the contents of a directory, distinguishing files from subdirectories.
+
+    Safe to call from a worker thread.
+
+    :param path: the directory to list
+    :param prefetch_stat: called with the name of each file. If it returns True,
+     the file's stat result will be retrieved and cached in its DirEntry.
+    :return: the directory's contents, or None if the directory could not be read
+    """
+
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return None
+
+    files = []
+    subdirectories = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            subdirectories.append(entry)
+        else:
+            files.append(entry)
+            if prefetch_stat(entry.name):
+                with contextlib.suppress(OSError):
+                    entry.stat()
+    return DirectoryListing(path, files, subdirectories)
+
+
+class ProcessIdentity(NamedTuple):
+    """
+    The user and groups this process accesses files as
+    """
+
+    euid: int
+    egid: int
+    groups: frozenset[int]
+
+
+def process_identity() -> ProcessIdentity:
+    return ProcessIdentity(
+        euid=os.geteuid(), egid=os.getegid(), groups=frozenset(os.getgroups())
+    )
+
+
+def readable_from_mode(file_stat: os.stat_result, identity: ProcessIdentity) -> bool:
+    """
+    Determine from its permission bits if this process can read a file, without
+    making a system call.
+
+    A result of False is not definitive, e.g. because the process may be running
+    with elevated privileges. In that case, check using os.access().
+
+    :param file_stat: the file's stat result
+    :param identity: the user and groups of this process, determined once before
+     scanning
+    :return: True if the file is readable
+    """
+
+    if file_stat.st_uid == identity.euid:
+        return bool(file_stat.st_mode & stat.S_IRUSR)
+    if file_stat.st_gid == identity.egid or file_stat.st_gid in identity.groups:
+        return bool(file_stat.st_mode & stat.S_IRGRP)
+    return bool(file_stat.st_mode & stat.S_IROTH)
+
+
 class ScanWorker(WorkerInPublishPullPipeline):
     def __init__(self):
         self.downloaded = DownloadedSQL()
+        # full_file_name (path+name): result of previous download lookup, populated
+        # one directory at a time
+        self.downloaded_lookup: dict[str, FileDownloaded | None] = {}
+        # file name: stat result, for files in the directory currently being scanned
+        self.dir_stats: dict[str, os.stat_result] = {}
+        # base name: {lower case extension: file name}, for files in the directory
+        # currently being scanned that could be associated with a photo or video
+        self.dir_associate_files: defaultdict[str, dict[str, str]] = defaultdict(dict)
+        # Used to determine from their permission bits which files can be read
+        self.process_identity = process_identity()
         self.thumbnail_cache = ThumbnailCacheSql(create_table_if_not_exists=False)
+        # full_file_name (path+name): result of thumbnail cache lookup, populated
+        # one directory at a time
+        self.thumbnail_lookup: dict[str, GetThumbnailPath] = {}
+        # Files listed on the camera in previous scans. None if the camera being
+        # scanned has no serial number to identify it by.
+        self.camera_listings: CameraListingSQL | None = None
+        # Folders visited on each camera storage, by storage description
+        self.camera_folders_visited: defaultdict[str, set[str]] = defaultdict(set)
+        self.camera_serial = ""
         self.no_previously_downloaded = 0
         self.file_batch = []
         self.batch_size = 50
@@ -162,6 +271,12 @@ class ScanWorker(WorkerInPublishPullPipeline):
 
         self._et_process: ExifTool | None = None
 
+        # Scan id of the device, which differs from the worker id when this process
+        # is scanning part of a device
+        self.scan_id: int | None = None
+        # Index of the part of the device being scanned, and the number of parts
+        self.partition: tuple[int, int] | None = None
+
         super().__init__("Scan")
 
     @property
@@ -193,11 +308,15 @@ class ScanWorker(WorkerInPublishPullPipeline):
                 device = ""
             logging.exception("Unexpected exception while scanning %s", device)
 
+            if self.scan_id is None:
+                self.scan_id = int(self.worker_id)
             self.content = pickle.dumps(
-                ScanResults(scan_id=int(self.worker_id), fatal_error=True),
+                ScanResults(scan_id=self.scan_id, fatal_error=True),
                 pickle.HIGHEST_PROTOCOL,
             )
             self.exit_exiftool()
+            self.downloaded.end_scan_session()
+            self.thumbnail_cache.close()
             self.send_message_to_sink()
             self.disconnect_logging()
             self.send_finished_command()
@@ -206,6 +325,11 @@ class ScanWorker(WorkerInPublishPullPipeline):
         logging.debug(f"Scan {self.worker_id.decode()} worker started")
 
         scan_arguments: ScanArguments = pickle.loads(self.content)
+        if scan_arguments.scan_id is None:
+            self.scan_id = int(self.worker_id)
+        else:
+            self.scan_id = scan_arguments.scan_id
+        self.partition = scan_arguments.partition
         if scan_arguments.log_gphoto2:
             self.gphoto2_logging = gphoto2_python_logging()
 
@@ -245,6 +369,8 @@ class ScanWorker(WorkerInPublishPullPipeline):
         self.camera: Camera | None = None
         terminated = False
 
+        self.downloaded.start_scan_session()
+
         if self.download_from_filesystem:
             self.scan_file_system(scan_arguments)
         elif self.download_from_camera_fuse:
@@ -269,7 +395,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
                         ScanResults(
                             error_code=e.code,
                             error_message=str(e),
-                            scan_id=int(self.worker_id),
+                            scan_id=self.scan_id,
                         ),
                         pickle.HIGHEST_PROTOCOL,
                     )
@@ -296,7 +422,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
                     ScanResults(
                         error_code=e.code,
                         error_message=str(e),
-                        scan_id=int(self.worker_id),
+                        scan_id=self.scan_id,
                     ),
                     pickle.HIGHEST_PROTOCOL,
                 )
@@ -315,7 +441,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
                 self.content = pickle.dumps(
                     ScanResults(
                         optimal_display_name=self.camera_display_name,
-                        scan_id=int(self.worker_id),
+                        scan_id=self.scan_id,
                         is_apple_mobile=self.device.is_apple_mobile,
                         mount_point=mount_point,
                         storage_space=[
@@ -375,7 +501,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
                 self.send_message_to_sink()
         elif self.download_from_camera or self.download_from_camera_fuse:
             self.content = pickle.dumps(
-                ScanResults(scan_id=int(self.worker_id), camera_removed=True),
+                ScanResults(scan_id=self.scan_id, camera_removed=True),
                 pickle.HIGHEST_PROTOCOL,
             )
             self.send_message_to_sink()
@@ -390,13 +516,15 @@ class ScanWorker(WorkerInPublishPullPipeline):
             )
 
         self.exit_exiftool()
+        self.downloaded.end_scan_session()
+        self.thumbnail_cache.close()
         self.disconnect_logging()
         self.send_finished_command()
 
     def send_problems(self) -> None:
         if self.problems:
             self.content = pickle.dumps(
-                ScanResults(scan_id=int(self.worker_id), problems=self.problems),
+                ScanResults(scan_id=self.scan_id, problems=self.problems),
                 pickle.HIGHEST_PROTOCOL,
             )
             self.send_message_to_sink()
@@ -408,21 +536,100 @@ class ScanWorker(WorkerInPublishPullPipeline):
         :param path_to_walk: the path to scan
         """
 
-        for dir_name, dir_list, file_list in os.walk(path_to_walk):
-            if len(dir_list) > 0:
-                # Do not scan gvfs gphoto2 mount
-                dir_list[:] = (
-                    d for d in dir_list if not gvfs_gphoto2_path(dir_name + d)
+        for dir_name, entries in self.walk_file_system_directories(
+            path_to_walk, prefetch_stat=False
+        ):
+            for entry in entries:
+                yield dir_name, entry.name
+
+    def walk_file_system_directories(
+        self,
+        path_to_walk: str,
+        prefetch_stat: bool = True,
+        partition: tuple[int, int] | None = None,
+    ) -> Iterator[tuple[str, list[os.DirEntry]]]:
+        """
+        Return directories and the files they contain on local file system, ignoring
+        directories the user doesn't want scanned.
+
+        Directories are returned in the same order as os.walk(). Subdirectories are
+        listed ahead of time using a pool of threads, which helps on high latency
+        file systems like network shares and FUSE mounts.
+
+        :param path_to_walk: the path to scan
+        :param prefetch_stat: if True, cache the stat result of photos and videos in
+         their DirEntry when the directory is listed
+        :param partition: if specified, walk only one part of the path: the index of
+         the part, and the number of parts. The subdirectories of the path are
+         assigned to the parts in turn, in alphabetical order. Files in the path
+         itself belong to the first part.
+        :return: the directory, and DirEntry for each file in the directory
+        """
+
+        if prefetch_stat:
+
+            def stat_wanted(name: str) -> bool:
+                return (
+                    fileformats.file_type(fileformats.extract_extension(name))
+                    is not None
                 )
 
-                if self.scan_preferences.ignored_paths:
-                    # Don't inspect paths the user wants ignored
-                    # Altering subdirs in place controls the looping
-                    # [:] ensures the list is altered in place
-                    # (mutating slice method)
-                    dir_list[:] = filter(self.scan_preferences.scan_this_path, dir_list)
-            for name in file_list:
-                yield dir_name, name
+        else:
+
+            def stat_wanted(name: str) -> bool:
+                return False
+
+        threads = max(1, self.prefs.scan_directory_listing_threads)
+        read_ahead = threads * 4
+        executor = ThreadPoolExecutor(max_workers=threads)
+
+        # Directories yet to be walked, in os.walk() order. Only the directories at
+        # the head of the queue are listed in advance.
+        pending: deque[list] = deque([[path_to_walk, None]])
+
+        try:
+            while pending:
+                for item in itertools.islice(pending, read_ahead):
+                    if item[1] is None:
+                        item[1] = executor.submit(list_directory, item[0], stat_wanted)
+
+                dir_name, future = pending.popleft()
+                listing: DirectoryListing | None = future.result()
+                if listing is None:
+                    continue
+
+                # os.walk() does not follow symbolic links to directories
+                dir_list = [
+                    entry.name
+                    for entry in listing.subdirectories
+                    if not entry.is_symlink()
+                ]
+                if len(dir_list) > 0:
+                    # Do not scan gvfs gphoto2 mount
+                    dir_list = [
+                        d for d in dir_list if not gvfs_gphoto2_path(dir_name + d)
+                    ]
+
+                    if self.scan_preferences.ignored_paths:
+                        # Don't inspect paths the user wants ignored
+                        dir_list = list(
+                            filter(self.scan_preferences.scan_this_path, dir_list)
+                        )
+
+                files = listing.files
+                if partition is not None and dir_name == path_to_walk:
+                    index, parts = partition
+                    assigned = set(sorted(dir_list)[index::parts])
+                    dir_list = [d for d in dir_list if d in assigned]
+                    if index:
+                        files = []
+
+                pending.extendleft(
+                    [os.path.join(dir_name, d), None] for d in reversed(dir_list)
+                )
+                yield dir_name, files
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def scan_file_system(self, scan_arguments: ScanArguments):
         """
@@ -467,21 +674,166 @@ class ScanWorker(WorkerInPublishPullPipeline):
         self.problems.uri = get_uri(path=path)
         self.problems.name = self.display_name
 
-        # Before doing anything else, determine time zone approach
-        # Need two different walks because first folder of files
-        # might be videos, then the 2nd folder photos, etc.
-        for path in paths:
-            self.distinguish_non_camera_device_timestamp(path)
-            if self.device_timestamp_type != DeviceTimestampTZ.undetermined:
-                break
+        if scan_arguments.device_timestamp_type is not None:
+            # This process is scanning part of the device. The process scanning the
+            # first part has already determined the time zone approach, and it alone
+            # provides the sample photo and video.
+            self.device_timestamp_type = scan_arguments.device_timestamp_type
+            self.located_sample_photo = self.located_sample_video = True
+            self.prepared_sample_photo = self.prepared_sample_video = True
+        else:
+            # Before doing anything else, determine time zone approach
+            # Need two different walks because first folder of files
+            # might be videos, then the 2nd folder photos, etc.
+            for path in paths:
+                self.distinguish_non_camera_device_timestamp(path)
+                if self.device_timestamp_type != DeviceTimestampTZ.undetermined:
+                    break
+
+            if self.partition is not None:
+                # Let the scan manager start the processes scanning the other parts
+                self.content = pickle.dumps(
+                    ScanResults(
+                        scan_id=self.scan_id,
+                        device_timestamp_type=self.device_timestamp_type,
+                    ),
+                    pickle.HIGHEST_PROTOCOL,
+                )
+                self.send_message_to_sink()
+                self.prepare_sample_photo()
 
         for path in paths:
             if scanning_specific_path:
                 logging.info(f"Scanning {path} on {self.display_name}")
-            for dir_name, name in self.walk_file_system(path):
+            for dir_name, entries in self.walk_file_system_directories(
+                path, partition=self.partition
+            ):
                 self.dir_name = dir_name
-                self.file_name = name
-                self.process_file()
+                self.prepare_file_system_directory(dir_name, entries)
+                for entry in entries:
+                    self.file_name = entry.name
+                    self.process_file()
+
+    def prepare_sample_photo(self) -> None:
+        """
+        Prepare the sample photo before the file system is walked.
+
+        When the device is scanned by more than one process, the sample photo can
+        be in a part of the device scanned by another process.
+        """
+
+        full_file_name = self.sample_photo_file_full_file_name
+        if not self.located_sample_photo or full_file_name is None:
+            return
+
+        try:
+            file_stat = os.stat(full_file_name)
+        except OSError:
+            logging.warning("Could not stat sample photo %s", full_file_name)
+            return
+
+        path, name = os.path.split(full_file_name)
+        self.sample_photo = self.create_sample_rpdfile(
+            name=name,
+            path=path,
+            size=file_stat.st_size,
+            mdatatime=self.file_mdatatime.get(full_file_name, 0.0),
+            file_type=FileType.photo,
+            mtime=file_stat.st_mtime,
+            ignore_mdatatime=False,
+        )
+        self.sample_exif_bytes = None
+        self.prepared_sample_photo = True
+
+    def prepare_file_system_directory(
+        self, dir_name: str, entries: list[os.DirEntry]
+    ) -> None:
+        """
+        Get the size and modification time of the photos and videos in the
+        directory, reusing the stat results cached when the directory was listed,
+        and determine in one database query which of them have been downloaded
+        previously.
+
+        Index the files in the directory that could be associated with a photo or
+        video, e.g. XMP and THM files, so they can be located without any further
+        file system access.
+
+        :param dir_name: the directory being scanned
+        :param entries: the files in the directory
+        """
+
+        self.dir_stats = {}
+        self.dir_associate_files = defaultdict(dict)
+        associate_extensions = self.associate_extensions()
+        files = []
+        for entry in entries:
+            name = entry.name
+            base_name, ext = os.path.splitext(name)
+            ext = ext[1:]
+            ext_lower = ext.lower()
+            if ext_lower in associate_extensions:
+                # Prefer the lower case extension, should both cases be present
+                associate_files = self.dir_associate_files[base_name]
+                if ext == ext_lower or ext_lower not in associate_files:
+                    associate_files[ext_lower] = name
+                continue
+            if fileformats.file_type(ext_lower) is None:
+                continue
+            try:
+                file_stat = entry.stat()
+            except OSError:
+                # Will be handled when the file itself is processed
+                continue
+            self.dir_stats[name] = file_stat
+            if file_stat.st_size > 0:
+                files.append((dir_name, name, file_stat.st_size, file_stat.st_mtime))
+        self.lookup_downloaded(files)
+        self.lookup_thumbnail_cache(files)
+
+    def lookup_downloaded(self, files: list[tuple[str, str, int, float]]) -> None:
+        """
+        Determine in one database query which files have been downloaded
+        previously, caching the results for use when each file is processed.
+
+        :param files: path, name, size and raw modification time of each file
+        """
+
+        results = self.downloaded.files_downloaded(
+            [
+                (name, size, self.adjusted_mtime(mtime))
+                for path, name, size, mtime in files
+            ],
+            time_zone_offset_resolution=self.time_zone_offset_resolution,
+        )
+        self.downloaded_lookup = {
+            os.path.join(path, name): result
+            for (path, name, size, mtime), result in zip(files, results)
+        }
+
+    def lookup_thumbnail_cache(self, files: list[tuple[str, str, int, float]]) -> None:
+        """
+        Look up in bulk the thumbnail cache entries for the files, caching the
+        results for use when each file is processed.
+
+        :param files: path, name, size and raw modification time of each file
+        """
+
+        if not self.prefs.use_thumbnail_cache:
+            return
+
+        full_file_names = [
+            os.path.join(path, name) for path, name, size, mtime in files
+        ]
+        results = self.thumbnail_cache.get_thumbnail_paths(
+            [
+                (full_file_name, size, self.adjusted_mtime(mtime))
+                for full_file_name, (path, name, size, mtime) in zip(
+                    full_file_names, files
+                )
+            ],
+            camera_model=self.camera_model,
+        )
+        self.thumbnail_lookup = dict(zip(full_file_names, results))
 
     def scan_camera(self, scan_arguments: ScanArguments) -> None:
         """
@@ -519,7 +871,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
                             optimal_display_name=self.camera_display_name,
                             storage_space=storage_space,
                             storage_descriptions=storage_descriptions,
-                            scan_id=int(self.worker_id),
+                            scan_id=self.scan_id,
                         ),
                         pickle.HIGHEST_PROTOCOL,
                     )
@@ -527,7 +879,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
                 break
             except CameraProblemEx as e:
                 self.content = pickle.dumps(
-                    ScanResults(error_code=e.code, scan_id=int(self.worker_id)),
+                    ScanResults(error_code=e.code, scan_id=self.scan_id),
                     pickle.HIGHEST_PROTOCOL,
                 )
                 self.send_message_to_sink()
@@ -538,6 +890,11 @@ class ScanWorker(WorkerInPublishPullPipeline):
         self.problems.uri = get_uri(camera_details=self.camera_details)
         self.problems.name = self.display_name
 
+        self.camera_serial = self.camera.serial_number()
+        if self.camera_serial:
+            self.camera_listings = CameraListingSQL()
+            self.camera_listings.expire()
+
         if self.ignore_mdatatime_for_mtp_dng:
             logging.info(
                 "For any DNG files on the %s, when determining the creation date/"
@@ -599,10 +956,26 @@ class ScanWorker(WorkerInPublishPullPipeline):
                         specific_folder, folder_identifier, basedir
                     )
 
+            if self.camera_listings is not None:
+                for storage, folders in self.camera_folders_visited.items():
+                    self.camera_listings.set_scanned(
+                        serial=self.camera_serial, storage=storage, folders=folders
+                    )
+
             # extract camera metadata
             if self._camera_photos_videos_by_type:
                 self.identify_camera_tz_and_sample_files()
 
+            # determine which files have been downloaded previously, and which have
+            # thumbnails in the thumbnail cache
+            files = [
+                (file_info.path, name, file_info.size, file_info.modification_time)
+                for name, file_infos in self._camera_file_names.items()
+                for file_info in file_infos
+            ]
+            self.lookup_downloaded(files)
+            self.lookup_thumbnail_cache(files)
+
             # now, process each file
             for self.dir_name, self.file_name in self._camera_folders_and_files:
                 self.process_file()
@@ -661,6 +1034,13 @@ class ScanWorker(WorkerInPublishPullPipeline):
 
         files_in_folder = []
         names = []
+        media_names = []
+        # The modification time and size of files listed in previous scans that can
+        # be trusted, and the files' details to index for the next scan
+        listed: dict[str, tuple[float, int, float]] = {}
+        listing: list[tuple[str, float, int, float]] = []
+        storage = self.camera_details.storage_desc or ""
+        self.camera_folders_visited[storage].add(path)
         try:
             files_in_folder = self.camera.camera.folder_list_files(path)
         except gp.GPhoto2Error as e:
@@ -691,6 +1071,13 @@ class ScanWorker(WorkerInPublishPullPipeline):
             exts = [ext[1:] for name, ext in split_names]
             exts_lower = [ext.lower() for ext in exts]
             ext_types = [fileformats.extension_type(ext) for ext in exts_lower]
+            media_names = [
+                name
+                for name, ext_lower in zip(names, exts_lower)
+                if fileformats.file_type(ext_lower) is not None
+            ]
+            if self.camera_listings is not None and media_names:
+                listed = self.indexed_camera_files(path, storage, media_names)
 
         for idx, name in enumerate(names):
             # Check to see if the process has received a command to terminate
@@ -708,7 +1095,11 @@ class ScanWorker(WorkerInPublishPullPipeline):
                 # file is a photo or video
                 file_is_unique = True
                 try:
-                    modification_time, size = self.camera.get_file_info(path, name)
+                    if name in listed:
+                        modification_time, size, listed_time = listed[name]
+                    else:
+                        modification_time, size = self.camera.get_file_info(path, name)
+                        listed_time = time.time()
                 except gp.GPhoto2Error as e:
                     logging.error(
                         "Unable to access modification_time or size from %s on %s. "
@@ -736,6 +1127,8 @@ class ScanWorker(WorkerInPublishPullPipeline):
                             camera_details=self.camera_details,
                         )
                         self.problems.append(FileZeroLengthProblem(name=name, uri=uri))
+                    else:
+                        listing.append((name, modification_time, size, listed_time))
 
                 if size > 0:
                     key = rpdfile.make_key(file_type, basedir)
@@ -808,6 +1201,25 @@ class ScanWorker(WorkerInPublishPullPipeline):
                             camera_details=self.camera_details,
                         )
                         self.problems.append(UnhandledFileProblem(name=name, uri=uri))
+
+        if self.camera_listings is not None and files_in_folder:
+            summary = None
+            if listing and listing[-1][0] == media_names[-1]:
+                name, modification_time, size, listed_time = listing[-1]
+                summary = CameraFolderSummary(
+                    file_count=len(media_names),
+                    last_name=name,
+                    last_mtime=modification_time,
+                    last_size=size,
+                )
+            self.camera_listings.set_folder(
+                serial=self.camera_serial,
+                storage=storage,
+                folder=path,
+                files=listing,
+                summary=summary,
+            )
+
         folders = []
         try:
             for name, value in self.camera.camera.folder_list_folders(path):
@@ -835,6 +1247,48 @@ class ScanWorker(WorkerInPublishPullPipeline):
                 os.path.join(path, name), folder_identifier, basedir
             )
 
+    def indexed_camera_files(
+        self, path: str, storage: str, media_names: list[str]
+    ) -> dict[str, tuple[float, int, float]]:
+        """
+        Get from the camera scan index the details of files in the folder that can be
+        trusted without asking the camera about them.
+
+        The folder is unchanged since it was last scanned if it has the same number
+        of photos and videos, and its last listed photo or video has the same name,
+        modification time and size. Only then are the indexed details trusted: in a
+        folder that has changed, a file's name may have been reused for a different
+        file, or the file edited in place.
+
+        :param path: the folder on the camera
+        :param storage: the description of the camera storage the folder is on
+        :param media_names: names of the photos and videos in the folder, in the
+         order they were listed
+        :return: modification time, size and time it was listed of files, by name,
+         which is empty if the folder has changed
+        """
+
+        summary = self.camera_listings.get_folder_summary(
+            serial=self.camera_serial, storage=storage, folder=path
+        )
+        unchanged = False
+        if (
+            summary is not None
+            and summary.file_count == len(media_names)
+            and summary.last_name == media_names[-1]
+        ):
+            with contextlib.suppress(gp.GPhoto2Error):
+                last_file_info = self.camera.get_file_info(path, summary.last_name)
+                unchanged = last_file_info == (summary.last_mtime, summary.last_size)
+        if not unchanged:
+            return {}
+        logging.debug(
+            "%s on %s is unchanged since it was last scanned", path, self.display_name
+        )
+        return self.camera_listings.get_folder(
+            serial=self.camera_serial, storage=storage, folder=path
+        )
+
     def identify_camera_tz_and_sample_files(self) -> None:
         """
         Get sample metadata for photos and videos, and determine device timezone
@@ -926,7 +1380,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
         file = os.path.join(self.dir_name, self.file_name)
 
         # do we have permission to read the file?
-        if self.download_from_camera or os.access(file, os.R_OK):
+        if self.download_from_camera or self.file_readable(file):
             # count how many files of each type are included
             # i.e. how many photos and videos
             self.files_scanned += 1
@@ -979,8 +1433,8 @@ class ScanWorker(WorkerInPublishPullPipeline):
                     size = file_info.size
                     camera_file = CameraFile(name=self.file_name, size=size)
                 else:
-                    stat = os.stat(file)
-                    size = stat.st_size
+                    file_stat = self.dir_stats.get(self.file_name) or os.stat(file)
+                    size = file_stat.st_size
                     if size <= 0:
                         logging.error(
                             "Zero length file %s will not be downloaded from %s",
@@ -992,7 +1446,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
                             FileZeroLengthProblem(name=self.file_name, uri=uri)
                         )
                         return
-                    modification_time = stat.st_mtime
+                    modification_time = file_stat.st_mtime
                     camera_file = None
 
                 self.file_size_sum[file_type] += size
@@ -1016,12 +1470,15 @@ class ScanWorker(WorkerInPublishPullPipeline):
                 # note: we should use the adjusted mtime, not the raw one
                 adjusted_mtime = self.adjusted_mtime(modification_time)
 
-                downloaded = self.downloaded.file_downloaded(
-                    name=self.file_name,
-                    size=size,
-                    modification_time=adjusted_mtime,
-                    time_zone_offset_resolution=self.time_zone_offset_resolution,
-                )
+                if file in self.downloaded_lookup:
+                    downloaded = self.downloaded_lookup[file]
+                else:
+                    downloaded = self.downloaded.file_downloaded(
+                        name=self.file_name,
+                        size=size,
+                        modification_time=adjusted_mtime,
+                        time_zone_offset_resolution=self.time_zone_offset_resolution,
+                    )
 
                 thumbnail_cache_status = ThumbnailCacheDiskStatus.unknown
 
@@ -1038,12 +1495,14 @@ class ScanWorker(WorkerInPublishPullPipeline):
                 ):
                     # Was there a thumbnail generated for the file?
                     # If so, get the metadata date time from that
-                    get_thumbnail = self.thumbnail_cache.get_thumbnail_path(
-                        full_file_name=file,
-                        mtime=adjusted_mtime,
-                        size=size,
-                        camera_model=self.camera_model,
-                    )
+                    get_thumbnail = self.thumbnail_lookup.get(file)
+                    if get_thumbnail is None:
+                        get_thumbnail = self.thumbnail_cache.get_thumbnail_path(
+                            full_file_name=file,
+                            mtime=adjusted_mtime,
+                            size=size,
+                            camera_model=self.camera_model,
+                        )
                     thumbnail_cache_status = get_thumbnail.disk_status
                     if thumbnail_cache_status in (
                         ThumbnailCacheDiskStatus.found,
@@ -1083,7 +1542,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
                     audio_file_full_name=audio_file_full_name,
                     xmp_file_full_name=xmp_file_full_name,
                     log_file_full_name=log_file_full_name,
-                    scan_id=self.worker_id,
+                    scan_id=self.scan_id,
                     file_type=file_type,
                     from_camera=self.download_from_camera,
                     camera_details=self.camera_details,
@@ -1159,6 +1618,28 @@ class ScanWorker(WorkerInPublishPullPipeline):
                     self.sample_photo = None
                     self.sample_video = None
 
+    def file_readable(self, file: str) -> bool:
+        """
+        Determine if a file on the file system can be read, avoiding a system call
+        where possible.
+
+        Files that are not photos or videos are assumed to be readable, because if
+        they are used at all, it is as an associate file, which are copied only when
+        the photo or video is downloaded, at which point any error is reported.
+
+        :param file: full path of the file
+        :return: True if the file can be read
+        """
+
+        file_stat = self.dir_stats.get(self.file_name)
+        if file_stat is None:
+            if fileformats.file_type_from_splitext(file_name=self.file_name) is None:
+                return True
+            return os.access(file, os.R_OK)
+        return readable_from_mode(file_stat, self.process_identity) or os.access(
+            file, os.R_OK
+        )
+
     def send_message_to_sink(self) -> None:
         with contextlib.suppress(AttributeError):
             logging.debug(
@@ -1207,7 +1688,7 @@ class ScanWorker(WorkerInPublishPullPipeline):
             audio_file_full_name=None,
             xmp_file_full_name=None,
             log_file_full_name=None,
-            scan_id=self.worker_id,
+            scan_id=self.scan_id,
             file_type=file_type,
             from_camera=self.download_from_camera,
             camera_details=self.camera_details,
@@ -1877,28 +2358,45 @@ class ScanWorker(WorkerInPublishPullPipeline):
         else:
             return self._get_associate_file(base_name, ["xmp"])
 
+    @staticmethod
+    def associate_extensions() -> set[str]:
+        """
+        :return: extensions of files that can be associated with a photo or video,
+         in lower case without leading period
+        """
+
+        return {
+            "xmp",
+            "log",
+            *raphodo.metadata.fileextensions.AUDIO_EXTENSIONS,
+            *raphodo.metadata.fileextensions.VIDEO_THUMBNAIL_EXTENSIONS,
+        }
+
     def _get_associate_file(
         self, base_name: str, extensions_to_check: list[str]
     ) -> str | None:
         """
+        Uses the index of associate files built when the directory was prepared for
+        scanning.
+
         :param base_name: base name of file, without directory
         :param extensions_to_check: list of extensions in lower case without leading
         period
         :return: full file path if found, else None
         """
 
-        full_file_name_no_ext = os.path.join(self.dir_name, base_name)
-        for e in extensions_to_check:
-            possible_file = f"{full_file_name_no_ext}.{e}"
-            if os.path.exists(possible_file):
-                return possible_file
-            possible_file = f"{full_file_name_no_ext}.{e.upper()}"
-            if os.path.exists(possible_file):
-                return possible_file
+        associate_files = self.dir_associate_files.get(base_name)
+        if associate_files:
+            for e in extensions_to_check:
+                name = associate_files.get(e)
+                if name is not None:
+                    return os.path.join(self.dir_name, name)
         return None
 
     def cleanup_pre_stop(self):
         self.exit_exiftool()
+        self.downloaded.end_scan_session()
+        self.thumbnail_cache.close()
         if self.camera is not None:
             self.camera.free_camera()
         self.send_problems()
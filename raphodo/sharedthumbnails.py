@@ -0,0 +1,177 @@
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Send thumbnails from thumbnail extractors to the main process using shared memory,
+instead of encoding them as PNG and pickling them.
+
+Each thumbnail extractor process creates a ring of fixed size slots in a memory
+mapped file on a tmpfs. It writes the raw pixels of each thumbnail into a free slot,
+marks the slot as in use, and sends only the slot's location and the thumbnail's
+dimensions to the main process. The main process copies the thumbnail out of the
+slot and marks the slot as free again.
+"""
+
+import contextlib
+import logging
+import mmap
+import os
+import tempfile
+from collections import namedtuple
+
+from PyQt5 import sip
+from PyQt5.QtGui import QImage
+
+SharedThumbnail = namedtuple(
+    "SharedThumbnail", "path offset width height bytes_per_line"
+)
+
+# The format of the pixels in a slot, which QPixmap.fromImage() can use without
+# converting them
+shared_format = QImage.Format_ARGB32_Premultiplied
+
+# Each slot begins with a header, the first byte of which indicates whether the slot
+# is in use. The pixels follow.
+slot_header_size = 64
+slot_free = 0
+slot_in_use = 1
+
+
+def shared_memory_dir() -> str:
+    """
+    :return: directory in which to create shared memory files, preferably a tmpfs
+    """
+
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+class SharedThumbnailWriter:
+    """
+    Writes thumbnails to shared memory, in a thumbnail extractor process
+    """
+
+    def __init__(
+        self, slots: int = 32, max_width: int = 256, max_height: int = 256
+    ) -> None:
+        """
+        :param slots: how many thumbnails can await reading by the main process
+        :param max_width: the widest thumbnail that can be written
+        :param max_height: the tallest thumbnail that can be written
+        """
+
+        self.slots = slots
+        self.max_pixel_bytes = max_width * max_height * 4
+        self.slot_size = slot_header_size + self.max_pixel_bytes
+        fd, self.path = tempfile.mkstemp(
+            prefix="rapid-photo-downloader-thumbnails-", dir=shared_memory_dir()
+        )
+        try:
+            os.ftruncate(fd, self.slots * self.slot_size)
+            self.mmap = mmap.mmap(fd, self.slots * self.slot_size)
+        except OSError:
+            os.remove(self.path)
+            raise
+        finally:
+            os.close(fd)
+        self.next_slot = 0
+
+    def free_slot(self) -> int | None:
+        """
+        :return: offset of the next free slot, or None if every slot is in use
+        """
+
+        for i in range(self.slots):
+            slot = (self.next_slot + i) % self.slots
+            offset = slot * self.slot_size
+            if self.mmap[offset] == slot_free:
+                self.next_slot = (slot + 1) % self.slots
+                return offset
+        return None
+
+    def write(self, thumbnail: QImage) -> SharedThumbnail | None:
+        """
+        Write the thumbnail into a free slot.
+
+        :param thumbnail: the thumbnail to write
+        :return: the thumbnail's location in shared memory, or None if it is too
+         large or there is no free slot, in which case it must be sent some other
+         way
+        """
+
+        if thumbnail.format() != shared_format:
+            thumbnail = thumbnail.convertToFormat(shared_format)
+        size = thumbnail.bytesPerLine() * thumbnail.height()
+        if size > self.max_pixel_bytes:
+            return None
+        offset = self.free_slot()
+        if offset is None:
+            return None
+
+        pixels = thumbnail.constBits()
+        pixels.setsize(size)
+        start = offset + slot_header_size
+        self.mmap[start : start + size] = pixels
+        self.mmap[offset] = slot_in_use
+        return SharedThumbnail(
+            path=self.path,
+            offset=offset,
+            width=thumbnail.width(),
+            height=thumbnail.height(),
+            bytes_per_line=thumbnail.bytesPerLine(),
+        )
+
+    def close(self) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
+        self.mmap.close()
+
+
+class SharedThumbnailReader:
+    """
+    Reads thumbnails from shared memory, in the main process
+    """
+
+    def __init__(self) -> None:
+        # path: memory mapped file
+        self.mmaps: dict[str, mmap.mmap] = {}
+
+    def _mmap(self, path: str) -> mmap.mmap:
+        shared = self.mmaps.get(path)
+        if shared is None:
+            with open(path, "r+b") as f:
+                shared = mmap.mmap(f.fileno(), 0)
+            # The mapping remains valid once the file is removed, and removing it
+            # now means it cannot be left behind should the extractor be killed
+            os.remove(path)
+            self.mmaps[path] = shared
+        return shared
+
+    def read(self, shared_thumbnail: SharedThumbnail) -> QImage:
+        """
+        Copy the thumbnail out of shared memory, and free its slot.
+
+        :param shared_thumbnail: the thumbnail's location in shared memory
+        :return: the thumbnail, or a null image if it could not be read
+        """
+
+        try:
+            shared = self._mmap(shared_thumbnail.path)
+        except OSError as e:
+            logging.error("Could not read thumbnail from shared memory: %s", e)
+            return QImage()
+
+        start = shared_thumbnail.offset + slot_header_size
+        size = shared_thumbnail.bytes_per_line * shared_thumbnail.height
+        # Build the image over the shared memory, then copy it so the slot can be
+        # reused
+        thumbnail = QImage(
+            sip.voidptr(memoryview(shared)[start : start + size]),
+            shared_thumbnail.width,
+            shared_thumbnail.height,
+            shared_thumbnail.bytes_per_line,
+            shared_format,
+        ).copy()
+        shared[shared_thumbnail.offset] = slot_free
+        return thumbnail
@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+import pickle
+from types import SimpleNamespace
+
+import pytest
+
+from raphodo import interprocess
+from raphodo.interprocess import (
+    BackupArguments,
+    BackupFileData,
+    BackupManager,
+    BackupResults,
+    PublishPullPipelineManager,
+)
+
+
+class Workers:
+    """
+    Records what the backup manager asks the worker processes to do, in place of
+    the processes themselves
+    """
+
+    def __init__(self) -> None:
+        self.started: list[tuple[int, object]] = []
+        self.stopped: list[int] = []
+        self.sent: list[tuple[int, object]] = []
+
+    def start_worker(self, manager, worker_id: bytes, data: bytes) -> None:
+        manager.workers.append(int(worker_id))
+        self.started.append((int(worker_id), pickle.loads(data)))
+
+    def stop_worker(self, manager, worker_id: bytes) -> None:
+        self.stopped.append(int(worker_id))
+
+    def send_message_to_worker(
+        self, manager, data: bytes, worker_id: bytes | None = None
+    ) -> None:
+        if int(worker_id) in manager.workers:
+            self.sent.append((int(worker_id), pickle.loads(data)))
+
+
+def record(workers: Workers, name: str):
+    method = getattr(workers, name)
+
+    def worker_method(manager, *args, **kwargs) -> None:
+        method(manager, *args, **kwargs)
+
+    return worker_method
+
+
+@pytest.fixture
+def workers(monkeypatch) -> Workers:
+    workers = Workers()
+    monkeypatch.setattr(
+        interprocess.worker_zygote, "ensure_running", lambda: None, raising=False
+    )
+    for name in ("start_worker", "stop_worker", "send_message_to_worker"):
+        monkeypatch.setattr(PublishPullPipelineManager, name, record(workers, name))
+    return workers
+
+
+@pytest.fixture
+def manager(workers: Workers) -> BackupManager:
+    return BackupManager(logging_port=0)
+
+
+def add_device(manager: BackupManager, device_id: int) -> None:
+    manager.start_worker(
+        worker_id=str(device_id).encode(),
+        data=pickle.dumps(BackupArguments(f"/media/backup{device_id}", "Backup", True)),
+    )
+
+
+def remove_device(manager: BackupManager, device_id: int) -> None:
+    manager.stop_worker(worker_id=str(device_id).encode())
+
+
+def send_file(manager: BackupManager, device_id: int, uid: bytes) -> None:
+    data = BackupFileData(rpd_file=SimpleNamespace(uid=uid), do_backup=True)
+    manager.send_message_to_worker(
+        data=pickle.dumps(data), worker_id=str(device_id).encode()
+    )
+
+
+def device_ids(items: list[tuple[int, object]]) -> list[int]:
+    return [device_id for device_id, data in items]
+
+
+def test_fan_out(manager: BackupManager, workers: Workers) -> None:
+    add_device(manager, 1)
+    add_device(manager, 2)
+    assert [worker_id for worker_id, items in workers.started] == [-1]
+    assert workers.sent[0][0] == -1
+    assert device_ids(workers.sent[0][1]) == [2]
+
+    # A file's data is sent once every device has been sent it
+    send_file(manager, 1, b"a")
+    assert len(workers.sent) == 1
+    send_file(manager, 2, b"a")
+    assert workers.sent[1][0] == -1
+    assert device_ids(workers.sent[1][1]) == [1, 2]
+
+
+def test_fan_out_devices_readded(manager: BackupManager, workers: Workers) -> None:
+    # Backup devices are reset by removing every device then adding them again
+    add_device(manager, 1)
+    add_device(manager, 2)
+    remove_device(manager, 1)
+    remove_device(manager, 2)
+    assert workers.stopped == [-1]
+
+    # The stopping process has yet to report it has stopped, so is still a worker
+    assert manager.workers == [-1]
+    add_device(manager, 1)
+    add_device(manager, 2)
+    assert [worker_id for worker_id, items in workers.started] == [-1, -2]
+    assert workers.sent[-1][0] == -2
+
+    # The process has now stopped
+    manager.workers.remove(-1)
+    send_file(manager, 1, b"a")
+    send_file(manager, 2, b"a")
+    assert workers.sent[-1][0] == -2
+    assert device_ids(workers.sent[-1][1]) == [1, 2]
+
+
+def test_fan_out_no_worker(manager: BackupManager, workers: Workers, caplog) -> None:
+    add_device(manager, 1)
+    # The process exited unexpectedly
+    manager.workers.remove(-1)
+    sent = len(workers.sent)
+    with caplog.at_level(logging.ERROR):
+        send_file(manager, 1, b"a")
+    assert len(workers.sent) == sent
+    assert "no backup process in fan-out mode" in caplog.text
+
+    # Adding a device starts a new process
+    add_device(manager, 2)
+    assert [worker_id for worker_id, items in workers.started] == [-1, -2]
+
+
+def test_process_sink_batch(manager: BackupManager) -> None:
+    # One signal is emitted for each run of files and of bytes backed up
+    signals = []
+    manager.messages.connect(lambda files: signals.append(("files", files)))
+    manager.bytesBackedUpBatch.connect(
+        lambda progress: signals.append(("bytes", progress))
+    )
+    manager.backupProblems.connect(
+        lambda device_id, problems: signals.append(("problems", problems))
+    )
+    rpd_file = SimpleNamespace(uid=b"a")
+    results = [
+        BackupResults(scan_id=0, device_id=1, total_downloaded=10, chunk_downloaded=10),
+        BackupResults(scan_id=0, device_id=1, total_downloaded=30, chunk_downloaded=20),
+        BackupResults(
+            scan_id=0,
+            device_id=1,
+            backup_succeeded=True,
+            do_backup=True,
+            rpd_file=rpd_file,
+            backup_full_file_name="/media/backup1/IMG_0001.JPG",
+        ),
+        BackupResults(scan_id=0, device_id=1, problems=["problem"]),
+        BackupResults(scan_id=0, device_id=1, total_downloaded=35, chunk_downloaded=5),
+    ]
+    manager.process_sink_batch([pickle.dumps(result) for result in results])
+    assert [(kind, len(items)) for kind, items in signals] == [
+        ("bytes", 2),
+        ("files", 1),
+        ("problems", 1),
+        ("bytes", 1),
+    ]
+    assert signals[0][1] == [(0, 10), (0, 20)]
+    assert signals[1][1][0][:3] == (1, True, True)
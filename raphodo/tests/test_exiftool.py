@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import fcntl
+import io
+import os
+import random
+import struct
+import termios
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from raphodo.metadata import exiftool
+from raphodo.metadata.exiftool import ExifTool, ExifToolPool
+
+
+def wait_until_read(fd: int) -> None:
+    """
+    Wait until the reader has read everything written to the pipe
+    """
+
+    while struct.unpack("i", fcntl.ioctl(fd, termios.FIONREAD, b"\0" * 4))[0]:
+        time.sleep(0.001)
+
+
+class FakeExifTool:
+    """
+    Stands in for the exiftool process, writing its reply to a pipe in the chunks
+    given, each chunk only once the previous chunk has been read
+    """
+
+    def __init__(self, chunks: list[bytes], close: bool = False) -> None:
+        self.read_fd, self.write_fd = os.pipe()
+        self.stdin = io.BytesIO()
+        self.stdout = os.fdopen(self.read_fd, "rb", buffering=0)
+        self.closed = close
+        self.writer = threading.Thread(target=self.write, args=(chunks,))
+
+    def write(self, chunks: list[bytes]) -> None:
+        for chunk in chunks:
+            os.write(self.write_fd, chunk)
+            wait_until_read(self.read_fd)
+        if self.closed:
+            os.close(self.write_fd)
+
+    def __enter__(self) -> ExifTool:
+        self.writer.start()
+        et = ExifTool()
+        et._process = self
+        et.running = True
+        self.et = et
+        return et
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.writer.join()
+        # Do not try to terminate the process that does not exist
+        self.et.running = False
+        self.stdout.close()
+        if not self.closed:
+            os.close(self.write_fd)
+
+
+def make_reply(size: int) -> bytes:
+    rng = random.Random(size)
+    return bytes(rng.randrange(33, 127) for _ in range(size))
+
+
+def test_execute_small_reply() -> None:
+    fake = FakeExifTool([b'[{"SourceFile": "IMG_0001.JPG"}]\n{ready}\n'])
+    with fake as et:
+        reply = et.execute(b"-j", b"IMG_0001.JPG")
+    # Only the sentinel and the whitespace around the whole reply are removed
+    assert reply == b'[{"SourceFile": "IMG_0001.JPG"}]\n'
+    assert fake.stdin.getvalue() == b"-j\nIMG_0001.JPG\n-execute\n"
+
+
+@pytest.mark.parametrize(
+    "size",
+    [
+        exiftool.block_size - 1,
+        exiftool.block_size,
+        exiftool.block_size + 1,
+        5 * exiftool.block_size + 12345,
+    ],
+)
+def test_execute_large_reply(size: int) -> None:
+    # The reply is larger than the initial buffer, and the sentinel is split across
+    # reads
+    reply = make_reply(size)
+    chunks = [reply[i : i + 20000] for i in range(0, size, 20000)]
+    chunks.extend((b"\n{rea", b"dy}\n"))
+    with FakeExifTool(chunks) as et:
+        assert et.execute(b"-b", b"-PreviewImage", b"IMG_0001.CR2") == reply + b"\n"
+
+
+def test_execute_sentinel_split_at_buffer_end() -> None:
+    # The first part of the sentinel fills the initial buffer exactly
+    reply = make_reply(exiftool.block_size - 4)
+    with FakeExifTool([reply + b"\n{re", b"ady}\n"]) as et:
+        assert et.execute(b"IMG_0001.CR2") == reply + b"\n"
+
+
+def test_execute_empty_reply() -> None:
+    with FakeExifTool([b"{read", b"y}\n"]) as et:
+        assert et.execute(b"IMG_0001.CR2") == b""
+
+
+def test_execute_output_closed() -> None:
+    fake = FakeExifTool([b"partial reply"], close=True)
+    with fake as et, pytest.raises(ValueError, match="closed its output"):
+        et.execute(b"IMG_0001.CR2")
+
+
+def test_execute_not_running() -> None:
+    with pytest.raises(ValueError, match="not running"):
+        ExifTool().execute(b"IMG_0001.CR2")
+
+
+class FakeProcess:
+    """
+    Stands in for an ExifTool instance, taking a random time to reply
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.batches = []
+
+    def get_tags_batch(self, tags, filenames):
+        self.batches.append(filenames)
+        time.sleep(random.random() / 100)
+        return [
+            {"SourceFile": filename, "Tags": tags, "Process": self.name}
+            for filename in filenames
+        ]
+
+    def terminate(self) -> None:
+        pass
+
+
+@pytest.mark.parametrize("processes, files", [(1, 50), (3, 7), (3, 50), (4, 103)])
+def test_run_batch_file_order(processes: int, files: int) -> None:
+    pool = ExifToolPool(processes=processes)
+    fake_processes = [FakeProcess(str(i)) for i in range(processes)]
+    pool._processes = list(fake_processes)
+    for process in fake_processes:
+        pool._idle.put(process)
+    if processes > 1:
+        pool._executor = ThreadPoolExecutor(max_workers=processes)
+    pool.running = True
+
+    filenames = [f"IMG_{i:04}.JPG" for i in range(files)]
+    try:
+        results = pool.get_tags_batch(["EXIF:Make"], iter(filenames))
+    finally:
+        pool.terminate()
+
+    assert [result["SourceFile"] for result in results] == filenames
+    assert all(result["Tags"] == ["EXIF:Make"] for result in results)
+
+    # Batches too small to be worth dividing are run by a single process
+    batches = [batch for process in fake_processes for batch in process.batches]
+    expected = min(processes, files // ExifToolPool.min_files_per_process) or 1
+    assert len(batches) == expected
+    assert sorted(name for batch in batches for name in batch) == filenames
+
+
+def test_run_batch_single_filename() -> None:
+    pool = ExifToolPool()
+    with pytest.raises(TypeError):
+        pool.get_tags_batch(["EXIF:Make"], "IMG_0001.JPG")
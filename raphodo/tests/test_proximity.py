@@ -3,11 +3,658 @@
 # SPDX-FileCopyrightText: Copyright 2015-2024 Damon Lynch <damonlynch@gmail.com>
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import locale
+import os
 import pickle
-import proximity
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
 
-with open('proximity_test_data', 'rb') as data:
-    test_rows = pickle.load(data)
+import pytest
 
-p = proximity.TemporalProximityGroups(test_rows)
-print(p.depth())
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+from raphodo.constants import FileType, proximity_time_steps
+from raphodo.proximity import ProximityIndex, TemporalProximityGroups
+from raphodo.ui.viewutils import ThumbnailDataForProximity
+
+test_data = os.path.join(os.path.dirname(__file__), "proximity_test_data")
+
+time_zone = "America/New_York"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def app():
+    # The Timeline measures its text using fonts
+    return QApplication.instance() or QApplication(["test_proximity"])
+
+
+@pytest.fixture(autouse=True)
+def local_time_zone(monkeypatch):
+    """
+    Generate the Timeline in a fixed time zone and locale, so the expected values do
+    not depend on where the tests are run
+    """
+
+    monkeypatch.setenv("TZ", time_zone)
+    time.tzset()
+    previous_locale = locale.setlocale(locale.LC_ALL)
+    locale.setlocale(locale.LC_ALL, "C")
+    yield
+    locale.setlocale(locale.LC_ALL, previous_locale)
+    monkeypatch.undo()
+    time.tzset()
+
+
+def timestamp(*args, fold: int = 0) -> float:
+    return datetime(*args, tzinfo=ZoneInfo(time_zone), fold=fold).timestamp()
+
+
+def make_rows(ctimes: list[float]) -> list[ThumbnailDataForProximity]:
+    return [
+        ThumbnailDataForProximity(
+            uid=bytes([i]),
+            ctime=ctime,
+            file_type=FileType.photo if i % 2 else FileType.video,
+            previously_downloaded=i == 0,
+        )
+        for i, ctime in enumerate(ctimes)
+    ]
+
+
+# Files crossing the boundaries that converting each timestamp to a local date must
+# get right. In the DST sequences, the wall clock jumps forward from 2:00 to 3:00,
+# and back from 2:00 to 1:00.
+sequences = dict(
+    day_boundary=[
+        timestamp(2023, 3, 10, 23, 30),
+        timestamp(2023, 3, 10, 23, 50),
+        timestamp(2023, 3, 11, 0, 10),
+        timestamp(2023, 3, 11, 0, 40),
+        timestamp(2023, 3, 11, 15, 0),
+    ],
+    dst_start=[
+        timestamp(2023, 3, 12, 0, 45),
+        timestamp(2023, 3, 12, 1, 30),
+        timestamp(2023, 3, 12, 1, 59),
+        timestamp(2023, 3, 12, 3, 10),
+        timestamp(2023, 3, 12, 5, 0),
+    ],
+    dst_end=[
+        timestamp(2023, 11, 5, 0, 50),
+        timestamp(2023, 11, 5, 1, 30),
+        timestamp(2023, 11, 5, 1, 10, fold=1),
+        timestamp(2023, 11, 5, 1, 55, fold=1),
+        timestamp(2023, 11, 5, 3, 30),
+    ],
+    year_boundary=[
+        timestamp(2022, 12, 31, 22, 0),
+        timestamp(2022, 12, 31, 23, 45),
+        timestamp(2023, 1, 1, 0, 30),
+        timestamp(2023, 1, 2, 0, 30),
+        timestamp(2023, 1, 2, 0, 40),
+    ],
+)
+
+# (sequence, temporal span): (rows, col1_col2_uid), as generated when an Arrow date
+# time was created for every file
+expected_timelines = {
+    ("day_boundary", 3600): (
+        [
+            (
+                2023,
+                "March",
+                "Fri",
+                "10",
+                "Mar 10, 11:30 PM -\nMar 11, 12:40 AM",
+                True,
+                "Mar 2023",
+                "Mar 10 2023",
+                "Mar 10 2023, 11:30 PM - Mar 11 2023, 12:40 AM",
+            ),
+            ("", "", "Sat", "11", "", True, "Mar 2023", "Mar 11 2023", ""),
+            (
+                "",
+                "",
+                "",
+                "",
+                "3:00 PM",
+                True,
+                "Mar 2023",
+                "Mar 11 2023",
+                "Mar 11 2023, 3:00 PM",
+            ),
+        ],
+        [
+            (0, 0, b"\x00"),
+            (0, 0, b"\x01"),
+            (1, 0, b"\x02"),
+            (1, 0, b"\x03"),
+            (1, 1, b"\x04"),
+        ],
+    ),
+    ("dst_start", 3600): (
+        [
+            (
+                2023,
+                "March",
+                "Sun",
+                "12",
+                "12:45 - 3:10 AM",
+                True,
+                "Mar 2023",
+                "Mar 12 2023",
+                "Mar 12 2023, 12:45 - 3:10 AM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "5:00 AM",
+                True,
+                "Mar 2023",
+                "Mar 12 2023",
+                "Mar 12 2023, 5:00 AM",
+            ),
+        ],
+        [
+            (0, 0, b"\x00"),
+            (0, 0, b"\x01"),
+            (0, 0, b"\x02"),
+            (0, 0, b"\x03"),
+            (0, 1, b"\x04"),
+        ],
+    ),
+    ("dst_start", 1800): (
+        [
+            (
+                2023,
+                "March",
+                "Sun",
+                "12",
+                "12:45 AM",
+                False,
+                "Mar 2023",
+                "Mar 12 2023",
+                "Mar 12 2023, 12:45 AM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "1:30 - 3:10 AM",
+                True,
+                "Mar 2023",
+                "Mar 12 2023",
+                "Mar 12 2023, 1:30 - 3:10 AM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "5:00 AM",
+                True,
+                "Mar 2023",
+                "Mar 12 2023",
+                "Mar 12 2023, 5:00 AM",
+            ),
+        ],
+        [
+            (0, 0, b"\x00"),
+            (0, 1, b"\x01"),
+            (0, 1, b"\x02"),
+            (0, 1, b"\x03"),
+            (0, 2, b"\x04"),
+        ],
+    ),
+    ("dst_end", 3600): (
+        [
+            (
+                2023,
+                "November",
+                "Sun",
+                "5",
+                "12:50 - 1:55 AM",
+                True,
+                "Nov 2023",
+                "Nov 5 2023",
+                "Nov 5 2023, 12:50 - 1:55 AM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "3:30 AM",
+                True,
+                "Nov 2023",
+                "Nov 5 2023",
+                "Nov 5 2023, 3:30 AM",
+            ),
+        ],
+        [
+            (0, 0, b"\x00"),
+            (0, 0, b"\x01"),
+            (0, 0, b"\x02"),
+            (0, 0, b"\x03"),
+            (0, 1, b"\x04"),
+        ],
+    ),
+    ("dst_end", 1800): (
+        [
+            (
+                2023,
+                "November",
+                "Sun",
+                "5",
+                "12:50 AM",
+                False,
+                "Nov 2023",
+                "Nov 5 2023",
+                "Nov 5 2023, 12:50 AM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "1:30 AM",
+                True,
+                "Nov 2023",
+                "Nov 5 2023",
+                "Nov 5 2023, 1:30 AM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "1:10 AM",
+                True,
+                "Nov 2023",
+                "Nov 5 2023",
+                "Nov 5 2023, 1:10 AM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "1:55 AM",
+                True,
+                "Nov 2023",
+                "Nov 5 2023",
+                "Nov 5 2023, 1:55 AM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "3:30 AM",
+                True,
+                "Nov 2023",
+                "Nov 5 2023",
+                "Nov 5 2023, 3:30 AM",
+            ),
+        ],
+        [
+            (0, 0, b"\x00"),
+            (0, 1, b"\x01"),
+            (0, 2, b"\x02"),
+            (0, 3, b"\x03"),
+            (0, 4, b"\x04"),
+        ],
+    ),
+    ("year_boundary", 3600): (
+        [
+            (
+                2022,
+                "December",
+                "Sat",
+                "31",
+                "10:00 PM",
+                False,
+                "Dec 2022",
+                "Dec 31 2022",
+                "Dec 31 2022, 10:00 PM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "Dec 31 2022, 11:45 PM -\nJan 1 2023, 12:30 AM",
+                True,
+                "Dec 2022",
+                "Dec 31 2022",
+                "Dec 31 2022, 11:45 PM - Jan 1 2023, 12:30 AM",
+            ),
+            (2023, "January", "Sun", "1", "", True, "Jan 2023", "Jan 1 2023", ""),
+            (
+                "",
+                "",
+                "Mon",
+                "2",
+                "12:30 - 12:40 AM",
+                True,
+                "Jan 2023",
+                "Jan 2 2023",
+                "Jan 2 2023, 12:30 - 12:40 AM",
+            ),
+        ],
+        [
+            (0, 0, b"\x00"),
+            (0, 1, b"\x01"),
+            (1, 1, b"\x02"),
+            (2, 2, b"\x03"),
+            (2, 2, b"\x04"),
+        ],
+    ),
+    ("year_boundary", 1800): (
+        [
+            (
+                2022,
+                "December",
+                "Sat",
+                "31",
+                "10:00 PM",
+                False,
+                "Dec 2022",
+                "Dec 31 2022",
+                "Dec 31 2022, 10:00 PM",
+            ),
+            (
+                "",
+                "",
+                "",
+                "",
+                "11:45 PM",
+                True,
+                "Dec 2022",
+                "Dec 31 2022",
+                "Dec 31 2022, 11:45 PM",
+            ),
+            (
+                2023,
+                "January",
+                "Sun",
+                "1",
+                "12:30 AM",
+                True,
+                "Jan 2023",
+                "Jan 1 2023",
+                "Jan 1 2023, 12:30 AM",
+            ),
+            (
+                "",
+                "",
+                "Mon",
+                "2",
+                "12:30 - 12:40 AM",
+                True,
+                "Jan 2023",
+                "Jan 2 2023",
+                "Jan 2 2023, 12:30 - 12:40 AM",
+            ),
+        ],
+        [
+            (0, 0, b"\x00"),
+            (0, 1, b"\x01"),
+            (1, 2, b"\x02"),
+            (2, 3, b"\x03"),
+            (2, 3, b"\x04"),
+        ],
+    ),
+}
+
+
+@pytest.mark.parametrize("sequence, temporal_span", sorted(expected_timelines), ids=str)
+def test_temporal_proximity_groups(sequence: str, temporal_span: int) -> None:
+    expected_rows, expected_col1_col2_uid = expected_timelines[
+        (sequence, temporal_span)
+    ]
+    groups = TemporalProximityGroups(
+        make_rows(sequences[sequence]), temporal_span=temporal_span
+    )
+    assert [tuple(row) for row in groups.rows] == expected_rows
+    assert groups.col1_col2_uid == expected_col1_col2_uid
+    # The files are from previous years, so all three columns are shown
+    assert groups.depth() == 3
+    assert not groups.invalid_rows
+
+
+def test_temporal_proximity_groups_unsorted() -> None:
+    rows = make_rows(sequences["year_boundary"])
+    expected = TemporalProximityGroups(list(rows))
+    groups = TemporalProximityGroups(list(reversed(rows)))
+    assert groups.rows == expected.rows
+    assert groups.col1_col2_uid == expected.col1_col2_uid
+
+
+def test_temporal_proximity_groups_no_files() -> None:
+    groups = TemporalProximityGroups([])
+    assert groups.rows == []
+    assert groups.col1_col2_uid == []
+
+
+def assert_same_timeline(
+    groups: TemporalProximityGroups, expected: TemporalProximityGroups
+) -> None:
+    assert groups.rows == expected.rows
+    assert groups.spans == expected.spans
+    assert groups.depth() == expected.depth()
+    assert groups.uids.uids(2) == expected.uids.uids(2)
+    assert not groups.invalid_rows
+
+
+def cells(groups: TemporalProximityGroups) -> dict[bytes, tuple[int, int]]:
+    return {uid: (col1, col2) for col1, col2, uid in groups.col1_col2_uid}
+
+
+# Three proximity groups on three days
+index_ctimes = [
+    timestamp(2023, 5, 1, 9, 0),
+    timestamp(2023, 5, 1, 9, 20),
+    timestamp(2023, 5, 1, 9, 40),
+    timestamp(2023, 5, 2, 14, 0),
+    timestamp(2023, 5, 2, 14, 30),
+    timestamp(2023, 5, 3, 18, 0),
+]
+
+
+def test_proximity_index() -> None:
+    rows = make_rows(index_ctimes)
+    index = ProximityIndex()
+    # The order the files are added in is irrelevant
+    index.update(list(reversed(rows)))
+    assert len(index) == len(rows)
+
+    groups = index.groups(3600)
+    expected = TemporalProximityGroups(list(rows), temporal_span=3600)
+    assert_same_timeline(groups, expected)
+    # When first generated, every file's cells are new
+    assert groups.col1_col2_uid == expected.col1_col2_uid
+    assert index.cells == cells(expected)
+
+    # Nothing has changed since the Timeline was last generated
+    groups = index.groups(3600)
+    assert_same_timeline(groups, expected)
+    assert groups.col1_col2_uid == []
+
+
+def test_proximity_index_update() -> None:
+    rows = make_rows(index_ctimes)
+    index = ProximityIndex()
+    index.update(rows)
+    previous = index.groups(3600)
+
+    # Add a file that starts a fourth group on a fourth day, change the time of a
+    # file without moving it out of its group, and remove a file
+    added = ThumbnailDataForProximity(
+        uid=b"\x10",
+        ctime=timestamp(2023, 5, 4, 8, 0),
+        file_type=FileType.photo,
+        previously_downloaded=False,
+    )
+    changed = rows[4]._replace(ctime=timestamp(2023, 5, 2, 14, 45))
+    removed = rows[1]
+    index.update([added, changed], removed_uids=[removed.uid])
+
+    current_rows = [added, changed] + [
+        row for row in rows if row.uid not in (changed.uid, removed.uid)
+    ]
+    assert len(index) == len(current_rows)
+
+    groups = index.groups(3600)
+    expected = TemporalProximityGroups(list(current_rows), temporal_span=3600)
+    assert_same_timeline(groups, expected)
+
+    # Only the cells that changed are sent to the main window
+    previous_cells = cells(previous)
+    assert groups.col1_col2_uid == [
+        (col1, col2, uid)
+        for col1, col2, uid in expected.col1_col2_uid
+        if previous_cells.get(uid) != (col1, col2)
+    ]
+    assert groups.col1_col2_uid == [(3, 3, added.uid)]
+    assert index.cells == cells(expected)
+    assert removed.uid not in index.cells
+
+
+def test_proximity_index_moved_cells() -> None:
+    rows = make_rows(index_ctimes)
+    index = ProximityIndex()
+    index.update(rows)
+    index.groups(3600)
+
+    # Remove the only file on the second day, so the files on the third day move up
+    # a row in both columns
+    removed = [row.uid for row in rows[3:5]]
+    index.update([], removed_uids=removed)
+    groups = index.groups(3600)
+    expected = TemporalProximityGroups(list(rows[:3] + rows[5:]), temporal_span=3600)
+    assert_same_timeline(groups, expected)
+    assert groups.col1_col2_uid == [(1, 1, rows[5].uid)]
+
+    # A smaller temporal span splits the first day into three groups, moving the
+    # files in column 2 but not column 1
+    groups = index.groups(600)
+    expected = TemporalProximityGroups(list(rows[:3] + rows[5:]), temporal_span=600)
+    assert_same_timeline(groups, expected)
+    assert groups.col1_col2_uid == [
+        (0, 1, rows[1].uid),
+        (0, 2, rows[2].uid),
+        (1, 3, rows[5].uid),
+    ]
+
+
+def test_proximity_index_row_uids() -> None:
+    rows = make_rows(index_ctimes)
+    index = ProximityIndex()
+    index.update(rows)
+    groups = index.groups(3600)
+    assert groups.row_uids(0) == [row.uid for row in rows[:3]]
+    assert groups.row_uids(1) == [row.uid for row in rows[3:5]]
+    assert groups.row_uids(2) == [rows[5].uid]
+
+
+# Gaps in seconds between consecutive files, equal to and just larger than the
+# temporal spans the user can choose. The files are all on the same day, so each
+# proximity group is one row of the Timeline.
+same_day_gaps = [
+    60,
+    300,
+    301,
+    600,
+    601,
+    900,
+    1800,
+    1801,
+    2700,
+    3600,
+    5400,
+    7200,
+    10800,
+    14400,
+    28800,
+]
+
+
+def same_day_rows() -> list[ThumbnailDataForProximity]:
+    ctime = timestamp(2023, 6, 1, 0, 30)
+    ctimes = [ctime]
+    for gap in same_day_gaps:
+        ctime += gap
+        ctimes.append(ctime)
+    return make_rows(ctimes)
+
+
+def test_proximity_index_group_count() -> None:
+    rows = same_day_rows()
+    index = ProximityIndex()
+    index.update(rows)
+    group_counts = index.groups(3600).group_counts
+    assert sorted(group_counts) == sorted(proximity_time_steps)
+
+    for minutes in proximity_time_steps:
+        expected = TemporalProximityGroups(list(rows), temporal_span=minutes * 60)
+        assert group_counts[minutes] == len(expected.rows)
+        assert index.group_count(minutes * 60) == len(expected.rows)
+        assert index.group_starts(minutes * 60) == [0] + [
+            i for i, gap in enumerate(same_day_gaps, start=1) if gap > minutes * 60
+        ]
+
+
+def test_proximity_index_group_count_several_days() -> None:
+    # Groups that span more than one day take more than one row of the Timeline, so
+    # count the groups in column 2
+    rows = make_rows(sequences["year_boundary"] + index_ctimes)
+    index = ProximityIndex()
+    index.update(rows)
+    group_counts = index.groups(3600).group_counts
+
+    for minutes in proximity_time_steps:
+        expected = TemporalProximityGroups(list(rows), temporal_span=minutes * 60)
+        assert group_counts[minutes] == len(expected.uids.uids(2))
+
+
+def test_proximity_index_group_count_no_files() -> None:
+    index = ProximityIndex()
+    for minutes in proximity_time_steps:
+        assert index.group_count(minutes * 60) == 0
+    groups = index.groups(3600)
+    assert groups.rows == []
+    assert groups.col1_col2_uid == []
+    assert groups.group_counts == {minutes: 0 for minutes in proximity_time_steps}
+
+
+def test_proximity_index_group_count_one_file() -> None:
+    rows = make_rows(index_ctimes[:1])
+    index = ProximityIndex()
+    index.update(rows)
+    for minutes in proximity_time_steps:
+        assert index.group_count(minutes * 60) == 1
+        assert index.group_starts(minutes * 60) == [0]
+    groups = index.groups(3600)
+    assert len(groups.rows) == 1
+    assert groups.group_counts == {minutes: 1 for minutes in proximity_time_steps}
+
+    # Counts are updated when the files change
+    index.update([], removed_uids=[rows[0].uid])
+    assert index.group_count(3600) == 0
+
+
+@pytest.mark.skipif(not os.path.exists(test_data), reason="No saved Timeline data")
+def test_temporal_proximity_groups_saved_data() -> None:
+    with open(test_data, "rb") as data:
+        test_rows = pickle.load(data)
+
+    groups = TemporalProximityGroups(test_rows)
+    assert groups.depth() in (1, 2, 3)
+    assert not groups.invalid_rows
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import pickle
+from datetime import datetime
+
+import pytest
+
+from raphodo.constants import (
+    DeviceTimestampTZ,
+    DownloadStatus,
+    FileType,
+    ThumbnailCacheDiskStatus,
+)
+from raphodo.rpdfile import (
+    RPDFILE_STATE_VERSION,
+    Photo,
+    RPDFile,
+    Video,
+    get_rpdfile,
+)
+
+
+def make_rpd_file(file_type: FileType, name: str, **kwargs) -> RPDFile:
+    arguments = dict(
+        name=name,
+        path="/media/EOS_DIGITAL/DCIM/100EOS5D",
+        size=23516764,
+        prev_full_name=None,
+        prev_datetime=None,
+        device_timestamp_type=DeviceTimestampTZ.is_local,
+        mtime=1700000000.0,
+        mdatatime=0.0,
+        thumbnail_cache_status=ThumbnailCacheDiskStatus.not_found,
+        thm_full_name=None,
+        audio_file_full_name=None,
+        xmp_file_full_name=None,
+        log_file_full_name=None,
+        scan_id=b"0",
+        file_type=file_type,
+        from_camera=False,
+        camera_details=None,
+        camera_memory_card_identifiers=None,
+        never_read_mdatatime=False,
+        device_display_name="EOS_DIGITAL",
+        device_uri="file:///media/EOS_DIGITAL/",
+        raw_exif_bytes=None,
+        exif_source=None,
+        problem=None,
+    )
+    arguments.update(kwargs)
+    return get_rpdfile(**arguments)
+
+
+def round_trip(rpd_file: RPDFile) -> RPDFile:
+    return pickle.loads(pickle.dumps(rpd_file, pickle.HIGHEST_PROTOCOL))
+
+
+def assert_same(rpd_file: RPDFile, original: RPDFile) -> None:
+    assert rpd_file.__class__ is original.__class__
+    assert rpd_file.__dict__ == original.__dict__
+
+
+def test_photo() -> None:
+    rpd_file = make_rpd_file(
+        FileType.photo,
+        "IMG_1234.CR2",
+        prev_full_name="/home/user/Pictures/IMG_1234.CR2",
+        prev_datetime=datetime(2023, 5, 1, 9, 30),
+        xmp_file_full_name="/media/EOS_DIGITAL/DCIM/100EOS5D/IMG_1234.XMP",
+        raw_exif_bytes=b"II*\x00" + bytes(100),
+    )
+    rpd_file.previously_downloaded = True
+    rpd_file.status = DownloadStatus.downloaded
+    rpd_file.download_path = "/home/user/Pictures/2023/20230501"
+    rpd_file.download_name = "20230501-IMG_1234.CR2"
+    rpd_file.job_code = "Wedding"
+
+    unpickled = round_trip(rpd_file)
+    assert isinstance(unpickled, Photo)
+    assert_same(unpickled, rpd_file)
+    assert unpickled.full_file_name == rpd_file.full_file_name
+    assert unpickled.modification_time == rpd_file.modification_time
+
+
+def test_video() -> None:
+    rpd_file = make_rpd_file(
+        FileType.video,
+        "MVI_1234.MOV",
+        size=823513764,
+        thm_full_name="/media/EOS_DIGITAL/DCIM/100EOS5D/MVI_1234.THM",
+        audio_file_full_name="/media/EOS_DIGITAL/DCIM/100EOS5D/MVI_1234.WAV",
+        camera_memory_card_identifiers=[1, 2],
+    )
+    unpickled = round_trip(rpd_file)
+    assert isinstance(unpickled, Video)
+    assert_same(unpickled, rpd_file)
+
+
+def test_default_values() -> None:
+    # Attributes with their usual None, False or empty string values are omitted
+    # from the state, and restored when unpickled
+    rpd_file = make_rpd_file(FileType.photo, "IMG_1234.JPG")
+    assert rpd_file.camera_model is None
+    assert rpd_file.from_camera is False
+    assert rpd_file.download_name == ""
+
+    version, mask, values, extra = rpd_file.__getstate__()
+    assert version == RPDFILE_STATE_VERSION
+    assert all(value is not None and value is not False for value in values)
+    assert "" not in values
+    assert extra is None
+
+    unpickled = round_trip(rpd_file)
+    assert_same(unpickled, rpd_file)
+    assert unpickled.camera_model is None
+    assert unpickled.from_camera is False
+    assert unpickled.download_name == ""
+
+
+def test_non_default_values_of_default_type() -> None:
+    # Values equal to but not identical to the usual value must still be pickled
+    rpd_file = make_rpd_file(FileType.photo, "IMG_1234.JPG")
+    rpd_file.metadata_failure = 0
+    unpickled = round_trip(rpd_file)
+    assert unpickled.metadata_failure == 0
+    assert unpickled.metadata_failure is not False
+
+
+def test_extra_attributes() -> None:
+    rpd_file = make_rpd_file(FileType.photo, "IMG_1234.JPG")
+    rpd_file.sequences = [1, 2, 3]
+    version, mask, values, extra = rpd_file.__getstate__()
+    assert extra == dict(sequences=[1, 2, 3])
+    assert_same(round_trip(rpd_file), rpd_file)
+
+
+def test_shared_strings_are_interned() -> None:
+    rpd_files = [make_rpd_file(FileType.photo, f"IMG_{i:04}.JPG") for i in range(1, 3)]
+    first, second = pickle.loads(pickle.dumps(rpd_files, pickle.HIGHEST_PROTOCOL))
+    assert first.path is second.path
+    assert first.device_uri is second.device_uri
+
+
+def test_attribute_dictionary() -> None:
+    # RPDFile instances pickled before the compact state was introduced
+    rpd_file = make_rpd_file(FileType.video, "MVI_1234.MOV")
+    unpickled = Video.__new__(Video)
+    unpickled.__setstate__(dict(rpd_file.__dict__))
+    assert_same(unpickled, rpd_file)
+
+
+def test_state_version_mismatch() -> None:
+    rpd_file = make_rpd_file(FileType.photo, "IMG_1234.JPG")
+    version, mask, values, extra = rpd_file.__getstate__()
+    unpickled = Photo.__new__(Photo)
+    with pytest.raises(ValueError, match="state version"):
+        unpickled.__setstate__((version + 1, mask, values, extra))
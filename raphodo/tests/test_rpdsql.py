@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import gphoto2 as gp
+import pytest
+
+from raphodo.rpdsql import CameraFolderSummary, CameraListingSQL
+from raphodo.scan import ScanWorker
+
+serial = "1234567"
+storage = "SD1"
+folder = "/store_00010001/DCIM/100CANON"
+
+files = [
+    ("IMG_0001.CR3", 1700000000.0, 30000000, 1710000000.0),
+    ("IMG_0002.CR3", 1700000060.0, 31000000, 1710000000.0),
+    ("IMG_0003.CR3", 1700000120.0, 32000000, 1710000000.0),
+]
+
+summary = CameraFolderSummary(
+    file_count=3, last_name="IMG_0003.CR3", last_mtime=1700000120.0, last_size=32000000
+)
+
+
+@pytest.fixture
+def listings(tmp_path) -> CameraListingSQL:
+    return CameraListingSQL(data_dir=str(tmp_path))
+
+
+def indexed(files: list[tuple[str, float, int, float]]) -> dict:
+    return {name: (mtime, size, listed) for name, mtime, size, listed in files}
+
+
+def test_folder_summary(listings: CameraListingSQL, tmp_path) -> None:
+    assert listings.get_folder_summary(serial, storage, folder) is None
+    listings.set_folder(serial, storage, folder, files=files, summary=summary)
+    assert listings.get_folder_summary(serial, storage, folder) == summary
+    assert listings.get_folder(serial, storage, folder) == indexed(files)
+
+    # The index persists between program runs
+    reopened = CameraListingSQL(data_dir=str(tmp_path))
+    assert reopened.get_folder_summary(serial, storage, folder) == summary
+    assert reopened.get_folder(serial, storage, folder) == indexed(files)
+
+
+def test_set_folder_replaces(listings: CameraListingSQL) -> None:
+    other_folder = "/store_00010001/DCIM/101CANON"
+    listings.set_folder(serial, storage, folder, files=files, summary=summary)
+    listings.set_folder(serial, storage, other_folder, files=files, summary=summary)
+
+    # Files no longer in the folder are removed from the index
+    listings.set_folder(serial, storage, folder, files=files[:2], summary=None)
+    assert listings.get_folder(serial, storage, folder) == indexed(files[:2])
+    assert listings.get_folder_summary(serial, storage, folder) is None
+
+    new_summary = summary._replace(
+        file_count=2, last_name="IMG_0002.CR3", last_mtime=1700000060.0
+    )
+    listings.set_folder(serial, storage, folder, files=files[:2], summary=new_summary)
+    assert listings.get_folder_summary(serial, storage, folder) == new_summary
+
+    # Other folders, storage and cameras are untouched
+    assert listings.get_folder(serial, storage, other_folder) == indexed(files)
+    assert listings.get_folder_summary(serial, storage, other_folder) == summary
+    assert listings.get_folder(serial, "SD2", folder) == {}
+    assert listings.get_folder("7654321", storage, folder) == {}
+
+
+def test_set_scanned(listings: CameraListingSQL) -> None:
+    other_folder = "/store_00010001/DCIM/101CANON"
+    listings.set_folder(serial, storage, folder, files=files, summary=summary)
+    listings.set_folder(serial, storage, other_folder, files=files, summary=None)
+    listings.set_folder(serial, "SD2", other_folder, files=files, summary=summary)
+
+    # Folders not visited in the scan are removed from the index
+    listings.set_scanned(serial, storage, folders={folder})
+    assert listings.get_folder(serial, storage, folder) == indexed(files)
+    assert listings.get_folder_summary(serial, storage, folder) == summary
+    assert listings.get_folder(serial, storage, other_folder) == {}
+
+    # Other storage is untouched
+    assert listings.get_folder(serial, "SD2", other_folder) == indexed(files)
+    assert listings.get_folder_summary(serial, "SD2", other_folder) == summary
+
+    listings.set_scanned(serial, storage, folders=set())
+    assert listings.get_folder(serial, storage, folder) == {}
+    assert listings.get_folder_summary(serial, storage, folder) is None
+
+
+def set_scanned_time(listings: CameraListingSQL, scanned: float) -> None:
+    conn = sqlite3.connect(listings.db)
+    with conn:
+        conn.execute(f"UPDATE {listings.camera_table_name} SET scanned=?", (scanned,))
+    conn.close()
+
+
+def test_expire(listings: CameraListingSQL) -> None:
+    listings.set_folder(serial, storage, folder, files=files, summary=summary)
+    listings.set_scanned(serial, storage, folders={folder})
+    listings.expire()
+    assert listings.get_folder_summary(serial, storage, folder) == summary
+
+    # The camera has not been scanned for a long time
+    set_scanned_time(listings, 1700000000.0)
+    listings.expire()
+    assert listings.get_folder(serial, storage, folder) == {}
+    assert listings.get_folder_summary(serial, storage, folder) is None
+
+
+def test_expire_not_yet_scanned(listings: CameraListingSQL) -> None:
+    # A camera being scanned for the first time is kept, unless its files were
+    # listed long ago
+    now = time.time()
+    recent = [(name, mtime, size, now) for name, mtime, size, listed in files]
+    listings.set_folder(serial, storage, folder, files=recent, summary=summary)
+    listings.set_folder("7654321", storage, folder, files=files, summary=summary)
+    listings.expire()
+    assert listings.get_folder_summary(serial, storage, folder) == summary
+    assert listings.get_folder("7654321", storage, folder) == {}
+    assert listings.get_folder_summary("7654321", storage, folder) is None
+
+
+class Camera:
+    """
+    The camera being scanned, which has the last file in the folder as given
+    """
+
+    def __init__(self, last_file_info: tuple[float, int] | None) -> None:
+        self.last_file_info = last_file_info
+
+    def get_file_info(self, path: str, name: str) -> tuple[float, int]:
+        if self.last_file_info is None:
+            raise gp.GPhoto2Error(gp.GP_ERROR_FILE_NOT_FOUND)
+        return self.last_file_info
+
+
+def indexed_camera_files(
+    listings: CameraListingSQL,
+    media_names: list[str],
+    last_file_info: tuple[float, int] | None = (1700000120.0, 32000000),
+) -> dict:
+    worker = SimpleNamespace(
+        camera_listings=listings,
+        camera_serial=serial,
+        camera=Camera(last_file_info),
+        display_name="Camera",
+    )
+    return ScanWorker.indexed_camera_files(worker, folder, storage, media_names)
+
+
+def test_indexed_camera_files_unchanged(listings: CameraListingSQL) -> None:
+    listings.set_folder(serial, storage, folder, files=files, summary=summary)
+    media_names = [name for name, mtime, size, listed in files]
+    assert indexed_camera_files(listings, media_names) == indexed(files)
+
+
+@pytest.mark.parametrize(
+    "media_names, last_file_info",
+    [
+        # A file was added
+        (["IMG_0001.CR3", "IMG_0002.CR3", "IMG_0003.CR3", "IMG_0004.CR3"], None),
+        # A file was removed, and another added with the same name as the last file
+        (["IMG_0001.CR3", "IMG_0003.CR3"], (1700000120.0, 32000000)),
+        # The card was formatted, and the file numbering restarted
+        (["IMG_0001.CR3", "IMG_0002.CR3", "IMG_0003.CR3"], (1720000000.0, 29000000)),
+        # The last file was edited in place
+        (["IMG_0001.CR3", "IMG_0002.CR3", "IMG_0003.CR3"], (1700000120.0, 33000000)),
+        # The last file could not be examined
+        (["IMG_0001.CR3", "IMG_0002.CR3", "IMG_0003.CR3"], None),
+    ],
+)
+def test_indexed_camera_files_changed(
+    listings: CameraListingSQL,
+    media_names: list[str],
+    last_file_info: tuple[float, int] | None,
+) -> None:
+    listings.set_folder(serial, storage, folder, files=files, summary=summary)
+    assert indexed_camera_files(listings, media_names, last_file_info) == {}
+
+
+def test_indexed_camera_files_not_indexed(listings: CameraListingSQL) -> None:
+    # Without a summary, the folder is treated as changed
+    listings.set_folder(serial, storage, folder, files=files, summary=None)
+    media_names = [name for name, mtime, size, listed in files]
+    assert indexed_camera_files(listings, media_names) == {}
@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import random
+import uuid
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+from raphodo.constants import DownloadStatus, FileType, Show, Sort
+from raphodo.rpdsql import ThumbnailRow, ThumbnailRowsSQL
+from raphodo.thumbnaildisplay import DescendingKey, ThumbnailListModel
+
+# Device names sort in the opposite order to their scan ids
+device_names = {0: "Phone", 1: "EOS 5D", 2: "Camera"}
+
+
+def make_files(count: int) -> list[tuple[ThumbnailRow, SimpleNamespace]]:
+    """
+    Make thumbnail rows and the attributes of their files used to sort them.
+
+    Modification times are unique, so the files have exactly one correct order.
+    """
+
+    rng = random.Random(count)
+    mtimes = rng.sample(range(1700000000, 1700100000), count)
+    files = []
+    for mtime in mtimes:
+        extension = rng.choice(("cr3", "jpg", "mov", "mp4", "JPG"))
+        file_type = FileType.video if extension in ("mov", "mp4") else FileType.photo
+        name = f"{rng.choice(('IMG', 'MVI', 'DSC'))}_{rng.randrange(20):04}.{extension}"
+        previously_downloaded = rng.random() < 0.3
+        row = ThumbnailRow(
+            uid=uuid.uuid4().bytes,
+            scan_id=rng.choice(list(device_names)),
+            mtime=float(mtime),
+            marked=not previously_downloaded,
+            file_name=name,
+            extension=extension,
+            file_type=file_type,
+            downloaded=False,
+            previously_downloaded=previously_downloaded,
+            job_code=False,
+            proximity_col1=-1,
+            proximity_col2=-1,
+        )
+        rpd_file = SimpleNamespace(
+            scan_id=row.scan_id,
+            modification_time=row.mtime,
+            name=row.file_name,
+            extension=row.extension,
+            file_type=row.file_type,
+        )
+        files.append((row, rpd_file))
+    return files
+
+
+def make_model(sort_by: Sort, sort_order: Qt.SortOrder, show: Show):
+    """
+    The parts of the thumbnail model used to insert rows in sorted order
+    """
+
+    tsql = ThumbnailRowsSQL()
+    for scan_id, device_name in device_names.items():
+        tsql.add_or_update_device(scan_id, device_name)
+    model = SimpleNamespace(
+        tsql=tsql,
+        rpd_files={},
+        rows=[],
+        uid_to_row={},
+        sort_by=sort_by,
+        sort_order=sort_order,
+        show=show,
+        proximity_col1=[],
+        proximity_col2=[],
+        device_names={},
+        beginInsertRows=lambda parent, first, last: None,
+        endInsertRows=lambda: None,
+    )
+    model.rowSortKey = partial(ThumbnailListModel.rowSortKey, model)
+    return model
+
+
+def test_descending_key() -> None:
+    assert DescendingKey(2) < DescendingKey(1)
+    assert not DescendingKey(1) < DescendingKey(1)
+    assert DescendingKey(1) == DescendingKey(1)
+    assert sorted(
+        [(DescendingKey("a"), DescendingKey(2)), (DescendingKey("a"), DescendingKey(3))]
+    ) == [
+        (DescendingKey("a"), DescendingKey(3)),
+        (DescendingKey("a"), DescendingKey(2)),
+    ]
+
+
+@pytest.mark.parametrize("show", list(Show))
+@pytest.mark.parametrize("sort_order", [Qt.AscendingOrder, Qt.DescendingOrder])
+@pytest.mark.parametrize("sort_by", list(Sort))
+def test_insert_thumbnail_rows(
+    sort_by: Sort, sort_order: Qt.SortOrder, show: Show
+) -> None:
+    # Rows inserted as files are scanned must be in the same order as the rows the
+    # database returns when the model is reset
+    model = make_model(sort_by, sort_order, show)
+    files = make_files(200)
+
+    for batch in (files[:1], files[1:40], files[40:41], files[41:120], files[120:]):
+        rows = [row for row, rpd_file in batch]
+        for row, rpd_file in batch:
+            model.rpd_files[row.uid] = rpd_file
+        model.tsql.add_thumbnail_rows(thumbnail_rows=rows)
+        ThumbnailListModel.insertThumbnailRows(model, rows)
+
+        assert model.rows == model.tsql.get_view(
+            sort_by=sort_by, sort_order=sort_order, show=show
+        )
+        assert model.uid_to_row == {
+            uid: row for row, (uid, marked) in enumerate(model.rows)
+        }
+
+
+def test_insert_thumbnail_rows_timeline_filter() -> None:
+    # New files are not yet in the Timeline cells that filter the rows
+    model = make_model(Sort.modification_time, Qt.AscendingOrder, Show.all)
+    model.proximity_col1 = [0]
+    rows = [row for row, rpd_file in make_files(5)]
+    model.tsql.add_thumbnail_rows(thumbnail_rows=rows)
+    ThumbnailListModel.insertThumbnailRows(model, rows)
+    assert model.rows == []
+
+
+@pytest.fixture
+def app():
+    # Pixmaps cannot be created without an application
+    return QApplication.instance() or QApplication(["test_thumbnaildisplay"])
+
+
+@pytest.fixture
+def thumbnail(app) -> QPixmap:
+    pixmap = QPixmap(10, 10)
+    pixmap.fill(QColor("white"))
+    return pixmap
+
+
+@pytest.mark.parametrize(
+    "in_thumbnail_cache, use_thumbnail_cache, reloadable",
+    [(True, True, True), (False, True, False), (True, False, False)],
+)
+def test_thumbnail_received_reloadable(
+    thumbnail: QPixmap,
+    in_thumbnail_cache: bool,
+    use_thumbnail_cache: bool,
+    reloadable: bool,
+) -> None:
+    # Only thumbnails known to be in the thumbnail cache can be evicted
+    rpd_file = SimpleNamespace(
+        uid=b"a",
+        scan_id=0,
+        name="IMG_0001.JPG",
+        job_code=None,
+        status=DownloadStatus.not_downloaded,
+        mdatatime_caused_ctime_change=False,
+        modified_via_daemon_process=False,
+    )
+    set_thumbnails = []
+    model = SimpleNamespace(
+        rpd_files={rpd_file.uid: rpd_file},
+        rapidApp=SimpleNamespace(devices={0: None}, downloadIsRunning=lambda: True),
+        prefs=SimpleNamespace(use_thumbnail_cache=use_thumbnail_cache),
+        thumbnails=SimpleNamespace(
+            set_thumbnail=lambda **kwargs: set_thumbnails.append(kwargs)
+        ),
+        uid_to_row={},
+        thumbnails_generated=0,
+        total_thumbs_to_generate=2,
+        no_thumbnails_by_scan={0: 2},
+    )
+    ThumbnailListModel.thumbnailReceived(model, rpd_file, thumbnail, in_thumbnail_cache)
+    assert set_thumbnails == [
+        dict(uid=b"a", thumbnail=thumbnail, reloadable=reloadable)
+    ]
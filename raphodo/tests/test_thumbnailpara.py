@@ -45,7 +45,8 @@ class TestThumbnail(QTextEdit):
         self.thumbnailer.generateThumbnails(0, self.rpd_files, False, 'test', self.cache_dirs,
                                                 self.camera_model, self.camera_port)
 
-    def thumbnailReceived(self, rpd_file: RPDFile, thumbnail: QPixmap) -> None:
+    def thumbnailReceived(self, rpd_file: RPDFile, thumbnail: QPixmap,
+                          in_thumbnail_cache: bool) -> None:
         self.received += 1
         if thumbnail is not None:
             self.insertPlainText('{}x{} - {}\n'.format(thumbnail.width(),
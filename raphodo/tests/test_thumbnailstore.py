@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtGui import QColor, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+from raphodo import thumbnailstore
+from raphodo.thumbnailstore import ThumbnailStore, pixmap_bytes
+
+
+@pytest.fixture(scope="module", autouse=True)
+def app():
+    # Pixmaps cannot be created without an application
+    return QApplication.instance() or QApplication(["test_thumbnailstore"])
+
+
+@pytest.fixture
+def min_resident(monkeypatch) -> None:
+    # Allow all but the most recently displayed thumbnail to be evicted
+    monkeypatch.setattr(thumbnailstore, "min_resident_thumbnails", 1)
+
+
+def make_pixmap(size: int = 10) -> QPixmap:
+    pixmap = QPixmap(size, size)
+    pixmap.fill(QColor("white"))
+    return pixmap
+
+
+class Reloads(list):
+    """
+    The uids of the thumbnails the store asked to be reloaded
+    """
+
+    def __call__(self, uid: bytes) -> None:
+        self.append(uid)
+
+
+@pytest.fixture
+def placeholder() -> QPixmap:
+    return make_pixmap(5)
+
+
+@pytest.fixture
+def thumbnail_bytes() -> int:
+    return pixmap_bytes(make_pixmap())
+
+
+def make_store(
+    placeholder: QPixmap,
+    thumbnails: int,
+    budget_thumbnails: int,
+    reloadable: bool = True,
+) -> tuple[ThumbnailStore, Reloads]:
+    reloads = Reloads()
+    budget = budget_thumbnails * pixmap_bytes(make_pixmap())
+    store = ThumbnailStore(budget=budget, reload=reloads)
+    for i in range(thumbnails):
+        uid = bytes([i])
+        store.add_placeholder(uid, placeholder)
+        store.set_thumbnail(uid, make_pixmap(), reloadable=reloadable)
+    return store, reloads
+
+
+def test_pixmap_bytes() -> None:
+    pixmap = make_pixmap()
+    assert pixmap_bytes(pixmap) == 10 * 10 * pixmap.depth() // 8
+
+
+def test_placeholder(placeholder) -> None:
+    store, reloads = make_store(placeholder, thumbnails=0, budget_thumbnails=10)
+    store.add_placeholder(b"a", placeholder)
+    assert len(store) == 1
+    assert b"a" in store
+    assert b"b" not in store
+    assert store[b"a"] is placeholder
+    assert store.get(b"b") is None
+    assert store.memory == 0
+    assert reloads == []
+
+
+@pytest.mark.usefixtures("min_resident")
+def test_memory(placeholder, thumbnail_bytes) -> None:
+    store, reloads = make_store(placeholder, thumbnails=3, budget_thumbnails=10)
+    assert store.memory == 3 * thumbnail_bytes
+
+    # Replacing a thumbnail does not count it twice
+    store.set_thumbnail(b"\x00", make_pixmap(20), reloadable=False)
+    assert store.memory == 2 * thumbnail_bytes + pixmap_bytes(make_pixmap(20))
+    store.set_thumbnail(b"\x00", make_pixmap(), reloadable=True)
+    assert store.memory == 3 * thumbnail_bytes
+
+    del store[b"\x01"]
+    assert b"\x01" not in store
+    assert store.memory == 2 * thumbnail_bytes
+
+    # Placeholders do not count against the budget
+    store.add_placeholder(b"a", placeholder)
+    assert store.memory == 2 * thumbnail_bytes
+
+
+@pytest.mark.usefixtures("min_resident")
+def test_evict_least_recently_displayed(placeholder, thumbnail_bytes) -> None:
+    store, reloads = make_store(placeholder, thumbnails=3, budget_thumbnails=3)
+    assert store.evicted == set()
+
+    store[b"\x00"]
+    store.add_placeholder(b"\x03", placeholder)
+    store.set_thumbnail(b"\x03", make_pixmap(), reloadable=True)
+    assert store.evicted == {b"\x01"}
+    assert store.memory == 3 * thumbnail_bytes
+    assert store.memory <= store.budget
+    assert reloads == []
+
+    # Deleting an evicted file forgets it was evicted
+    del store[b"\x01"]
+    assert store.evicted == set()
+
+
+@pytest.mark.usefixtures("min_resident")
+def test_reload(placeholder, thumbnail_bytes) -> None:
+    store, reloads = make_store(placeholder, thumbnails=2, budget_thumbnails=1)
+    assert store.evicted == {b"\x00"}
+
+    # An evicted thumbnail is reloaded only once, however often it is requested
+    assert store[b"\x00"] is placeholder
+    assert store[b"\x00"] is placeholder
+    assert reloads == [b"\x00"]
+    assert store.misses == 2
+
+    thumbnail = make_pixmap()
+    store.set_thumbnail(b"\x00", thumbnail, reloadable=True)
+    assert store[b"\x00"] is thumbnail
+    assert store.evicted == {b"\x01"}
+    assert store.reloading == set()
+    assert store.hits == 1
+    assert store.hit_rate() == 1 / 3
+
+
+@pytest.mark.usefixtures("min_resident")
+def test_reload_failed(placeholder, thumbnail_bytes) -> None:
+    store, reloads = make_store(placeholder, thumbnails=2, budget_thumbnails=1)
+    store[b"\x00"]
+    store.reload_failed(b"\x00")
+
+    # The placeholder is displayed from now on
+    assert store[b"\x00"] is placeholder
+    assert reloads == [b"\x00"]
+    assert store.evicted == set()
+    assert store.reloading == set()
+
+
+@pytest.mark.usefixtures("min_resident")
+def test_pinned(placeholder, thumbnail_bytes) -> None:
+    # Thumbnails that cannot be reloaded are never evicted, even over the budget
+    store, reloads = make_store(
+        placeholder, thumbnails=3, budget_thumbnails=1, reloadable=False
+    )
+    assert store.memory == 3 * thumbnail_bytes
+    assert store.evicted == set()
+
+    store.add_placeholder(b"\x03", placeholder)
+    store.set_thumbnail(b"\x03", make_pixmap(), reloadable=True)
+    store.add_placeholder(b"\x04", placeholder)
+    store.set_thumbnail(b"\x04", make_pixmap(), reloadable=True)
+    assert store.evicted == {b"\x03"}
+    assert set(store.pinned) == {b"\x00", b"\x01", b"\x02"}
+
+
+def test_min_resident_thumbnails(placeholder, thumbnail_bytes) -> None:
+    # The most recently displayed thumbnails are kept, even over the budget
+    minimum = thumbnailstore.min_resident_thumbnails
+    store, reloads = make_store(placeholder, thumbnails=minimum, budget_thumbnails=0)
+    assert store.evicted == set()
+    assert store.memory == minimum * thumbnail_bytes
+
+    store.add_placeholder(b"new", placeholder)
+    store.set_thumbnail(b"new", make_pixmap(), reloadable=True)
+    assert store.evicted == {b"\x00"}
+    assert len(store.evictable) == minimum
+
+
+def test_hit_rate(placeholder) -> None:
+    store, reloads = make_store(placeholder, thumbnails=1, budget_thumbnails=1)
+    assert store.hit_rate() == 1.0
+    store[b"\x00"]
+    assert store.hits == 1
+    assert store.hit_rate() == 1.0
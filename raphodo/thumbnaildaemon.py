@@ -172,24 +172,24 @@ class DameonThumbnailWorker(DaemonProcess):
                         # Send data to load balancer, which will send to one of its
                         # workers
 
-                        self.content = pickle.dumps(
-                            ThumbnailExtractorArgument(
-                                rpd_file=rpd_file,
-                                task=task,
-                                processing=processing,
-                                full_file_name_to_work_on=full_file_name_to_work_on,
-                                secondary_full_file_name="",
-                                exif_buffer=None,
-                                thumbnail_bytes=thumbnail_bytes,
-                                use_thumbnail_cache=data.use_thumbnail_cache,
-                                file_to_work_on_is_temporary=False,
-                                write_fdo_thumbnail=data.write_fdo_thumbnail,
-                                send_thumb_to_main=True,
-                                force_exiftool=data.force_exiftool,
-                            ),
-                            pickle.HIGHEST_PROTOCOL,
+                        argument = ThumbnailExtractorArgument(
+                            rpd_file=rpd_file,
+                            task=task,
+                            processing=processing,
+                            full_file_name_to_work_on=full_file_name_to_work_on,
+                            secondary_full_file_name="",
+                            exif_buffer=None,
+                            thumbnail_bytes=thumbnail_bytes,
+                            use_thumbnail_cache=data.use_thumbnail_cache,
+                            file_to_work_on_is_temporary=False,
+                            write_fdo_thumbnail=data.write_fdo_thumbnail,
+                            send_thumb_to_main=True,
+                            force_exiftool=data.force_exiftool,
+                        )
+                        self.content = pickle.dumps(argument, pickle.HIGHEST_PROTOCOL)
+                        self.frontend.send_multipart(
+                            [argument.lane(), b"data", self.content]
                         )
-                        self.frontend.send_multipart([b"data", self.content])
                 except SystemExit as e:
                     sys.exit(e.code)
                 except Exception:
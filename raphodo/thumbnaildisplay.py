@@ -4,6 +4,7 @@
 import datetime
 import logging
 import os
+from bisect import bisect_right
 from collections import defaultdict, deque
 from collections.abc import Sequence
 from typing import NamedTuple
@@ -25,7 +26,9 @@ from PyQt5.QtCore import (
     QSize,
     QSizeF,
     Qt,
+    QThread,
     QTimeLine,
+    QTimer,
     pyqtSignal,
     pyqtSlot,
 )
@@ -35,6 +38,7 @@ from PyQt5.QtGui import (
     QFont,
     QFontMetricsF,
     QGuiApplication,
+    QImage,
     QMouseEvent,
     QPainter,
     QPalette,
@@ -97,6 +101,7 @@ from raphodo.storage.storage import (
     validate_download_folder,
 )
 from raphodo.thumbnailer import Thumbnailer
+from raphodo.thumbnailstore import ThumbnailCacheLoader, ThumbnailStore
 from raphodo.tools.utilities import (
     CacheDirs,
     arrow_locale,
@@ -140,11 +145,14 @@ class AddBuffer:
     """
     Buffers thumbnail rows for display.
 
-    Add thumbnail rows to the listview is a relatively expensive operation, as the
-    model must be reset. Buffer the rows here, and then when big enough, flush it.
+    Adding thumbnail rows to the listview is a relatively expensive operation, as
+    they must be added to the database and inserted into the view. Buffer the rows
+    here, and then when big enough, flush it.
     """
 
     min_buffer_length = 10
+    # Flush at least this often, so thumbnails appear steadily during long scans
+    max_buffer_length = 500
 
     def __init__(self):
         self.initialize()
@@ -164,10 +172,12 @@ class AddBuffer:
 
     def reset(self, buffer_length: int) -> None:
         self.initialize()
-        self.buffer_length = buffer_length
+        self.buffer_length = min(self.max_buffer_length, buffer_length)
 
     def set_buffer_length(self, length: int) -> None:
-        self.buffer_length = max(self.min_buffer_length, length)
+        self.buffer_length = min(
+            self.max_buffer_length, max(self.min_buffer_length, length)
+        )
 
     def extend(self, scan_id: int, thumbnail_rows: Sequence[ThumbnailRow]) -> None:
         self.buffer[scan_id].extend(thumbnail_rows)
@@ -180,8 +190,26 @@ class AddBuffer:
         del self.buffer[scan_id]
 
 
+class DescendingKey:
+    """
+    Sort key that reverses the order of the value it wraps
+    """
+
+    __slots__ = "value"
+
+    def __init__(self, value) -> None:
+        self.value = value
+
+    def __eq__(self, other: "DescendingKey") -> bool:
+        return self.value == other.value
+
+    def __lt__(self, other: "DescendingKey") -> bool:
+        return other.value < self.value
+
+
 class ThumbnailListModel(QAbstractListModel):
     selectionReset = pyqtSignal()
+    loadThumbnails = pyqtSignal("PyQt_PyObject")
 
     def __init__(self, parent, logging_port: int, log_gphoto2: bool) -> None:
         super().__init__(parent)
@@ -210,9 +238,12 @@ class ThumbnailListModel(QAbstractListModel):
             no_workers=no_workers,
             logging_port=logging_port,
             log_gphoto2=log_gphoto2,
+            expensive_worker_percent=parent.prefs.thumbnail_expensive_worker_percent,
+            prefetch=parent.prefs.thumbnail_prefetch,
         )
         self.thumbnailer.frontend_port.connect(self.rapidApp.initStage4)
         self.thumbnailer.thumbnailReceived.connect(self.thumbnailReceived)
+        self.thumbnailer.thumbnailsReceived.connect(self.thumbnailsReceived)
         self.thumbnailer.cacheDirs.connect(self.cacheDirsReceived)
         self.thumbnailer.workerFinished.connect(self.thumbnailWorkerFinished)
         self.thumbnailer.cameraRemoved.connect(
@@ -221,12 +252,25 @@ class ThumbnailListModel(QAbstractListModel):
         # Connect to the signal that is emitted when a thumbnailing operation is
         # terminated by us, not merely finished
         self.thumbnailer.workerStopped.connect(self.thumbnailWorkerStopped)
+
+        # Reload thumbnails evicted from memory
+        self.thumbnailCacheLoader = ThumbnailCacheLoader()
+        self.thumbnailCacheLoaderThread = QThread()
+        self.thumbnailCacheLoader.moveToThread(self.thumbnailCacheLoaderThread)
+        self.loadThumbnails.connect(self.thumbnailCacheLoader.loadThumbnails)
+        self.thumbnailCacheLoader.thumbnailLoaded.connect(self.thumbnailReloaded)
+        self.thumbnailCacheLoaderThread.start()
+
         self.arrow_locale_for_humanize = arrow_locale(self.prefs.language)
         logging.debug("Setting arrow locale to %s", self.arrow_locale_for_humanize)
 
     def initialize(self) -> None:
-        # uid: QPixmap
-        self.thumbnails: dict[bytes, QPixmap] = {}
+        self.thumbnails = ThumbnailStore(
+            budget=self.prefs.thumbnail_memory_budget * 1024 * 1024,
+            reload=self.reloadThumbnail,
+        )
+        # uids of evicted thumbnails to reload from the thumbnail cache
+        self.thumbnails_to_reload: list[bytes] = []
 
         self.add_buffer = AddBuffer()
 
@@ -253,6 +297,8 @@ class ThumbnailListModel(QAbstractListModel):
         self.rows: list[tuple[bytes, bool]] = []
         # {uid: row}
         self.uid_to_row: dict[bytes, int] = {}
+        # scan_id: device name, used when sorting rows by device
+        self.device_names: dict[int, str] = {}
 
         size = QSize(106, 106)
         self.photo_icon = scaledIcon(data_file_path("thumbnail/photo.svg")).pixmap(size)
@@ -286,6 +332,52 @@ class ThumbnailListModel(QAbstractListModel):
 
     def stopThumbnailer(self) -> None:
         self.thumbnailer.stop()
+        self.thumbnailCacheLoaderThread.quit()
+        self.thumbnailCacheLoaderThread.wait()
+
+    def reloadThumbnail(self, uid: bytes) -> None:
+        """
+        Reload an evicted thumbnail that is being displayed. Reloads requested while
+        the view is being painted are sent to the loader together.
+        """
+
+        if not self.thumbnails_to_reload:
+            QTimer.singleShot(0, self.requestThumbnailReloads)
+        self.thumbnails_to_reload.append(uid)
+
+    @pyqtSlot()
+    def requestThumbnailReloads(self) -> None:
+        files = []
+        for uid in self.thumbnails_to_reload:
+            rpd_file = self.rpd_files.get(uid)
+            if rpd_file is not None:
+                files.append(
+                    (
+                        uid,
+                        rpd_file.full_file_name,
+                        rpd_file.modification_time,
+                        rpd_file.size,
+                        rpd_file.camera_model,
+                    )
+                )
+        self.thumbnails_to_reload = []
+        if files:
+            self.loadThumbnails.emit(files)
+
+    @pyqtSlot(bytes, QImage)
+    def thumbnailReloaded(self, uid: bytes, thumbnail: QImage) -> None:
+        if uid not in self.thumbnails.reloading:
+            # The file has since been removed, or its thumbnail replaced
+            return
+        if thumbnail.isNull():
+            self.thumbnails.reload_failed(uid)
+            return
+        self.thumbnails.set_thumbnail(
+            uid=uid, thumbnail=QPixmap.fromImage(thumbnail), reloadable=True
+        )
+        row = self.uid_to_row.get(uid)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, 0))
 
     @pyqtSlot(int)
     def thumbnailWorkerFinished(self, scan_id: int) -> None:
@@ -331,6 +423,14 @@ class ThumbnailListModel(QAbstractListModel):
                 self.thumbnails_generated,
             )
 
+        logging.debug(
+            "%s of thumbnails in memory (budget %s); %s evicted; %.0f%% hit rate",
+            format_size_for_user(self.thumbnails.memory),
+            format_size_for_user(self.thumbnails.budget),
+            len(self.thumbnails.evicted),
+            self.thumbnails.hit_rate() * 100,
+        )
+
         scan_ids = self.tsql.get_all_devices()
         active_devices = ", ".join(
             self.rapidApp.devices[scan_id].display_name
@@ -790,9 +890,9 @@ class ThumbnailListModel(QAbstractListModel):
             self.rpd_files[uid] = rpd_file
 
             if rpd_file.file_type == FileType.photo:
-                self.thumbnails[uid] = self.photo_icon
+                self.thumbnails.add_placeholder(uid, self.photo_icon)
             else:
-                self.thumbnails[uid] = self.video_icon
+                self.thumbnails.add_placeholder(uid, self.video_icon)
 
             if generate_thumbnail:
                 self.total_thumbs_to_generate += 1
@@ -835,18 +935,90 @@ class ThumbnailListModel(QAbstractListModel):
 
     def flushAddBuffer(self):
         if len(self.add_buffer):
-            self.beginResetModel()
-
+            thumbnail_rows = []
             for buffer in self.add_buffer.buffer.values():
                 self.tsql.add_thumbnail_rows(thumbnail_rows=buffer)
-            self.refresh(suppress_signal=True)
+                thumbnail_rows.extend(buffer)
 
             self.add_buffer.reset(buffer_length=len(self.rows))
 
-            self.endResetModel()
+            self.insertThumbnailRows(thumbnail_rows)
 
             self._resetHighlightingValues()
-            self._resetRememberSelection()
+
+    def rowSortKey(self, row: tuple[bytes, bool]) -> tuple:
+        """
+        Sort key for a row in the thumbnail view, matching the order in which the
+        database returns the rows for the current sort criteria.
+
+        :param row: the uid and marked state of the file
+        """
+
+        uid, marked = row
+        rpd_file = self.rpd_files[uid]
+        match self.sort_by:
+            case Sort.modification_time:
+                key = (rpd_file.modification_time,)
+            case Sort.checked_state:
+                key = (marked, rpd_file.modification_time)
+            case Sort.filename:
+                key = (rpd_file.name, rpd_file.modification_time)
+            case Sort.extension:
+                key = (rpd_file.extension, rpd_file.modification_time)
+            case Sort.file_type:
+                key = (rpd_file.file_type.value, rpd_file.modification_time)
+            case Sort.device:
+                key = (
+                    self.device_names.get(rpd_file.scan_id, ""),
+                    rpd_file.modification_time,
+                )
+        if self.sort_order == Qt.DescendingOrder:
+            return tuple(DescendingKey(value) for value in key)
+        return key
+
+    def insertThumbnailRows(self, thumbnail_rows: list[ThumbnailRow]) -> None:
+        """
+        Insert rows into the thumbnail view at the positions the current sort and
+        filter criteria place them, without resetting the model.
+
+        :param thumbnail_rows: rows already added to the database
+        """
+
+        if self.proximity_col1 or self.proximity_col2:
+            # Files are not assigned to Timeline cells until the Timeline is
+            # regenerated, so new files are not displayed by the filter
+            return
+
+        rows = [
+            (row.uid, row.marked)
+            for row in thumbnail_rows
+            if self.show != Show.new_only or not row.previously_downloaded
+        ]
+        if not rows:
+            return
+
+        if self.sort_by == Sort.device:
+            self.device_names = self.tsql.get_device_names()
+        rows.sort(key=self.rowSortKey)
+
+        # Group the new rows by where they are to be inserted into the existing rows
+        # position: rows
+        insertions: defaultdict[int, list[tuple[bytes, bool]]] = defaultdict(list)
+        for row in rows:
+            position = bisect_right(
+                self.rows, self.rowSortKey(row), key=self.rowSortKey
+            )
+            insertions[position].append(row)
+
+        # Insert from the end, so positions earlier in the list remain valid
+        for position in sorted(insertions, reverse=True):
+            new_rows = insertions[position]
+            self.beginInsertRows(QModelIndex(), position, position + len(new_rows) - 1)
+            self.rows[position:position] = new_rows
+            self.endInsertRows()
+
+        for row in range(min(insertions), len(self.rows)):
+            self.uid_to_row[self.rows[row][0]] = row
 
     def getMarkedSummary(self) -> MarkedSummary:
         """
@@ -881,8 +1053,28 @@ class ThumbnailListModel(QAbstractListModel):
             self.rapidApp.devices[scan_id].photo_cache_dir = cache_dirs.photo_cache_dir
             self.rapidApp.devices[scan_id].video_cache_dir = cache_dirs.video_cache_dir
 
-    @pyqtSlot(RPDFile, QPixmap)
-    def thumbnailReceived(self, rpd_file: RPDFile, thumbnail: QPixmap) -> None:
+    @pyqtSlot("PyQt_PyObject")
+    def thumbnailsReceived(
+        self, thumbnails: list[tuple[RPDFile, QPixmap, bool]]
+    ) -> None:
+        """
+        Several thumbnails have been generated by the dedicated thumbnailing phase.
+
+        :param thumbnails: details of the files, their thumbnails, and whether each
+         thumbnail is in the thumbnail cache
+        """
+
+        for rpd_file, thumbnail, in_thumbnail_cache in thumbnails:
+            self.thumbnailReceived(
+                rpd_file=rpd_file,
+                thumbnail=thumbnail,
+                in_thumbnail_cache=in_thumbnail_cache,
+            )
+
+    @pyqtSlot(RPDFile, QPixmap, bool)
+    def thumbnailReceived(
+        self, rpd_file: RPDFile, thumbnail: QPixmap, in_thumbnail_cache: bool = False
+    ) -> None:
         """
         A thumbnail has been generated by either the dedicated thumbnailing phase, or
         during the download by a daemon process.
@@ -891,6 +1083,8 @@ class ThumbnailListModel(QAbstractListModel):
         :param thumbnail: If isNull(), the thumbnail either could not be generated or
          did not need to be (because it already had been). Otherwise, this is
          the thumbnail to display.
+        :param in_thumbnail_cache: whether the thumbnail is known to be in the
+         thumbnail cache, i.e. it was loaded from it, or was successfully saved to it
         """
 
         uid = rpd_file.uid
@@ -921,7 +1115,17 @@ class ThumbnailListModel(QAbstractListModel):
             self.rpd_files[uid] = rpd_file
 
         if not thumbnail.isNull():
-            self.thumbnails[uid] = thumbnail
+            # Only thumbnails known to be in the thumbnail cache can be evicted,
+            # because they can be reloaded from it. A thumbnail that is ready is not
+            # necessarily in the cache, e.g. because saving it failed.
+            reloadable = (
+                in_thumbnail_cache
+                and self.prefs.use_thumbnail_cache
+                and not rpd_file.modified_via_daemon_process
+            )
+            self.thumbnails.set_thumbnail(
+                uid=uid, thumbnail=thumbnail, reloadable=reloadable
+            )
             # The thumbnail may or may not be displayed at this moment
             row = self.uid_to_row.get(uid)
             if row is not None:
@@ -17,6 +17,7 @@ from raphodo.interprocess import (
     create_inproc_msg,
 )
 from raphodo.rpdfile import RPDFile
+from raphodo.sharedthumbnails import SharedThumbnailReader
 from raphodo.tools.utilities import CacheDirs
 
 
@@ -29,7 +30,12 @@ class ThumbnailManagerPara(PublishPullPipelineManager):
     downloaded and that writes FreeDesktop.org thumbnails.
     """
 
-    message = pyqtSignal(RPDFile, QPixmap)
+    use_zygote = True
+
+    # The bool is whether the thumbnail is in the thumbnail cache
+    message = pyqtSignal(RPDFile, QPixmap, bool)
+    # List of RPDFile, QPixmap and bool tuples, from messages a worker sent together
+    messages = pyqtSignal("PyQt_PyObject")
     cacheDirs = pyqtSignal(int, CacheDirs)
     cameraRemoved = pyqtSignal(int)
 
@@ -38,34 +44,78 @@ class ThumbnailManagerPara(PublishPullPipelineManager):
         self._process_name = "Thumbnail Manager"
         self._process_to_run = "thumbnailpara.py"
         self._worker_id = 0
+        self.shared_thumbnails = SharedThumbnailReader()
 
-    def process_sink_data(self) -> None:
-        data: GenerateThumbnailsResults = pickle.loads(self.content)
-        if data.rpd_file is not None:
-            if data.thumbnail_bytes is None:
-                thumbnail = QPixmap()
-            else:
-                thumbnail = QImage.fromData(data.thumbnail_bytes)
-                if thumbnail.isNull():
-                    thumbnail = QPixmap()
-                else:
-                    thumbnail = QPixmap.fromImage(thumbnail)
-
-            self.message.emit(data.rpd_file, thumbnail)
-        elif data.camera_removed:
+    def thumbnail_from_results(self, data: GenerateThumbnailsResults) -> QPixmap:
+        if data.shared_thumbnail is not None:
+            thumbnail = self.shared_thumbnails.read(data.shared_thumbnail)
+        elif data.thumbnail_bytes is None:
+            return QPixmap()
+        else:
+            thumbnail = QImage.fromData(data.thumbnail_bytes)
+        if thumbnail.isNull():
+            return QPixmap()
+        return QPixmap.fromImage(thumbnail)
+
+    def process_results(self, data: GenerateThumbnailsResults) -> None:
+        if data.camera_removed:
             assert data.scan_id is not None
             self.cameraRemoved.emit(data.scan_id)
         else:
             assert data.cache_dirs is not None
             self.cacheDirs.emit(data.scan_id, data.cache_dirs)
 
+    def process_sink_data(self) -> None:
+        data: GenerateThumbnailsResults = pickle.loads(self.content)
+        if data.rpd_file is not None:
+            self.message.emit(
+                data.rpd_file,
+                self.thumbnail_from_results(data),
+                data.in_thumbnail_cache,
+            )
+        else:
+            self.process_results(data)
+
+    def process_sink_batch(self, contents: list[bytes]) -> None:
+        thumbnails = []
+        for content in contents:
+            data: GenerateThumbnailsResults = pickle.loads(content)
+            if data.rpd_file is not None:
+                thumbnails.append(
+                    (
+                        data.rpd_file,
+                        self.thumbnail_from_results(data),
+                        data.in_thumbnail_cache,
+                    )
+                )
+            else:
+                # Keep the order in which the worker sent its messages
+                if thumbnails:
+                    self.messages.emit(thumbnails)
+                    thumbnails = []
+                self.process_results(data)
+        if thumbnails:
+            self.messages.emit(thumbnails)
+
 
 class ThumbnailLoadBalancerManager(LoadBalancerManager):
     def __init__(
-        self, context: zmq.Context, no_workers: int, sink_port: int, logging_port: int
+        self,
+        context: zmq.Context,
+        no_workers: int,
+        sink_port: int,
+        logging_port: int,
+        expensive_worker_percent: int,
+        prefetch: int,
     ) -> None:
         super().__init__(
-            context, no_workers, sink_port, logging_port, ThreadNames.load_balancer
+            context,
+            no_workers,
+            sink_port,
+            logging_port,
+            ThreadNames.load_balancer,
+            expensive_worker_percent=expensive_worker_percent,
+            prefetch=prefetch,
         )
         self._process_name = "Thumbnail Load Balancer Manager"
         self._process_to_run = "thumbloadbalancer.py"
@@ -84,7 +134,13 @@ class Thumbnailer(QObject):
     # See also the four other signals below
 
     def __init__(
-        self, parent, no_workers: int, logging_port: int, log_gphoto2: bool
+        self,
+        parent,
+        no_workers: int,
+        logging_port: int,
+        log_gphoto2: bool,
+        expensive_worker_percent: int = 50,
+        prefetch: int = 2,
     ) -> None:
         """
         :param parent: Qt parent window
@@ -92,12 +148,19 @@ class Thumbnailer(QObject):
          use
         :param logging_port: 0MQ port to use for logging control
         :param log_gphoto2: if True, log libgphoto2 logging message
+        :param expensive_worker_percent: percentage of thumbnail extractor
+         processes that may work on slow tasks, like extracting frames from
+         videos, while quicker tasks are waiting
+        :param prefetch: how many quick tasks a thumbnail extractor process
+         may be sent at once
         """
         super().__init__(parent)
         self.context = zmq.Context.instance()
         self.log_gphoto2 = log_gphoto2
         self._frontend_port: int | None = None
         self.no_workers = no_workers
+        self.expensive_worker_percent = expensive_worker_percent
+        self.prefetch = prefetch
         self.logging_port = logging_port
 
         inproc = "inproc://{}"
@@ -175,6 +238,10 @@ class Thumbnailer(QObject):
     def thumbnailReceived(self) -> pyqtBoundSignal:
         return self.thumbnail_manager.message
 
+    @property
+    def thumbnailsReceived(self) -> pyqtBoundSignal:
+        return self.thumbnail_manager.messages
+
     @property
     def cacheDirs(self) -> pyqtBoundSignal:
         return self.thumbnail_manager.cacheDirs
@@ -225,6 +292,8 @@ class Thumbnailer(QObject):
             self.no_workers,
             self.thumbnail_manager_sink_port,
             self.logging_port,
+            self.expensive_worker_percent,
+            self.prefetch,
         )
         self.load_balancer.moveToThread(self.load_balancer_thread)
         self.load_balancer_thread.started.connect(
@@ -35,6 +35,7 @@ from raphodo.interprocess import (
     ThumbnailExtractorArgument,
 )
 from raphodo.rpdfile import Photo, RPDFile, Video
+from raphodo.sharedthumbnails import SharedThumbnail, SharedThumbnailWriter
 from raphodo.tools.utilities import (
     image_large_enough_fdo,
     show_errors,
@@ -164,6 +165,8 @@ class ThumbnailExtractor(LoadBalancerWorker):
         self.thumbnail_cache = ThumbnailCacheSql(create_table_if_not_exists=False)
         self.fdo_cache_large = FdoCacheLarge()
         self.fdo_cache_normal = FdoCacheNormal()
+        # Created when first asked to send a thumbnail using shared memory
+        self.shared_thumbnails: SharedThumbnailWriter | None = None
 
         super().__init__("Thumbnail Extractor")
 
@@ -616,6 +619,22 @@ class ThumbnailExtractor(LoadBalancerWorker):
 
         return thumbnail, orientation
 
+    def write_shared_thumbnail(self, thumbnail: QImage) -> SharedThumbnail | None:
+        """
+        Write the thumbnail to shared memory for the main process to read.
+
+        :return: the thumbnail's location in shared memory, or None if it must be
+         sent as PNG data instead
+        """
+
+        if self.shared_thumbnails is None:
+            try:
+                self.shared_thumbnails = SharedThumbnailWriter()
+            except OSError as e:
+                logging.error("Could not create shared memory for thumbnails: %s", e)
+                return None
+        return self.shared_thumbnails.write(thumbnail)
+
     def process_files(self):
         """
         Loop continuously processing photo and video thumbnails
@@ -624,13 +643,15 @@ class ThumbnailExtractor(LoadBalancerWorker):
         logging.debug(f"{self.requester.identity.decode()} worker started")
 
         while True:
-            directive, content = self.requester.recv_multipart()
+            directive, content = self.receive_task()
             if self.check_for_stop(directive, content):
                 break
 
             data: ThumbnailExtractorArgument = pickle.loads(content)
 
             thumbnail_256 = png_data = None
+            shared_thumbnail: SharedThumbnail | None = None
+            in_thumbnail_cache = False
             task = data.task
             processing = data.processing
             rpd_file = data.rpd_file
@@ -719,8 +740,11 @@ class ThumbnailExtractor(LoadBalancerWorker):
                             thumbnail = add_filmstrip(thumbnail_256)
 
                     if thumbnail is not None:
-                        buffer = qimage_to_png_buffer(thumbnail)
-                        png_data = buffer.data()
+                        if data.shared_memory and data.send_thumb_to_main:
+                            shared_thumbnail = self.write_shared_thumbnail(thumbnail)
+                        if shared_thumbnail is None:
+                            buffer = qimage_to_png_buffer(thumbnail)
+                            png_data = buffer.data()
 
                     orientation_unknown = (
                         ExtractionProcessing.orient in processing
@@ -733,15 +757,18 @@ class ThumbnailExtractor(LoadBalancerWorker):
                         and rpd_file.thumbnail_cache_status
                         == ThumbnailCacheDiskStatus.not_found
                     ):
-                        self.thumbnail_cache.save_thumbnail(
-                            full_file_name=rpd_file.full_file_name,
-                            size=rpd_file.size,
-                            mtime=rpd_file.modification_time,
-                            mdatatime=rpd_file.mdatatime,
-                            generation_failed=thumbnail is None,
-                            orientation_unknown=orientation_unknown,
-                            thumbnail=thumbnail,
-                            camera_model=rpd_file.camera_model,
+                        in_thumbnail_cache = (
+                            self.thumbnail_cache.save_thumbnail(
+                                full_file_name=rpd_file.full_file_name,
+                                size=rpd_file.size,
+                                mtime=rpd_file.modification_time,
+                                mdatatime=rpd_file.mdatatime,
+                                generation_failed=thumbnail is None,
+                                orientation_unknown=orientation_unknown,
+                                thumbnail=thumbnail,
+                                camera_model=rpd_file.camera_model,
+                            )
+                            is not None
                         )
 
                 if (
@@ -815,6 +842,7 @@ class ThumbnailExtractor(LoadBalancerWorker):
             # Purge metadata, as it cannot be pickled
             if not data.send_thumb_to_main:
                 png_data = None
+                shared_thumbnail = None
             rpd_file.metadata = None
             self.sender.send_multipart(
                 [
@@ -822,13 +850,16 @@ class ThumbnailExtractor(LoadBalancerWorker):
                     b"data",
                     pickle.dumps(
                         GenerateThumbnailsResults(
-                            rpd_file=rpd_file, thumbnail_bytes=png_data
+                            rpd_file=rpd_file,
+                            thumbnail_bytes=png_data,
+                            shared_thumbnail=shared_thumbnail,
+                            in_thumbnail_cache=in_thumbnail_cache,
                         ),
                         pickle.HIGHEST_PROTOCOL,
                     ),
                 ]
             )
-            self.requester.send_multipart([b"", b"", b"OK"])
+            self.task_finished()
 
     def do_work(self):
         if False:
@@ -854,6 +885,8 @@ class ThumbnailExtractor(LoadBalancerWorker):
             self.identity.decode(),
         )
         self.exiftool_process.terminate()
+        if self.shared_thumbnails is not None:
+            self.shared_thumbnails.close()
 
 
 if __name__ == "__main__":
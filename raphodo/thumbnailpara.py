@@ -30,8 +30,11 @@ the metadata time is not already found in the rpd_file.
 import logging
 import os
 import pickle
+import queue
 import sys
-from collections import Counter, deque
+import threading
+from collections import Counter, defaultdict, deque
+from collections.abc import Iterator, Sequence
 from operator import attrgetter
 from typing import NamedTuple
 
@@ -40,7 +43,7 @@ import zmq
 from PyQt5.QtCore import QSize
 from PyQt5.QtGui import QImage
 
-from raphodo.cache import FdoCacheLarge, ThumbnailCacheSql
+from raphodo.cache import FdoCacheLarge, GetThumbnailPath, ThumbnailCacheSql
 from raphodo.camera import Camera, CameraProblemEx, gphoto2_python_logging
 from raphodo.constants import (
     ExtractionProcessing,
@@ -77,6 +80,17 @@ class ThumbnailCacheSearch(NamedTuple):
     origin: ThumbnailCacheOrigin
 
 
+class PreparedThumbnail(NamedTuple):
+    # The load balancer lane to send the content to, or None if the content is
+    # results to send directly to the sink
+    lane: bytes | None
+    content: bytes
+
+
+class CameraReadAheadStopped(Exception):
+    """The camera read ahead thread was told to stop"""
+
+
 def cache_dir_name(device_name: str) -> str:
     """Generate a directory name for a temporary file cache"""
     return "rpd-cache-{}-".format(device_name[:10].replace(" ", "_"))
@@ -175,6 +189,35 @@ class GetThumbnailFromCache:
 
         self.thumbnail_size_needed = QSize(ThumbnailSize.width, ThumbnailSize.height)
 
+        # uid: result of a bulk lookup in the Thumbnail Cache
+        self.prefetched: dict[bytes, GetThumbnailPath] = {}
+
+    def prefetch(self, rpd_files: Sequence[RPDFile]) -> None:
+        """
+        Look up in bulk the Thumbnail Cache entries of files whose thumbnails will
+        soon be requested, so that get_from_cache() does not need to query the
+        database for each file individually.
+        """
+
+        if self.thumbnail_cache is None:
+            return
+
+        files_by_camera = defaultdict(list)
+        for rpd_file in rpd_files:
+            files_by_camera[rpd_file.camera_model].append(rpd_file)
+
+        for camera_model, files in files_by_camera.items():
+            get_thumbnails = self.thumbnail_cache.get_thumbnail_paths(
+                [
+                    (rpd_file.full_file_name, rpd_file.size, rpd_file.modification_time)
+                    for rpd_file in files
+                ],
+                camera_model=camera_model,
+            )
+            self.prefetched.update(
+                zip((rpd_file.uid for rpd_file in files), get_thumbnails)
+            )
+
     def image_large_enough(self, size: QSize) -> bool:
         """Check if image is equal or bigger than thumbnail size."""
         return (
@@ -198,12 +241,14 @@ class GetThumbnailFromCache:
         # Attempt to get thumbnail from Thumbnail Cache
         # (see cache.py for definitions of various caches)
         if self.thumbnail_cache is not None and use_thumbnail_cache:
-            get_thumbnail = self.thumbnail_cache.get_thumbnail_path(
-                full_file_name=rpd_file.full_file_name,
-                mtime=rpd_file.modification_time,
-                size=rpd_file.size,
-                camera_model=rpd_file.camera_model,
-            )
+            get_thumbnail = self.prefetched.pop(rpd_file.uid, None)
+            if get_thumbnail is None:
+                get_thumbnail = self.thumbnail_cache.get_thumbnail_path(
+                    full_file_name=rpd_file.full_file_name,
+                    mtime=rpd_file.modification_time,
+                    size=rpd_file.size,
+                    camera_model=rpd_file.camera_model,
+                )
             rpd_file.thumbnail_cache_status = get_thumbnail.disk_status
             if get_thumbnail.disk_status != ThumbnailCacheDiskStatus.not_found:
                 origin = ThumbnailCacheOrigin.thumbnail_cache
@@ -341,6 +386,9 @@ def preprocess_thumbnail_from_disk(
 
 
 class GenerateThumbnails(WorkerInPublishPullPipeline):
+    # Thumbnails found in a cache are sent to the main process in quick succession
+    sink_batch_size = 100
+
     def __init__(self) -> None:
         self.random_file_name = GenerateRandomFileName()
         self.counter = Counter()
@@ -367,6 +415,12 @@ class GenerateThumbnails(WorkerInPublishPullPipeline):
         self.photo_cache_dir: str | None = None
         self.video_cache_dir: str | None = None
 
+        # Files on a camera are read in a thread of their own, ahead of their being
+        # sent to the load balancer
+        self.read_ahead: queue.Queue[PreparedThumbnail | None] | None = None
+        self.read_ahead_thread: threading.Thread | None = None
+        self.stop_read_ahead = threading.Event()
+
         super().__init__("Thumbnails")
 
     def cache_full_size_file_from_camera(self) -> bool:
@@ -389,7 +443,7 @@ class GenerateThumbnails(WorkerInPublishPullPipeline):
                 size=self.rpd_file.size,
                 dest_full_filename=cache_full_file_name,
                 progress_callback=None,
-                check_for_command=self.check_for_controller_directive,
+                check_for_command=self.check_for_read_ahead_stop,
                 return_file_bytes=False,
             )
         except CameraProblemEx:
@@ -810,6 +864,176 @@ class GenerateThumbnails(WorkerInPublishPullPipeline):
             else:
                 self.full_file_name_to_work_on = self.rpd_file.full_file_name
 
+    def prepare_thumbnail(
+        self, thumbnail_caches: GetThumbnailFromCache, use_thumbnail_cache: bool
+    ) -> PreparedThumbnail | None:
+        """
+        Get the thumbnail for self.rpd_file from a cache, or read what is needed to
+        extract it from the device.
+
+        :param thumbnail_caches: the thumbnail caches to search
+        :param use_thumbnail_cache: whether the Thumbnail Cache is in use
+        :return: what to send to the load balancer or sink, or None if there is
+         nothing to send
+        """
+
+        self.exif_buffer = None
+        self.file_to_work_on_is_temporary = False
+        self.secondary_full_file_name = ""
+        self.processing = set()
+
+        # Attempt to get thumbnail from Thumbnail Cache
+        # (see cache.py for definitions of various caches)
+
+        cache_search = thumbnail_caches.get_from_cache(self.rpd_file)
+        self.task = cache_search.task
+        self.thumbnail_bytes = cache_search.thumbnail_bytes
+        self.full_file_name_to_work_on = cache_search.full_file_name_to_work_on
+        self.origin = cache_search.origin
+
+        if self.task != ExtractionTask.undetermined:
+            self.task_cache_extract()
+
+        if self.task == ExtractionTask.undetermined:
+            # Thumbnail was not found in any cache: extract it
+            if self.camera:
+                self.task_camera_extract()
+            else:
+                self.task_disk_extract()
+
+        if self.task == ExtractionTask.bypass:
+            in_thumbnail_cache = (
+                self.origin == ThumbnailCacheOrigin.thumbnail_cache
+                and self.rpd_file.thumbnail_cache_status
+                == ThumbnailCacheDiskStatus.found
+            )
+            results = GenerateThumbnailsResults(
+                rpd_file=self.rpd_file,
+                thumbnail_bytes=self.thumbnail_bytes,
+                in_thumbnail_cache=in_thumbnail_cache,
+            )
+            return PreparedThumbnail(
+                lane=None, content=pickle.dumps(results, pickle.HIGHEST_PROTOCOL)
+            )
+
+        if self.task == ExtractionTask.undetermined:
+            return None
+
+        argument = ThumbnailExtractorArgument(
+            rpd_file=self.rpd_file,
+            task=self.task,
+            processing=self.processing,
+            full_file_name_to_work_on=self.full_file_name_to_work_on,
+            secondary_full_file_name=self.secondary_full_file_name,
+            exif_buffer=self.exif_buffer,
+            thumbnail_bytes=self.thumbnail_bytes,
+            use_thumbnail_cache=use_thumbnail_cache,
+            file_to_work_on_is_temporary=self.file_to_work_on_is_temporary,
+            write_fdo_thumbnail=False,
+            send_thumb_to_main=True,
+            force_exiftool=self.force_exiftool,
+            shared_memory=self.prefs.thumbnail_shared_memory,
+        )
+        return PreparedThumbnail(
+            lane=argument.lane(),
+            content=pickle.dumps(argument, pickle.HIGHEST_PROTOCOL),
+        )
+
+    def prepare_thumbnails(
+        self,
+        rpd_files: list[RPDFile],
+        thumbnail_caches: GetThumbnailFromCache,
+        use_thumbnail_cache: bool,
+    ) -> Iterator[PreparedThumbnail]:
+        for self.rpd_file in rpd_files:
+            prepared = self.prepare_thumbnail(
+                thumbnail_caches=thumbnail_caches,
+                use_thumbnail_cache=use_thumbnail_cache,
+            )
+            if prepared is not None:
+                yield prepared
+
+    def start_camera_read_ahead(
+        self,
+        rpd_files: list[RPDFile],
+        thumbnail_caches: GetThumbnailFromCache,
+        use_thumbnail_cache: bool,
+    ) -> Iterator[PreparedThumbnail]:
+        """
+        Read from the camera in a thread of its own, so the extractors can work on
+        files already read while the next files are being transferred from the
+        camera.
+
+        Only the read ahead thread accesses the camera until it finishes.
+
+        :return: the prepared thumbnails, in priority order
+        """
+
+        self.read_ahead = queue.Queue(maxsize=self.prefs.thumbnail_camera_read_ahead)
+        self.stop_read_ahead.clear()
+        self.read_ahead_thread = threading.Thread(
+            target=self.read_camera_ahead,
+            kwargs=dict(
+                rpd_files=rpd_files,
+                thumbnail_caches=thumbnail_caches,
+                use_thumbnail_cache=use_thumbnail_cache,
+            ),
+            daemon=True,
+        )
+        self.read_ahead_thread.start()
+
+        while True:
+            try:
+                prepared = self.read_ahead.get(timeout=0.5)
+            except queue.Empty:
+                # Remain responsive to commands while waiting for the camera
+                self.check_for_controller_directive()
+                continue
+            if prepared is None:
+                return
+            yield prepared
+
+    def read_camera_ahead(
+        self,
+        rpd_files: list[RPDFile],
+        thumbnail_caches: GetThumbnailFromCache,
+        use_thumbnail_cache: bool,
+    ) -> None:
+        try:
+            for prepared in self.prepare_thumbnails(
+                rpd_files=rpd_files,
+                thumbnail_caches=thumbnail_caches,
+                use_thumbnail_cache=use_thumbnail_cache,
+            ):
+                if not self.put_read_ahead(prepared):
+                    return
+        except CameraReadAheadStopped:
+            return
+        except Exception:
+            logging.error("Exception reading thumbnails from %s", self.device_name)
+            logging.exception("Traceback:")
+        # Signal there is nothing more to read
+        self.put_read_ahead(None)
+
+    def put_read_ahead(self, prepared: PreparedThumbnail | None) -> bool:
+        """
+        Wait for room in the read ahead queue.
+
+        :return: False if told to stop while waiting, else True
+        """
+
+        while not self.stop_read_ahead.is_set():
+            try:
+                self.read_ahead.put(prepared, timeout=0.5)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def check_for_read_ahead_stop(self) -> None:
+        if self.stop_read_ahead.is_set():
+            raise CameraReadAheadStopped
+
     def do_work(self) -> None:
         try:
             self.generate_thumbnails()
@@ -861,6 +1085,9 @@ class GenerateThumbnails(WorkerInPublishPullPipeline):
 
         rpd_files = self.prioritise_thumbnail_order(arguments=arguments)
 
+        if use_thumbnail_cache:
+            thumbnail_caches.prefetch(rpd_files)
+
         if arguments.camera is not None:
             rpd_files = self.prepare_for_camera_thumbnail_extraction(
                 arguments=arguments,
@@ -872,67 +1099,33 @@ class GenerateThumbnails(WorkerInPublishPullPipeline):
 
         self.counter.clear()
 
-        for self.rpd_file in rpd_files:
+        if self.camera:
+            prepared_thumbnails = self.start_camera_read_ahead(
+                rpd_files=rpd_files,
+                thumbnail_caches=thumbnail_caches,
+                use_thumbnail_cache=use_thumbnail_cache,
+            )
+        else:
+            prepared_thumbnails = self.prepare_thumbnails(
+                rpd_files=rpd_files,
+                thumbnail_caches=thumbnail_caches,
+                use_thumbnail_cache=use_thumbnail_cache,
+            )
+
+        for prepared in prepared_thumbnails:
             # Check to see if the process has received a command
             self.check_for_controller_directive()
 
-            self.exif_buffer = None
-            self.file_to_work_on_is_temporary = False
-            self.secondary_full_file_name = ""
-            self.processing = set()
-
-            # Attempt to get thumbnail from Thumbnail Cache
-            # (see cache.py for definitions of various caches)
-
-            cache_search = thumbnail_caches.get_from_cache(self.rpd_file)
-            self.task = cache_search.task
-            self.thumbnail_bytes = cache_search.thumbnail_bytes
-            self.full_file_name_to_work_on = cache_search.full_file_name_to_work_on
-            self.origin = cache_search.origin
-
-            if self.task != ExtractionTask.undetermined:
-                self.task_cache_extract()
-
-            if self.task == ExtractionTask.undetermined:
-                # Thumbnail was not found in any cache: extract it
-                if self.camera:
-                    self.task_camera_extract()
-                else:
-                    self.task_disk_extract()
-
-            if self.task == ExtractionTask.bypass:
-                self.content = pickle.dumps(
-                    GenerateThumbnailsResults(
-                        rpd_file=self.rpd_file, thumbnail_bytes=self.thumbnail_bytes
-                    ),
-                    pickle.HIGHEST_PROTOCOL,
-                )
+            if prepared.lane is None:
+                self.content = prepared.content
                 self.send_message_to_sink()
-
-            elif self.task != ExtractionTask.undetermined:
+            else:
                 # Send data to load balancer, which will send to one of its
                 # workers
-
-                self.content = pickle.dumps(
-                    ThumbnailExtractorArgument(
-                        rpd_file=self.rpd_file,
-                        task=self.task,
-                        processing=self.processing,
-                        full_file_name_to_work_on=self.full_file_name_to_work_on,
-                        secondary_full_file_name=self.secondary_full_file_name,
-                        exif_buffer=self.exif_buffer,
-                        thumbnail_bytes=self.thumbnail_bytes,
-                        use_thumbnail_cache=use_thumbnail_cache,
-                        file_to_work_on_is_temporary=self.file_to_work_on_is_temporary,
-                        write_fdo_thumbnail=False,
-                        send_thumb_to_main=True,
-                        force_exiftool=self.force_exiftool,
-                    ),
-                    pickle.HIGHEST_PROTOCOL,
-                )
-                self.frontend.send_multipart([b"data", self.content])
+                self.frontend.send_multipart([prepared.lane, b"data", prepared.content])
 
         if self.camera:
+            self.read_ahead_thread.join()
             self.camera.free_camera()
             # Delete our temporary cache directories if they are empty
             if self.photo_cache_dir is not None and not os.listdir(
@@ -962,6 +1155,9 @@ class GenerateThumbnails(WorkerInPublishPullPipeline):
         self.send_finished_command()
 
     def cleanup_pre_stop(self):
+        if self.read_ahead_thread is not None:
+            self.stop_read_ahead.set()
+            self.read_ahead_thread.join()
         if self.camera is not None:
             self.camera.free_camera()
 
@@ -0,0 +1,189 @@
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Hold the thumbnails displayed in the main window within a memory budget.
+
+Every thumbnail received from the thumbnail extractors used to be kept in memory until
+the file was removed from the display, which for a device with tens of thousands of
+files can take gigabytes. Thumbnails that are also stored in the Rapid Photo
+Downloader thumbnail cache can instead be dropped when the budget is exceeded, least
+recently displayed first, and reloaded from the cache when next displayed.
+"""
+
+import logging
+from collections import OrderedDict
+from collections.abc import Callable
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage, QPixmap
+
+from raphodo.cache import ThumbnailCacheSql
+from raphodo.constants import ThumbnailCacheDiskStatus
+
+# Never evict these most recently displayed thumbnails, so a budget smaller than
+# what is on screen does not cause thumbnails to be endlessly reloaded
+min_resident_thumbnails = 200
+
+
+def pixmap_bytes(pixmap: QPixmap) -> int:
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+class ThumbnailStore:
+    """
+    Thumbnails by uid, used like a dict by the thumbnail model.
+
+    Each file has a placeholder icon, which is shared between files and so does not
+    count against the budget, and possibly a thumbnail. Thumbnails that can be
+    reloaded from the thumbnail cache are evicted once the budget is exceeded. When an
+    evicted thumbnail is requested, its placeholder is returned and the thumbnail is
+    reloaded.
+    """
+
+    def __init__(self, budget: int, reload: Callable[[bytes], None]) -> None:
+        """
+        :param budget: bytes of thumbnails to hold in memory
+        :param reload: called with the uid of an evicted thumbnail that has been
+         requested
+        """
+
+        self.budget = budget
+        self.reload = reload
+        self.memory = 0
+
+        # uid: QPixmap
+        self.placeholders: dict[bytes, QPixmap] = {}
+        # Thumbnails that cannot be reloaded, and so are never evicted
+        self.pinned: dict[bytes, QPixmap] = {}
+        # Thumbnails that can be reloaded, least recently displayed first
+        self.evictable: OrderedDict[bytes, QPixmap] = OrderedDict()
+        self.evicted: set[bytes] = set()
+        self.reloading: set[bytes] = set()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.placeholders)
+
+    def __contains__(self, uid: bytes) -> bool:
+        return uid in self.placeholders
+
+    def __getitem__(self, uid: bytes) -> QPixmap:
+        pixmap = self.evictable.get(uid)
+        if pixmap is not None:
+            self.evictable.move_to_end(uid)
+            self.hits += 1
+            return pixmap
+        pixmap = self.pinned.get(uid)
+        if pixmap is not None:
+            self.hits += 1
+            return pixmap
+        if uid in self.evicted:
+            self.misses += 1
+            if uid not in self.reloading:
+                self.reloading.add(uid)
+                self.reload(uid)
+        return self.placeholders[uid]
+
+    def __delitem__(self, uid: bytes) -> None:
+        del self.placeholders[uid]
+        self._remove_thumbnail(uid)
+
+    def get(self, uid: bytes, default: QPixmap | None = None) -> QPixmap | None:
+        if uid in self.placeholders:
+            return self[uid]
+        return default
+
+    def add_placeholder(self, uid: bytes, placeholder: QPixmap) -> None:
+        self.placeholders[uid] = placeholder
+
+    def set_thumbnail(self, uid: bytes, thumbnail: QPixmap, reloadable: bool) -> None:
+        """
+        :param uid: the file's uid
+        :param thumbnail: the file's thumbnail
+        :param reloadable: whether the thumbnail can be reloaded from the thumbnail
+         cache, and so evicted
+        """
+
+        self._remove_thumbnail(uid)
+        if reloadable:
+            self.evictable[uid] = thumbnail
+        else:
+            self.pinned[uid] = thumbnail
+        self.memory += pixmap_bytes(thumbnail)
+        self._evict()
+
+    def reload_failed(self, uid: bytes) -> None:
+        """
+        Display the placeholder from now on, without trying again to reload the
+        thumbnail
+        """
+
+        self.evicted.discard(uid)
+        self.reloading.discard(uid)
+
+    def _remove_thumbnail(self, uid: bytes) -> None:
+        pixmap = self.evictable.pop(uid, None)
+        if pixmap is None:
+            pixmap = self.pinned.pop(uid, None)
+        if pixmap is not None:
+            self.memory -= pixmap_bytes(pixmap)
+        self.evicted.discard(uid)
+        self.reloading.discard(uid)
+
+    def _evict(self) -> None:
+        while (
+            self.memory > self.budget and len(self.evictable) > min_resident_thumbnails
+        ):
+            uid, pixmap = self.evictable.popitem(last=False)
+            self.memory -= pixmap_bytes(pixmap)
+            self.evicted.add(uid)
+
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        if not requests:
+            return 1.0
+        return self.hits / requests
+
+
+class ThumbnailCacheLoader(QObject):
+    """
+    Loads evicted thumbnails from the thumbnail cache, in its own thread
+    """
+
+    thumbnailLoaded = pyqtSignal(bytes, QImage)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.thumbnail_cache: ThumbnailCacheSql | None = None
+
+    @pyqtSlot("PyQt_PyObject")
+    def loadThumbnails(self, files: list[tuple[bytes, str, float, int, str | None]]):
+        """
+        :param files: uid, full file name, modification time, size and camera model
+         of each file whose thumbnail should be loaded
+        """
+
+        # The database connection must be created in the thread that uses it
+        if self.thumbnail_cache is None:
+            self.thumbnail_cache = ThumbnailCacheSql(create_table_if_not_exists=False)
+
+        for uid, full_file_name, mtime, size, camera_model in files:
+            get_thumbnail = self.thumbnail_cache.get_thumbnail_path(
+                full_file_name=full_file_name,
+                mtime=mtime,
+                size=size,
+                camera_model=camera_model,
+            )
+            if get_thumbnail.disk_status == ThumbnailCacheDiskStatus.found:
+                thumbnail = QImage(get_thumbnail.path)
+            else:
+                thumbnail = QImage()
+            if thumbnail.isNull():
+                logging.warning(
+                    "Could not reload thumbnail for %s from the thumbnail cache",
+                    full_file_name,
+                )
+            self.thumbnailLoaded.emit(uid, thumbnail)
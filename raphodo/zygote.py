@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: Copyright 2024 Damon Lynch <damonlynch@gmail.com>
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Zygote process from which worker processes are forked.
+
+Starting a worker process by running a new Python interpreter means the worker must
+import PyQt5, GExiv2, gphoto2, ZeroMQ and the rest of the program from scratch,
+which is slow. This process imports them once, and then forks a worker process each
+time one is requested.
+
+Requests are read from a socket shared with the process that started the zygote.
+Each request is a line of JSON containing the name of the module to run as the
+worker's __main__ module and the worker's command line arguments. The reply is a
+line containing the new worker's process id.
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import logging
+import os
+import runpy
+import signal
+import socket
+import sys
+import warnings
+
+from raphodo.tools.utilities import set_pdeathsig
+
+# Modules imported by the zygote, so that the workers forked from it start with
+# them already imported
+preload_modules = (
+    "raphodo.scan",
+    "raphodo.copyfiles",
+    "raphodo.backupfile",
+    "raphodo.thumbnailpara",
+)
+
+
+def reap_children(signum, frame) -> None:
+    with contextlib.suppress(ChildProcessError):
+        while True:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                break
+
+
+def serve(sock: socket.socket) -> tuple[str, list[str]] | None:
+    """
+    Fork worker processes as they are requested.
+
+    :param sock: socket to read requests from and write replies to
+    :return: in a newly forked worker process, the module to run and its
+     arguments; in the zygote process, None once the socket has been closed
+    """
+
+    signal.signal(signal.SIGCHLD, reap_children)
+    requests = sock.makefile("r", encoding="utf-8")
+
+    for request in requests:
+        module, argv = json.loads(request)
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            requests.close()
+            sock.close()
+            return module, argv
+        sock.sendall(f"{pid}\n".encode())
+
+    return None
+
+
+def run_worker(module: str, argv: list[str]) -> None:
+    """
+    Run the worker in this newly forked process, as if it had been started from
+    the command line
+    """
+
+    # The worker's parent is the zygote, which in turn is terminated should the
+    # program unexpectedly die
+    set_pdeathsig()()
+    sys.argv = argv
+    # The module was preloaded, which is expected
+    warnings.filterwarnings(
+        "ignore", message=".* found in sys.modules", category=RuntimeWarning
+    )
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+def main() -> tuple[str, list[str]] | None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", type=int, required=True)
+    args = parser.parse_args()
+
+    for module in preload_modules:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            logging.exception("Zygote failed to import %s", module)
+
+    with socket.socket(fileno=args.socket) as sock:
+        return serve(sock)
+
+
+if __name__ == "__main__":
+    worker = main()
+    if worker is not None:
+        run_worker(*worker)